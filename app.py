@@ -1,13 +1,28 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, redirect, send_file, stream_with_context, url_for
 import os
+import time
+import itertools
+import gzip
 import logging
-from werkzeug.utils import secure_filename
-import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv  # Para cargar variables de entorno
 from core import AsistenteJuridico  # Importamos la clase que has creado
 from core import GoogleSpeechToText  # Importar el nuevo servicio
 from core import BaseConocimientoMobil  # Importar la clase de base de conocimiento
+from core.metricas import metricas
+from core.speech_to_text import FORMATOS_STREAMING
+from core.transcodificador import Transcodificador
+from core.sondeo_audio import AudioNoAdmitidoError
+from core.ejecutor_transcripcion import TranscripcionSaturadaError
+from core.cache_transcripcion import CacheTranscripcion
+from core.backends_voz import crear_backend_voz
+from core.pool_conexiones import obtener_pool
+from core.paquetes_conocimiento import PaquetesConocimiento
+from core.calentamiento import Calentamiento
+from core.estructura_normativa import normalizar_filtros
+from utils.helpers import SolicitudEnMemoria, comprimir_flujo, elegir_codificacion, serializar_json
 import json
+import config
 
 # Configuración de logging
 logging.basicConfig(level=logging.INFO, 
@@ -18,41 +33,90 @@ logger = logging.getLogger(__name__)
 load_dotenv()
 
 # Configuración para la carga de archivos
-UPLOAD_FOLDER = tempfile.mkdtemp()
 ALLOWED_EXTENSIONS = {'wav', 'mp3', 'm4a', 'ogg', 'flac', 'mp4'}
 
+# Bytes leídos por vez del cuerpo en streaming (~100 ms de LINEAR16 a 16 kHz)
+TAMANO_FRAGMENTO_STREAMING = 3200
+
+# Segundos que se sugiere esperar a un cliente que llega mientras los servicios se inicializan
+RETRY_AFTER_ARRANQUE = 5
+
 app = Flask(__name__)
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+app.request_class = SolicitudEnMemoria
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # Limitar a 16 MB
 
-# Inicializar el asistente jurídico
-try:
+# Fragmentos para la app móvil (comparte el pool de conexiones del asistente)
+base_conocimiento_mobil = BaseConocimientoMobil()
+paquetes_conocimiento = PaquetesConocimiento(base_conocimiento_mobil, config.PAQUETES_DIRECTORIO,
+                                             conservar=config.PAQUETES_CONSERVAR)
+
+
+def iniciar_asistente():
+    """Crea el asistente jurídico: tablas, carga de fragmentos e índice FAISS."""
     asistente = AsistenteJuridico()
-    logger.info("Asistente jurídico inicializado correctamente")
-except Exception as e:
-    logger.error(f"Error al inicializar el asistente jurídico: {e}")
-    asistente = None
+    if asistente.qa is None:
+        raise RuntimeError("no se pudo cargar la base de conocimiento")
+    return asistente
+
+
+def generar_paquete(asistente):
+    """Paquete de la versión actual, una vez terminada la carga inicial del asistente."""
+    paquetes_conocimiento.generar()
+
 
-# Inicializar el servicio de transcripción
-try:
+def iniciar_transcriptor():
+    """Crea el servicio de transcripción con su conversión de audio, caché y backend de voz."""
     # Ruta al archivo de credenciales de Google
     credentials_path = os.environ.get('GOOGLE_APPLICATION_CREDENTIALS', 
                                     os.path.join(os.path.dirname(__file__), 
                                                 'nimble-artwork-438818-k0-ade40f7834b6.json'))
-    transcriptor = GoogleSpeechToText(credentials_path)
-    logger.info("Servicio de transcripción inicializado correctamente")
-except Exception as e:
-    logger.error(f"Error al inicializar el servicio de transcripción: {e}")
-    transcriptor = None
+    transcodificador = Transcodificador(config.FFMPEG_RUTA,
+                                        max_procesos=config.TRANSCODIFICADOR_PROCESOS,
+                                        formato=config.TRANSCODIFICADOR_FORMATO,
+                                        timeout=config.TRANSCODIFICADOR_TIMEOUT)
+    if not transcodificador.disponible:
+        logger.warning("ffmpeg no está disponible: el audio se enviará sin convertir a 16 kHz mono")
+    cache_transcripcion = CacheTranscripcion(config.CACHE_TRANSCRIPCION_ENTRADAS,
+                                             config.CACHE_TRANSCRIPCION_DIRECTORIO)
+    backend_voz = crear_backend_voz(config.BACKEND_VOZ,
+                                    latencia=config.VOZ_LOCAL_LATENCIA,
+                                    variacion=config.VOZ_LOCAL_VARIACION,
+                                    tasa_fallos=config.VOZ_LOCAL_TASA_FALLOS)
+    return GoogleSpeechToText(credentials_path, transcodificador=transcodificador,
+                              cache=cache_transcripcion, backend=backend_voz)
+
+
+# El asistente y el transcriptor se inicializan en segundo plano (con
+# reintentos): el proceso responde de inmediato y cada endpoint devuelve 503
+# solo mientras su propio servicio no está listo
+calentamiento = Calentamiento(reintento_inicial=config.ARRANQUE_REINTENTO_INICIAL,
+                              reintento_maximo=config.ARRANQUE_REINTENTO_MAXIMO)
+calentamiento.registrar('asistente', iniciar_asistente, al_iniciar=generar_paquete)
+calentamiento.registrar('transcriptor', iniciar_transcriptor)
+calentamiento.iniciar()
+
+# Hilos para transcribir y preparar la consulta en paralelo en /api/consulta/audio
+ejecutor_consultas = ThreadPoolExecutor(max_workers=config.CONSULTA_AUDIO_HILOS,
+                                        thread_name_prefix='consulta-audio')
 
 def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def servicio_no_disponible(*nombres):
+    """Respuesta 503 para cuando alguno de los servicios aún se está inicializando."""
+    estado = calentamiento.estado()
+    pendientes = {nombre: estado[nombre] for nombre in nombres if estado[nombre]["estado"] != "listo"}
+    return jsonify({
+        "error": f"Servicio inicializándose: {', '.join(pendientes)}",
+        "arranque": pendientes
+    }), 503, {'Retry-After': str(RETRY_AFTER_ARRANQUE)}
+
 @app.route('/api/consulta', methods=['POST'])
 def procesar_consulta():
+    asistente = calentamiento.obtener('asistente')
     if asistente is None:
-        return jsonify({"error": "El asistente jurídico no se ha inicializado correctamente"}), 500
+        return servicio_no_disponible('asistente')
     
     try:
         datos = request.get_json()
@@ -62,15 +126,22 @@ def procesar_consulta():
         pregunta = datos['pregunta']
         tipo_modelo = datos['tipo-modelo']
         historial_conversacion = datos.get('historial-conversacion', [])
+        id_conversacion = datos.get('id-conversacion')
+        
+        # Filtros opcionales de metadatos, p. ej. {"documento": "4740"} o {"tema": "sanciones"}
+        try:
+            filtros = normalizar_filtros(datos.get('filtros'))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
-        # Convertir historial a string de manera simple
-        historial_texto = json.dumps(historial_conversacion, ensure_ascii=False)
+        # Últimos turnos literales + resumen en caché de los turnos antiguos
+        historial_texto = asistente.gestor_historial.construir(historial_conversacion, id_conversacion)
         
         # Debug: Imprimir el historial procesado
         # print(f"Historial procesado: {historial_texto}")
         
         # Llamar al asistente con el historial procesado
-        respuesta = asistente.generar_respuesta(pregunta, tipo_modelo, historial_texto)
+        respuesta = asistente.generar_respuesta(pregunta, tipo_modelo, historial_texto, filtros=filtros)
         
         return jsonify(respuesta)
         
@@ -86,8 +157,9 @@ def procesar_audio():
     """
     Endpoint para recibir un archivo de audio y transcribirlo a texto
     """
+    transcriptor = calentamiento.obtener('transcriptor')
     if transcriptor is None:
-        return jsonify({"error": "El servicio de transcripción no está disponible"}), 500
+        return servicio_no_disponible('transcriptor')
     
     try:
         # Verificar si hay archivo en la solicitud
@@ -101,66 +173,397 @@ def procesar_audio():
             return jsonify({"error": "No se seleccionó ningún archivo"}), 400
         
         if archivo and allowed_file(archivo.filename):
-            # Guardar el archivo temporalmente
-            filename = secure_filename(archivo.filename)
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            archivo.save(filepath)
-            
-            logger.info(f"Archivo guardado temporalmente en: {filepath}")
+            # Leer el audio directamente del cuerpo de la solicitud (sin archivo temporal)
+            inicio = time.perf_counter()
+            contenido = archivo.read()
+            extension = archivo.filename.rsplit('.', 1)[1].lower()
+            carga = time.perf_counter() - inicio
+            metricas.histograma('transcripcion_carga_segundos',
+                                'Tiempo de lectura del audio subido').observar(carga)
+            logger.info(f"Audio recibido en memoria: {len(contenido)} bytes en {carga * 1000:.1f} ms")
             
             # Obtener parámetros opcionales
-            idioma = request.form.get('idioma', 'es-ES')
+            idioma = request.form.get('idioma', config.IDIOMA_TRANSCRIPCION)
+            modo_largo = request.form.get('modo') == 'largo'
             
-            # Transcribir el audio
-            formato = 'MP3' if os.path.splitext(filename)[1][1:].lower() == 'm4a' else os.path.splitext(filename)[1][1:].upper()
-            tasa_muestreo = 44100 if os.path.splitext(filename)[1][1:].lower() == 'm4a' else 16000
-
+            # Transcribir el audio (se convierte a 16 kHz mono si hay ffmpeg)
             texto_transcrito = transcriptor.transcribir_audio(
-                filepath, 
+                contenido, 
                 idioma=idioma,
-                formato=formato,
-                tasa_muestreo=tasa_muestreo
+                formato=extension.upper(),
+                modo_largo=modo_largo
             )
             
             logger.info(f"Texto transcrito: {texto_transcrito}")
-            
-            # Eliminar el archivo temporal
-            try:
-                os.remove(filepath)
-            except:
-                pass
                 
             # Devolver solo el texto transcrito
             return jsonify({"texto": texto_transcrito})
         else:
             return jsonify({"error": f"Formato de archivo no permitido. Use: {', '.join(ALLOWED_EXTENSIONS)}"}), 400
             
+    except AudioNoAdmitidoError as e:
+        logger.warning(f"Audio rechazado: {e}")
+        return jsonify({"error": str(e)}), 400
+    except TranscripcionSaturadaError as e:
+        logger.warning(f"Transcripción rechazada: {e}")
+        return jsonify({"error": str(e)}), 503, {'Retry-After': str(int(config.TRANSCRIPCION_TIMEOUT_COLA))}
     except Exception as e:
         logger.error(f"Error al procesar el audio: {e}")
         return jsonify({
             "error": str(e)
         }), 500
 
+@app.route('/api/audio/stream', methods=['POST'])
+def procesar_audio_streaming():
+    """
+    Endpoint de transcripción en tiempo real.
+
+    El cliente envía el audio mientras lo graba como cuerpo con
+    Transfer-Encoding: chunked (parámetros en la URL: formato, tasa, idioma,
+    parciales, una_frase) y recibe una línea JSON por evento (NDJSON): transcripciones
+    parciales, finales y un evento "fin" con el texto completo.
+    """
+    transcriptor = calentamiento.obtener('transcriptor')
+    if transcriptor is None:
+        return servicio_no_disponible('transcriptor')
+
+    formato = request.args.get('formato', 'LINEAR16').upper()
+    if formato not in FORMATOS_STREAMING:
+        return jsonify({"error": f"Formato no admitido en streaming. Use: {', '.join(FORMATOS_STREAMING)}"}), 400
+
+    tasa_muestreo = request.args.get('tasa', 16000, type=int)
+    resultados_intermedios = request.args.get('parciales', 'true').lower() != 'false'
+    una_frase = request.args.get('una_frase', 'false').lower() == 'true'
+    idioma = request.args.get('idioma', config.IDIOMA_TRANSCRIPCION)
+    flujo = request.stream
+
+    def fragmentos():
+        while True:
+            fragmento = flujo.read(TAMANO_FRAGMENTO_STREAMING)
+            if not fragmento:
+                break
+            yield fragmento
+
+    def eventos():
+        try:
+            for evento in transcriptor.transcribir_streaming(fragmentos(),
+                                                             formato=formato,
+                                                             tasa_muestreo=tasa_muestreo,
+                                                             resultados_intermedios=resultados_intermedios,
+                                                             una_frase=una_frase,
+                                                             idioma=idioma):
+                yield serializar_json(evento) + "\n"
+        except Exception as e:
+            logger.error(f"Error en la transcripción en streaming: {e}")
+            yield serializar_json({"tipo": "error", "error": str(e)}) + "\n"
+
+    return Response(stream_with_context(eventos()), mimetype='application/x-ndjson',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/consulta/audio', methods=['POST'])
+def procesar_consulta_audio():
+    """
+    Endpoint de consulta por voz en una sola solicitud.
+
+    Recibe el audio junto con los campos de /api/consulta (tipo-modelo,
+    historial-conversacion y filtros como JSON, id-conversacion) en el mismo
+    multipart. Mientras se transcribe el audio se prepara el historial y la
+    cadena de QA del nivel con sus filtros; luego la transcripción pasa por
+    el verificador de contexto, la
+    recuperación y el modelo. Devuelve la respuesta de /api/consulta más el
+    texto transcrito.
+    """
+    asistente = calentamiento.obtener('asistente')
+    transcriptor = calentamiento.obtener('transcriptor')
+    if asistente is None or transcriptor is None:
+        return servicio_no_disponible('asistente', 'transcriptor')
+
+    if 'archivo' not in request.files or request.files['archivo'].filename == '':
+        return jsonify({"error": "No se envió ningún archivo"}), 400
+
+    archivo = request.files['archivo']
+    if not allowed_file(archivo.filename):
+        return jsonify({"error": f"Formato de archivo no permitido. Use: {', '.join(ALLOWED_EXTENSIONS)}"}), 400
+
+    try:
+        historial_conversacion = json.loads(request.form.get('historial-conversacion') or '[]')
+    except ValueError:
+        return jsonify({"error": "historial-conversacion no es un JSON válido"}), 400
+
+    try:
+        filtros = normalizar_filtros(json.loads(request.form.get('filtros') or 'null'))
+    except ValueError as e:
+        return jsonify({"error": f"filtros no válidos: {e}"}), 400
+
+    tipo_modelo = request.form.get('tipo-modelo', 'basico')
+    id_conversacion = request.form.get('id-conversacion')
+    extension = archivo.filename.rsplit('.', 1)[1].lower()
+    inicio = time.perf_counter()
+    contenido = archivo.read()
+    metricas.histograma('transcripcion_carga_segundos',
+                        'Tiempo de lectura del audio subido').observar(time.perf_counter() - inicio)
+
+    try:
+        inicio = time.perf_counter()
+        transcripcion = ejecutor_consultas.submit(
+            transcriptor.transcribir_audio,
+            contenido,
+            idioma=request.form.get('idioma', config.IDIOMA_TRANSCRIPCION),
+            formato=extension.upper(),
+            modo_largo=request.form.get('modo') == 'largo'
+        )
+        preparacion = ejecutor_consultas.submit(asistente.preparar_consulta, tipo_modelo,
+                                                historial_conversacion, id_conversacion, filtros)
+
+        historial_texto, qa = preparacion.result()
+        pregunta = transcripcion.result()
+        fin_transcripcion = time.perf_counter()
+        logger.info(f"Consulta por voz transcrita en {(fin_transcripcion - inicio) * 1000:.0f} ms: {pregunta}")
+
+        if not pregunta.strip():
+            return jsonify({"transcripcion": "", "error": "No se detectó voz en el audio"}), 422
+
+        respuesta = asistente.generar_respuesta(pregunta, tipo_modelo, historial_texto, filtros=filtros, qa=qa)
+        logger.info(f"Consulta por voz respondida en {(time.perf_counter() - inicio) * 1000:.0f} ms "
+                    f"(respuesta: {(time.perf_counter() - fin_transcripcion) * 1000:.0f} ms)")
+
+        return jsonify({"transcripcion": pregunta, **respuesta})
+
+    except AudioNoAdmitidoError as e:
+        logger.warning(f"Audio rechazado: {e}")
+        return jsonify({"error": str(e)}), 400
+    except TranscripcionSaturadaError as e:
+        logger.warning(f"Consulta por voz rechazada: {e}")
+        return jsonify({"error": str(e)}), 503, {'Retry-After': str(int(config.TRANSCRIPCION_TIMEOUT_COLA))}
+    except Exception as e:
+        logger.error(f"Error en /api/consulta/audio: {e}")
+        return jsonify({"error": f"Error al procesar la consulta por voz: {str(e)}"}), 500
+
 @app.route('/api/base_conocimiento', methods=['GET'])
 def obtener_base_conocimiento():
     """
-    Endpoint para obtener la base de conocimiento
+    Endpoint para obtener la base de conocimiento: un arreglo JSON de pares
+    [id, contenido] ordenado por id, enviado por partes y comprimido (br o
+    gzip) según Accept-Encoding.
+
+    Parámetros opcionales:
+        desde: Devolver solo los fragmentos con id mayor que este valor
+        limite: Tamaño de página; si quedan más fragmentos, la cabecera
+            X-Siguiente-Desde (y Link rel="next") trae el siguiente `desde`
+
+    El ETag se deriva de la versión de la tabla, así que un cliente con la
+    copia al día recibe 304 sin que se lean los fragmentos.
     """
+    asistente = calentamiento.obtener('asistente')
     if asistente is None:
-        return jsonify({"error": "El asistente jurídico no se ha inicializado correctamente"}), 500
-    
+        return servicio_no_disponible('asistente')
+
     try:
-        # Obtener la base de conocimiento
-        base_conocimiento = BaseConocimientoMobil()
-        fragmentos = base_conocimiento.obtener_todos_fragmentos()
-        
-        # Devolver los fragmentos en formato JSON
-        return jsonify(fragmentos)
-        
+        desde = int(request.args.get('desde', 0))
+        limite = request.args.get('limite')
+        limite = int(limite) if limite is not None else None
+    except ValueError:
+        return jsonify({"error": "desde y limite deben ser números enteros"}), 400
+    if limite is not None and not 1 <= limite <= config.BASE_CONOCIMIENTO_LIMITE_MAXIMO:
+        return jsonify({"error": f"limite debe estar entre 1 y {config.BASE_CONOCIMIENTO_LIMITE_MAXIMO}"}), 400
+
+    codificacion = elegir_codificacion(request.accept_encodings)
+    cabeceras = {'Vary': 'Accept-Encoding', 'Cache-Control': 'no-cache'}
+
+    try:
+        # La versión se lee antes que los datos: si cambian entremedias el
+        # cliente recibe datos más nuevos que su ETag y solo pierde un 304
+        version = base_conocimiento_mobil.obtener_version()
+        if version is not None:
+            etag = f"v{version}-{desde}-{limite or 'todo'}-{codificacion or 'identity'}"
+            cabeceras['ETag'] = f'"{etag}"'
+            if request.if_none_match.contains(etag):
+                return Response(status=304, headers=cabeceras)
+
+        if limite is None:
+            fragmentos = base_conocimiento_mobil.iterar_fragmentos(desde, config.BASE_CONOCIMIENTO_LOTE)
+            # Leer el primer lote ya, para responder 500 (y no un JSON cortado) si falla la base de datos
+            primero = next(fragmentos, None)
+            fragmentos = itertools.chain([primero] if primero else [], fragmentos)
+        else:
+            fragmentos = base_conocimiento_mobil.obtener_pagina(desde, limite + 1)
+            if len(fragmentos) > limite:
+                fragmentos = fragmentos[:limite]
+                siguiente = fragmentos[-1][0]
+                cabeceras['X-Siguiente-Desde'] = str(siguiente)
+                cabeceras['Link'] = f'<{request.path}?desde={siguiente}&limite={limite}>; rel="next"'
     except Exception as e:
         logger.error(f"Error al obtener la base de conocimiento: {e}")
         return jsonify({"error": str(e)}), 500
 
+    if codificacion:
+        cabeceras['Content-Encoding'] = codificacion
+    cuerpo = comprimir_flujo(_arreglo_json_por_partes(fragmentos), codificacion)
+    return Response(cuerpo, mimetype='application/json', headers=cabeceras)
+
+@app.route('/api/base_conocimiento/cambios', methods=['GET'])
+def obtener_cambios_base_conocimiento():
+    """
+    Endpoint de sincronización: fragmentos agregados o modificados y ids
+    eliminados desde la versión que ya tiene el cliente (?desde=<version>).
+
+    Si esa versión es demasiado antigua (o desconocida) responde 410 con la
+    URL del paquete completo de la versión actual.
+    """
+    asistente = calentamiento.obtener('asistente')
+    if asistente is None:
+        return servicio_no_disponible('asistente')
+    try:
+        desde = int(request.args['desde'])
+    except (KeyError, ValueError):
+        return jsonify({"error": "desde debe ser la versión (entera) que tiene el cliente"}), 400
+
+    try:
+        version, actualizados, eliminados = base_conocimiento_mobil.obtener_cambios(desde)
+    except Exception as e:
+        logger.error(f"Error al obtener los cambios de la base de conocimiento: {e}")
+        return jsonify({"error": str(e)}), 500
+
+    if actualizados is None:
+        return jsonify({
+            "error": f"No hay cambios registrados desde la versión {desde}; descargue el paquete completo",
+            "version": version,
+            "paquete": url_for('obtener_paquete_actual')
+        }), 410
+
+    codificacion = elegir_codificacion(request.accept_encodings)
+    cabeceras = {'Vary': 'Accept-Encoding', 'Cache-Control': 'no-cache'}
+    if codificacion:
+        cabeceras['Content-Encoding'] = codificacion
+    cuerpo = serializar_json({"version": version, "desde": desde,
+                              "fragmentos": actualizados, "eliminados": eliminados}).encode('utf-8')
+    return Response(comprimir_flujo([cuerpo], codificacion), mimetype='application/json', headers=cabeceras)
+
+@app.route('/api/base_conocimiento/paquete', methods=['GET'])
+def obtener_paquete_actual():
+    """
+    Redirige al paquete de la versión actual de la base de conocimiento
+    """
+    try:
+        version = paquetes_conocimiento.actual()
+    except Exception as e:
+        logger.error(f"Error al generar el paquete de la base de conocimiento: {e}")
+        return jsonify({"error": str(e)}), 500
+    if version is None:
+        return jsonify({"error": "La versión de la base de conocimiento no está disponible"}), 503
+    return redirect(url_for('obtener_paquete', version=version))
+
+@app.route('/api/base_conocimiento/paquetes/<int:version>', methods=['GET'])
+def obtener_paquete(version):
+    """
+    Endpoint con el paquete inmutable de una versión: el archivo gzip se
+    envía tal cual (o descomprimido si el cliente no acepta gzip) y se puede
+    guardar en caché indefinidamente
+    """
+    ruta = paquetes_conocimiento.ruta(version)
+    if not os.path.exists(ruta):
+        return jsonify({"error": f"No existe el paquete de la versión {version}",
+                        "paquete": url_for('obtener_paquete_actual')}), 404
+
+    if 'gzip' in request.accept_encodings:
+        respuesta = send_file(ruta, mimetype='application/json', etag=f"paquete-v{version}",
+                              max_age=365 * 24 * 3600)
+        respuesta.headers['Content-Encoding'] = 'gzip'
+    else:
+        def descomprimir():
+            with gzip.open(ruta, 'rb') as archivo:
+                while bloque := archivo.read(64 * 1024):
+                    yield bloque
+        respuesta = Response(descomprimir(), mimetype='application/json')
+        respuesta.set_etag(f"paquete-v{version}-identity")
+        respuesta.cache_control.max_age = 365 * 24 * 3600
+    respuesta.headers['Vary'] = 'Accept-Encoding'
+    respuesta.cache_control.public = True
+    respuesta.cache_control.immutable = True
+    return respuesta
+
+def _arreglo_json_por_partes(filas, filas_por_bloque=200):
+    """Serializa las filas como un arreglo JSON, en bloques de bytes."""
+    yield b'['
+    separador = b''
+    bloque = []
+    for fila in filas:
+        bloque.append(serializar_json(list(fila)))
+        if len(bloque) == filas_por_bloque:
+            yield separador + ','.join(bloque).encode('utf-8')
+            separador = b','
+            bloque = []
+    if bloque:
+        yield separador + ','.join(bloque).encode('utf-8')
+    yield b']'
+
+@app.route('/api/health', methods=['GET'])
+def health_check():
+    """
+    Endpoint de salud: servicios inicializados y estado de los corta circuitos
+    """
+    asistente = calentamiento.obtener('asistente')
+    transcriptor = calentamiento.obtener('transcriptor')
+    cortacircuitos = asistente.estado_cortacircuitos() if asistente else {}
+    degradado = any(c["estado"] != "cerrado" for c in cortacircuitos.values())
+
+    return jsonify({
+        "status": "degradado" if degradado or asistente is None or transcriptor is None else "ok",
+        "asistente": asistente is not None and asistente.qa is not None,
+        "transcriptor": transcriptor is not None,
+        "transcripcion": transcriptor.ejecutor.estado() if transcriptor else None,
+        "base_datos": obtener_pool().estado(),
+        "arranque": calentamiento.estado(),
+        "cortacircuitos": cortacircuitos
+    })
+
+@app.route('/api/health/vivo', methods=['GET'])
+def health_vivo():
+    """
+    Liveness: el proceso responde. No depende de la base de datos ni de los
+    servicios externos, así que no falla (ni provoca reinicios) mientras
+    el asistente se inicializa o reintenta.
+    """
+    return jsonify({"status": "vivo"})
+
+@app.route('/api/health/listo', methods=['GET'])
+def health_listo():
+    """
+    Readiness: 200 si todos los servicios están listos, 503 si no.
+
+    Con ?servicio=transcriptor (o asistente) solo se comprueba ese servicio,
+    p. ej. para enviar tráfico de /api/audio a una instancia que aún carga
+    la base de conocimiento.
+    """
+    estado = calentamiento.estado()
+    servicio = request.args.get('servicio')
+    if servicio is not None:
+        if servicio not in estado:
+            return jsonify({"error": f"Servicio desconocido. Use: {', '.join(estado)}"}), 400
+        estado = {servicio: estado[servicio]}
+
+    listo = calentamiento.listos(estado)
+    return jsonify({"status": "listo" if listo else "iniciando", "servicios": estado}), 200 if listo else 503
+
+@app.route('/api/metricas', methods=['GET'])
+def obtener_metricas():
+    """
+    Endpoint con las métricas del proceso (contadores, medidores e histogramas).
+
+    Con ?formato=prometheus devuelve el formato de texto de Prometheus.
+    """
+    if request.args.get('formato') == 'prometheus':
+        return Response(metricas.exportar_prometheus(), mimetype='text/plain; version=0.0.4')
+
+    datos = metricas.exportar()
+
+    # Tasa de respuestas del modelo que no pudieron interpretarse como JSON
+    total = datos.get('respuestas_json_total', 0)
+    fallidas = datos.get('respuestas_json_fallidas_total', 0)
+    datos['tasa_fallo_json'] = fallidas / total if total else 0.0
+
+    return jsonify(datos)
+
 if __name__ == '__main__':
     # Obtener puerto del entorno o usar 5001 por defecto
     port = int(os.environ.get('PORT', 5001))
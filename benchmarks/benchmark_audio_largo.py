@@ -0,0 +1,74 @@
+"""
+Benchmark del modo de audio largo: tiempo total frente a duración del audio.
+
+Genera audio sintético con "frases" (ráfagas de tono) separadas por
+silencios y compara la transcripción secuencial con la paralela por tramos.
+El reconocedor es simulado con una latencia de LATENCIA_BASE + LATENCIA_POR_SEGUNDO
+por segundo de audio (orden de magnitud observado en el reconocimiento
+síncrono), así que el benchmark no necesita credenciales:
+
+    python -m benchmarks.benchmark_audio_largo
+"""
+import time
+
+import numpy as np
+
+from core.transcripcion_larga import (codificar_wav, dividir_en_silencios, leer_wav,
+                                      transcribir_en_paralelo)
+
+TASA = 16000
+DURACIONES_MINUTOS = [1, 2, 5, 10]
+TRABAJADORES = [1, 4, 8]
+LATENCIA_BASE = 0.3
+LATENCIA_POR_SEGUNDO = 0.02
+
+
+def generar_audio(segundos, rng):
+    """Frases de 2-6 s separadas por silencios de 0.3-1 s."""
+    partes = []
+    total = 0.0
+    while total < segundos:
+        frase = rng.uniform(2, 6)
+        silencio = rng.uniform(0.3, 1.0)
+        t = np.arange(int(frase * TASA)) / TASA
+        tono = 8000 * np.sin(2 * np.pi * rng.uniform(150, 300) * t) * (1 + 0.3 * np.sin(2 * np.pi * 3 * t))
+        partes.append(tono)
+        partes.append(rng.normal(0, 30, int(silencio * TASA)))
+        total += frase + silencio
+    muestras = np.concatenate(partes)[:int(segundos * TASA)]
+    return codificar_wav(muestras.astype(np.int16), TASA)
+
+
+def reconocedor_simulado(fragmento):
+    duracion = (len(fragmento) - 44) / 2 / TASA
+    time.sleep(LATENCIA_BASE + LATENCIA_POR_SEGUNDO * duracion)
+    return f"[{duracion:.1f}s]"
+
+
+def main():
+    rng = np.random.default_rng(7)
+    encabezado = "".join(f"{f'{n} hilo(s)':>12}" for n in TRABAJADORES)
+    print(f"{'audio':>8}{'tramos':>8}{'dividir ms':>12}{encabezado}")
+
+    for minutos in DURACIONES_MINUTOS:
+        contenido = generar_audio(minutos * 60, rng)
+
+        inicio = time.perf_counter()
+        muestras, tasa = leer_wav(contenido)
+        tramos = dividir_en_silencios(muestras, tasa)
+        fragmentos = [codificar_wav(muestras[a:b], tasa) for a, b in tramos]
+        division = (time.perf_counter() - inicio) * 1000
+
+        tiempos = []
+        for trabajadores in TRABAJADORES:
+            inicio = time.perf_counter()
+            textos = transcribir_en_paralelo(fragmentos, reconocedor_simulado, trabajadores)
+            tiempos.append(time.perf_counter() - inicio)
+            assert len(textos) == len(fragmentos)
+
+        columnas = "".join(f"{t:>11.2f}s" for t in tiempos)
+        print(f"{minutos:>6} m{len(fragmentos):>8}{division:>12.1f}{columnas}")
+
+
+if __name__ == "__main__":
+    main()
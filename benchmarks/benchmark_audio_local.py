@@ -0,0 +1,91 @@
+"""
+Prueba de carga de /api/audio con el backend de voz local (sin red ni credenciales).
+
+Levanta la aplicación en un servidor con hilos dentro del mismo proceso y
+envía ráfagas de subidas de prueba.m4a con distintos niveles de
+concurrencia. Mide rendimiento, latencias, rechazos por el límite de
+reconocimientos simultáneos (503), fallos inyectados (500) y memoria máxima.
+Los parámetros se pueden cambiar con las mismas variables de entorno de
+config.py:
+
+    python -m benchmarks.benchmark_audio_local
+"""
+import os
+
+os.environ['BACKEND_VOZ'] = 'local'
+os.environ.setdefault('VOZ_LOCAL_LATENCIA', '0.5')
+os.environ.setdefault('VOZ_LOCAL_TASA_FALLOS', '0.05')
+os.environ.setdefault('TRANSCRIPCION_MAX_SIMULTANEAS', '8')
+os.environ.setdefault('TRANSCRIPCION_TIMEOUT_COLA', '2')
+# Sin caché: cada subida debe llegar al reconocedor
+os.environ.setdefault('CACHE_TRANSCRIPCION_ENTRADAS', '0')
+
+import http.client
+import resource
+import statistics
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.serving import make_server
+
+import config
+from app import app, calentamiento
+
+RUTA_AUDIO = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'prueba.m4a')
+SOLICITUDES = 64
+CONCURRENCIAS = [1, 8, 32]
+
+
+def cuerpo_multipart(contenido):
+    limite = uuid.uuid4().hex
+    cuerpo = (f'--{limite}\r\nContent-Disposition: form-data; name="archivo"; filename="prueba.m4a"\r\n'
+              f'Content-Type: audio/mp4\r\n\r\n').encode() + contenido + f'\r\n--{limite}--\r\n'.encode()
+    return cuerpo, f'multipart/form-data; boundary={limite}'
+
+
+def subir(puerto, cuerpo, tipo):
+    conexion = http.client.HTTPConnection('127.0.0.1', puerto, timeout=60)
+    inicio = time.perf_counter()
+    conexion.request('POST', '/api/audio', body=cuerpo, headers={'Content-Type': tipo})
+    respuesta = conexion.getresponse()
+    respuesta.read()
+    conexion.close()
+    return respuesta.status, time.perf_counter() - inicio
+
+
+def main():
+    with open(RUTA_AUDIO, 'rb') as f:
+        cuerpo, tipo = cuerpo_multipart(f.read())
+
+    # El transcriptor se inicializa en segundo plano
+    calentamiento.esperar('transcriptor')
+
+    servidor = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    puerto = servidor.server_port
+
+    print(f"backend local: latencia {config.VOZ_LOCAL_LATENCIA}s, fallos {config.VOZ_LOCAL_TASA_FALLOS:.0%}, "
+          f"máx. simultáneas {config.TRANSCRIPCION_MAX_SIMULTANEAS}, espera en cola {config.TRANSCRIPCION_TIMEOUT_COLA}s")
+    print(f"{'concurrencia':>12}{'sol/s':>8}{'p50 s':>8}{'p95 s':>8}{'200':>6}{'503':>6}{'500':>6}{'RSS MB':>8}")
+
+    for concurrencia in CONCURRENCIAS:
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrencia) as ejecutor:
+            resultados = list(ejecutor.map(lambda _: subir(puerto, cuerpo, tipo), range(SOLICITUDES)))
+        total = time.perf_counter() - inicio
+
+        estados = Counter(estado for estado, _ in resultados)
+        latencias = sorted(latencia for estado, latencia in resultados if estado == 200) or [0.0]
+        p95 = latencias[min(len(latencias) - 1, int(len(latencias) * 0.95))]
+        memoria = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(f"{concurrencia:>12}{SOLICITUDES / total:>8.1f}{statistics.median(latencias):>8.2f}{p95:>8.2f}"
+              f"{estados[200]:>6}{estados[503]:>6}{estados[500]:>6}{memoria:>8.0f}")
+
+    servidor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Benchmark de buscar_fragmentos: búsqueda de texto completo frente a ILIKE.
+
+Divide data/completo.txt en tantos fragmentos como tiene hoy la base de
+conocimiento, lo replica 10 y 100 veces en tablas de prueba con los mismos
+índices que crea inicializar_db y mide la latencia de la búsqueda anterior
+(ILIKE sin límite, recorre toda la tabla) y de la búsqueda por relevancia
+(con LIMIT y corrección de palabras mal escritas). Usa la base de datos de config.py (variables DB_*) y borra las
+tablas de prueba al terminar; fragmentos_texto no se modifica:
+
+    python -m benchmarks.benchmark_busqueda_texto
+"""
+import os
+import statistics
+import time
+
+from psycopg2.extras import execute_values
+
+from core.base_conocimiento_mobil import (CONSULTA_BUSQUEDA, SQL_BUSQUEDA_TEXTO, buscar_con_correccion,
+                                          parametros_busqueda)
+from core.pool_conexiones import obtener_pool
+
+RUTA_CORPUS = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'completo.txt')
+# Fragmentos que produce hoy el divisor de texto sobre completo.txt
+FRAGMENTOS_ACTUALES = 503
+ESCALAS = [10, 100]
+LIMITE = 20
+REPETICIONES = 5
+CONSULTAS = [
+    "semáforo en rojo",
+    "licencia de conducir",
+    "exceso de velocidad",
+    "estado de ebriedad",
+    "vehiculo",              # sin tilde
+    "semaforo",              # sin tilde
+    "estacionamento",        # con error de escritura
+    "placa",
+]
+# Búsqueda original de BaseConocimientoMobil: sin orden ni límite
+CONSULTA_ORIGINAL = "SELECT id, contenido FROM {tabla} WHERE contenido ILIKE %(patron_ilike)s"
+
+
+def fragmentos_corpus():
+    with open(RUTA_CORPUS, encoding='utf-8') as f:
+        lineas = [linea.strip() for linea in f if linea.strip()]
+    tamano = sum(len(linea) for linea in lineas) // FRAGMENTOS_ACTUALES
+    fragmentos, actual = [], ""
+    for linea in lineas:
+        actual = f"{actual}\n{linea}" if actual else linea
+        if len(actual) >= tamano:
+            fragmentos.append(actual)
+            actual = ""
+    if actual:
+        fragmentos.append(actual)
+    return fragmentos
+
+
+def borrar_tabla(cursor, tabla):
+    cursor.execute(f"DROP TABLE IF EXISTS {tabla}, {tabla}_palabras")
+
+
+def crear_tabla(cursor, tabla, fragmentos, escala):
+    borrar_tabla(cursor, tabla)
+    cursor.execute(f"CREATE TABLE {tabla} (id SERIAL PRIMARY KEY, contenido TEXT NOT NULL)")
+    # Cada copia lleva su número para que las filas no sean idénticas
+    execute_values(cursor, f"INSERT INTO {tabla} (contenido) VALUES %s",
+                   [(f"{fragmento}\n(copia {copia})",) for copia in range(escala) for fragmento in fragmentos],
+                   page_size=1000)
+    cursor.execute(SQL_BUSQUEDA_TEXTO.format(tabla=tabla))
+    cursor.execute(f"ANALYZE {tabla}")
+
+
+def medir(consulta):
+    tiempos = []
+    for _ in range(REPETICIONES):
+        inicio = time.perf_counter()
+        filas = consulta()
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos) * 1000, len(filas)
+
+
+def ilike(cursor, tabla, texto):
+    cursor.execute(CONSULTA_ORIGINAL.format(tabla=tabla), parametros_busqueda(texto, LIMITE, 0))
+    return cursor.fetchall()
+
+
+def plan(cursor, sql, parametros):
+    cursor.execute("EXPLAIN " + sql, parametros)
+    nodos = [fila[0].strip().lstrip('-> ').split('  ')[0] for fila in cursor.fetchall()]
+    return next((n for n in nodos if 'Scan' in n), nodos[0])
+
+
+def main():
+    fragmentos = fragmentos_corpus()
+    print(f"corpus: {len(fragmentos)} fragmentos de {os.path.basename(RUTA_CORPUS)}")
+
+    with obtener_pool().conexion() as conn:
+        with conn.cursor() as cursor:
+            for escala in ESCALAS:
+                tabla = f"benchmark_fragmentos_x{escala}"
+                inicio = time.perf_counter()
+                crear_tabla(cursor, tabla, fragmentos, escala)
+                conn.commit()
+                print(f"\nx{escala}: {len(fragmentos) * escala} filas (carga e índices en "
+                      f"{time.perf_counter() - inicio:.1f} s)")
+                print(f"{'consulta':<24}{'ILIKE ms':>10}{'filas':>8}{'texto ms':>10}{'filas':>8}")
+
+                totales = [0.0, 0.0]
+                for texto in CONSULTAS:
+                    ms_ilike, filas_ilike = medir(lambda: ilike(cursor, tabla, texto))
+                    ms_texto, filas_texto = medir(lambda: buscar_con_correccion(cursor, tabla, texto, LIMITE, 0))
+                    totales[0] += ms_ilike
+                    totales[1] += ms_texto
+                    print(f"{texto:<24}{ms_ilike:>10.1f}{filas_ilike:>8}{ms_texto:>10.1f}{filas_texto:>8}")
+                print(f"{'media':<24}{totales[0] / len(CONSULTAS):>10.1f}{'':>8}"
+                      f"{totales[1] / len(CONSULTAS):>10.1f}")
+
+                parametros = parametros_busqueda(CONSULTAS[0], LIMITE, 0)
+                print(f"plan ILIKE: {plan(cursor, CONSULTA_ORIGINAL.format(tabla=tabla), parametros)}")
+                print(f"plan texto: {plan(cursor, CONSULTA_BUSQUEDA.format(tabla=tabla, filtro='TRUE'), parametros)}")
+
+            for escala in ESCALAS:
+                borrar_tabla(cursor, f"benchmark_fragmentos_x{escala}")
+        conn.commit()
+
+
+if __name__ == "__main__":
+    main()
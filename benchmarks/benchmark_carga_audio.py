@@ -0,0 +1,81 @@
+"""
+Benchmark del manejo de la subida en /api/audio: ruta anterior (guardar en
+disco, reabrir y leer, borrar) frente a la ruta en memoria actual.
+
+Mide solo el tramo entre la recepción del multipart y los bytes listos para
+el reconocedor, con el audio de ejemplo prueba.m4a:
+
+    python -m benchmarks.benchmark_carga_audio
+"""
+import io
+import os
+import statistics
+import tempfile
+import time
+
+from flask import Flask, Request, request
+from werkzeug.utils import secure_filename
+
+from utils.helpers import SolicitudEnMemoria
+
+RUTA_AUDIO = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'prueba.m4a')
+REPETICIONES = 300
+
+
+def crear_app(clase_solicitud, en_disco, carpeta):
+    app = Flask(__name__)
+    app.request_class = clase_solicitud
+
+    @app.route('/audio', methods=['POST'])
+    def audio():
+        archivo = request.files['archivo']
+        if en_disco:
+            ruta = os.path.join(carpeta, secure_filename(archivo.filename))
+            archivo.save(ruta)
+            with open(ruta, 'rb') as f:
+                contenido = f.read()
+            os.remove(ruta)
+        else:
+            contenido = archivo.read()
+        return str(len(contenido))
+
+    return app
+
+
+def medir(app, audio):
+    cliente = app.test_client()
+    tiempos = []
+    for _ in range(REPETICIONES):
+        inicio = time.perf_counter()
+        respuesta = cliente.post('/audio', data={'archivo': (io.BytesIO(audio), 'prueba.m4a')},
+                                 content_type='multipart/form-data')
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+        assert respuesta.status_code == 200
+    return tiempos
+
+
+def main():
+    with open(RUTA_AUDIO, 'rb') as f:
+        datos = f.read()
+
+    carpeta = tempfile.mkdtemp()
+    escenarios = {
+        "disco (save + read + remove)": crear_app(Request, True, carpeta),
+        "memoria (SolicitudEnMemoria)": crear_app(SolicitudEnMemoria, False, carpeta),
+    }
+
+    print(f"Audio: {len(datos)} bytes, {REPETICIONES} solicitudes por escenario")
+    resultados = {}
+    for nombre, app in escenarios.items():
+        tiempos = medir(app, datos)
+        resultados[nombre] = statistics.median(tiempos)
+        print(f"{nombre:<32} p50 {statistics.median(tiempos):7.3f} ms   "
+              f"p95 {sorted(tiempos)[int(len(tiempos) * 0.95)]:7.3f} ms")
+
+    disco, memoria = resultados.values()
+    print(f"Reducción por solicitud (p50): {disco - memoria:.3f} ms ({(1 - memoria / disco) * 100:.0f}%)")
+    os.rmdir(carpeta)
+
+
+if __name__ == "__main__":
+    main()
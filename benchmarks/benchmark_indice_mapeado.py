@@ -0,0 +1,118 @@
+"""
+Benchmark de memoria del índice FAISS con N workers: privado frente a mapeado.
+
+Simula workers de gunicorn (procesos creados con fork) que cargan la base
+de conocimiento de dos formas:
+
+- privado: cada worker construye su índice con FAISS.from_embeddings y un
+  InMemoryDocstore, como _cargar_desde_postgresql
+- mapeado: cada worker abre con abrir_indice los archivos escritos una sola
+  vez con escribir_indice (FAISS_MMAP_DIRECTORIO)
+
+Con todos los workers cargados y después de hacer búsquedas (que recorren
+todos los vectores) y leer todos los textos, cada uno lee su Rss y su Pss de
+/proc/self/smaps_rollup. El Pss reparte cada página compartida entre los
+procesos que la usan, así que la suma del Pss de los workers es la memoria
+física total. Los workers cargan de uno en uno, para que el pico
+transitorio de la carga privada (listas de floats de Python) no se sume
+entre procesos. No usa la base de datos ni la API de embeddings:
+
+    python -m benchmarks.benchmark_indice_mapeado
+"""
+import multiprocessing
+import os
+import tempfile
+
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from benchmarks.benchmark_busqueda_texto import fragmentos_corpus
+from core.indice_mapeado import abrir_indice, escribir_indice, ruta_indice
+
+FRAGMENTOS = 10000
+DIMENSIONES = 1536
+WORKERS = [1, 2, 4, 8]
+BUSQUEDAS = 20
+ESPERA = 600
+
+
+def memoria():
+    """Rss y Pss del proceso actual, en MB."""
+    valores = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for linea in f:
+            partes = linea.split()
+            if partes[0] in ('Rss:', 'Pss:'):
+                valores[partes[0][:-1]] = int(partes[1]) / 1024
+    return valores
+
+
+def cargar_privado(datos, embeddings):
+    textos, metadatas, vectores = datos
+    return FAISS.from_embeddings(list(zip(textos, vectores.tolist())), embeddings, metadatas=metadatas)
+
+
+def worker(modo, ruta, datos, turno, barrera, resultados):
+    embeddings = DeterministicFakeEmbedding(size=DIMENSIONES)
+    with turno:
+        if modo == "privado":
+            base = cargar_privado(datos, embeddings)
+        else:
+            base = abrir_indice(ruta, embeddings)
+
+    consultas = np.random.default_rng(os.getpid()).random((BUSQUEDAS, DIMENSIONES), dtype=np.float32)
+    for consulta in consultas:
+        base.similarity_search_by_vector(consulta.tolist(), k=10)
+    for posicion in range(base.index.ntotal):
+        base.docstore.search(base.index_to_docstore_id[posicion])
+
+    barrera.wait(ESPERA)
+    despues = memoria()
+    resultados.put((despues['Rss'], despues['Pss']))
+    barrera.wait(ESPERA)
+
+
+def medir(contexto, modo, ruta, datos, workers):
+    turno = contexto.Lock()
+    barrera = contexto.Barrier(workers)
+    resultados = contexto.Queue()
+    procesos = [contexto.Process(target=worker, args=(modo, ruta, datos, turno, barrera, resultados))
+                for _ in range(workers)]
+    for proceso in procesos:
+        proceso.start()
+    medidas = [resultados.get(timeout=ESPERA) for _ in procesos]
+    for proceso in procesos:
+        proceso.join()
+    return medidas
+
+
+def main():
+    corpus = fragmentos_corpus()
+    textos = [f"{corpus[i % len(corpus)]}\n(copia {i // len(corpus)})" for i in range(FRAGMENTOS)]
+    metadatas = [{"source": "completo.txt", "start_index": i * 1500} for i in range(FRAGMENTOS)]
+    vectores = np.random.default_rng(0).random((FRAGMENTOS, DIMENSIONES), dtype=np.float32)
+    print(f"{FRAGMENTOS} fragmentos, embeddings de {DIMENSIONES} dimensiones "
+          f"({vectores.nbytes / 1024 / 1024:.0f} MB de vectores, "
+          f"{sum(len(t.encode('utf-8')) for t in textos) / 1024 / 1024:.0f} MB de texto)")
+
+    contexto = multiprocessing.get_context('fork')
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = ruta_indice(directorio, 1)
+        escribir_indice(ruta, list(range(1, FRAGMENTOS + 1)), textos, metadatas, vectores)
+        datos = (textos, metadatas, vectores)
+
+        print(f"{'modo':<10}{'workers':>8}{'Rss/worker MB':>15}{'Pss total MB':>14}{'MB/worker extra':>17}")
+        for modo in ("privado", "mapeado"):
+            pss_uno = None
+            for workers in WORKERS:
+                medidas = medir(contexto, modo, ruta, datos, workers)
+                rss = sum(m[0] for m in medidas) / workers
+                pss = sum(m[1] for m in medidas)
+                pss_uno = pss if pss_uno is None else pss_uno
+                extra = f"{(pss - pss_uno) / (workers - 1):.0f}" if workers > 1 else "-"
+                print(f"{modo:<10}{workers:>8}{rss:>15.0f}{pss:>14.0f}{extra:>17}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Benchmark de la carga de fragmentos: execute_values frente a COPY binario.
+
+Divide data/completo.txt como benchmark_busqueda_texto, lo replica 1, 10 y
+50 veces con embeddings de 1536 dimensiones (los de text-embedding-ada-002)
+y guarda las filas en una tabla de prueba con las columnas de
+fragmentos_texto de las dos formas:
+
+- execute_values: la carga anterior, que arma la lista completa de
+  (contenido, Binary(pickle), json) y la envía como INSERT ... VALUES
+- COPY binario: las filas se generan a medida que se envían, en lotes de
+  config.INGESTA_LOTE, con copiar_binario
+
+Mide filas por segundo y el pico de memoria de Python (tracemalloc). Usa la
+base de datos de config.py (variables DB_*) y borra la tabla de prueba al
+terminar:
+
+    python -m benchmarks.benchmark_ingesta
+"""
+import json
+import pickle
+import random
+import time
+import tracemalloc
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+import config
+from benchmarks.benchmark_busqueda_texto import fragmentos_corpus
+from core.copia_binaria import copiar_binario, jsonb_binario, texto_binario
+from core.pool_conexiones import obtener_pool
+
+TABLA = "benchmark_ingesta"
+ESCALAS = [1, 10, 50]
+DIMENSIONES = 1536
+
+
+def filas(fragmentos, escala, vectores):
+    """(contenido, embedding en bytes, metadata en JSON), como las genera _procesar_texto_inicial."""
+    for copia in range(escala):
+        for i, fragmento in enumerate(fragmentos):
+            yield (f"{fragmento}\n(copia {copia})",
+                   pickle.dumps(vectores[i % len(vectores)]),
+                   json.dumps({"source": "completo.txt", "start_index": i * 1500, "copia": copia}))
+
+
+def cargar_execute_values(cursor, fragmentos, escala, vectores):
+    datos = [(contenido, psycopg2.Binary(embedding), metadata)
+             for contenido, embedding, metadata in filas(fragmentos, escala, vectores)]
+    execute_values(cursor, f"INSERT INTO {TABLA} (contenido, embedding, metadata) VALUES %s", datos,
+                   template="(%s, %s, %s)")
+    return len(datos)
+
+
+def cargar_copia(cursor, fragmentos, escala, vectores):
+    binarias = ((texto_binario(contenido), embedding, jsonb_binario(metadata))
+                for contenido, embedding, metadata in filas(fragmentos, escala, vectores))
+    return copiar_binario(cursor, TABLA, ('contenido', 'embedding', 'metadata'), binarias,
+                          tamano_lote=config.INGESTA_LOTE)
+
+
+def medir(conn, carga, *args):
+    with conn.cursor() as cursor:
+        cursor.execute(f"TRUNCATE {TABLA}")
+        conn.commit()
+        tracemalloc.start()
+        inicio = time.perf_counter()
+        total = carga(cursor, *args)
+        conn.commit()
+        segundos = time.perf_counter() - inicio
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        cursor.execute(f"SELECT count(*) FROM {TABLA}")
+        assert cursor.fetchone()[0] == total
+    return total, segundos, pico
+
+
+def main():
+    fragmentos = fragmentos_corpus()
+    aleatorio = random.Random(0)
+    vectores = [[aleatorio.uniform(-0.1, 0.1) for _ in range(DIMENSIONES)] for _ in range(32)]
+    print(f"corpus: {len(fragmentos)} fragmentos, embeddings de {DIMENSIONES} dimensiones, "
+          f"lotes de COPY de {config.INGESTA_LOTE} filas")
+    print(f"{'escala':<8}{'filas':>8}{'método':>18}{'segundos':>10}{'filas/s':>10}{'pico MB':>10}")
+
+    with obtener_pool().conexion() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {TABLA}")
+            cursor.execute(f"""
+                CREATE TABLE {TABLA} (
+                    id SERIAL PRIMARY KEY,
+                    contenido TEXT NOT NULL,
+                    embedding BYTEA,
+                    metadata JSONB,
+                    fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+        conn.commit()
+
+        try:
+            for escala in ESCALAS:
+                for nombre, carga in (("execute_values", cargar_execute_values), ("COPY binario", cargar_copia)):
+                    total, segundos, pico = medir(conn, carga, fragmentos, escala, vectores)
+                    print(f"x{escala:<7}{total:>8}{nombre:>18}{segundos:>10.2f}{total / segundos:>10.0f}"
+                          f"{pico / 1024 / 1024:>10.1f}")
+        finally:
+            with conn.cursor() as cursor:
+                cursor.execute(f"DROP TABLE IF EXISTS {TABLA}")
+            conn.commit()
+
+
+if __name__ == "__main__":
+    main()
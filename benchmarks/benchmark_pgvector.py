@@ -0,0 +1,172 @@
+"""
+Benchmark de recuperación: FAISS en el proceso frente a pgvector (HNSW).
+
+Replica los fragmentos de data/completo.txt 1, 10 y 20 veces con
+embeddings de 1536 dimensiones agrupados alrededor de centros (como los de
+un corpus real, donde hay vecinos cercanos) y los guarda en una tabla de
+prueba con las columnas de fragmentos_texto más vector_embedding y su
+índice HNSW (SQL_PGVECTOR). Para cada escala mide:
+
+- arranque FAISS: leer los embeddings de PostgreSQL y construir el índice,
+  lo que hace cada nodo en _cargar_desde_postgresql (pgvector no necesita
+  nada al arrancar)
+- latencia por consulta (p50 y p95) de RecuperadorFAISS y de
+  RecuperadorPgvector, en modo similarity y mmr, con varios ef_search
+- recall@k de pgvector frente a la búsqueda exacta de FAISS
+
+Las consultas son embeddings cercanos a fragmentos existentes, así que no
+se usa la API de embeddings. Usa la base de datos de config.py (variables
+DB_*), que debe tener la extensión vector, y borra la tabla al terminar:
+
+    python -m benchmarks.benchmark_pgvector
+"""
+import json
+import pickle
+import time
+
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import Embeddings
+
+import config
+from benchmarks.benchmark_busqueda_texto import fragmentos_corpus
+from core.copia_binaria import copiar_binario, jsonb_binario, texto_binario, vector_binario
+from core.pool_conexiones import obtener_pool
+from core.recuperacion import RecuperadorFAISS
+from core.recuperacion_pgvector import SQL_PGVECTOR, RecuperadorPgvector
+
+TABLA = "benchmark_pgvector"
+ESCALAS = [1, 10, 20]
+DIMENSIONES = 1536
+CENTROS = 64
+CONSULTAS = 100
+EF_SEARCH = [40, 100]
+K = 10
+
+
+class EmbeddingsPrecalculados(Embeddings):
+    """Devuelve el vector ya calculado de cada consulta del benchmark."""
+
+    def __init__(self, vectores):
+        self.vectores = vectores
+
+    def embed_query(self, text):
+        return self.vectores[text]
+
+    def embed_documents(self, texts):
+        return [self.vectores[texto] for texto in texts]
+
+
+def vectores_agrupados(total, aleatorio):
+    centros = aleatorio.normal(size=(CENTROS, DIMENSIONES)).astype(np.float32)
+    vectores = centros[aleatorio.integers(0, CENTROS, total)]
+    vectores += 0.5 * aleatorio.normal(size=(total, DIMENSIONES)).astype(np.float32)
+    return vectores / np.linalg.norm(vectores, axis=1, keepdims=True)
+
+
+def cargar_tabla(conn, textos, vectores):
+    with conn.cursor() as cursor:
+        cursor.execute(f"TRUNCATE {TABLA}")
+        cursor.execute(f"DROP INDEX IF EXISTS {TABLA}_vector_idx")
+        filas = ((texto_binario(texto), pickle.dumps(vector.tolist()),
+                  jsonb_binario(json.dumps({"source": "completo.txt"})), vector_binario(vector))
+                 for texto, vector in zip(textos, vectores))
+        copiar_binario(cursor, TABLA, ('contenido', 'embedding', 'metadata', 'vector_embedding'), filas,
+                       tamano_lote=config.INGESTA_LOTE)
+        conn.commit()
+
+        inicio = time.perf_counter()
+        cursor.execute(SQL_PGVECTOR.format(tabla=TABLA, dimensiones=DIMENSIONES, m=config.PGVECTOR_HNSW_M,
+                                           ef_construccion=config.PGVECTOR_HNSW_EF_CONSTRUCCION))
+        cursor.execute(f"ANALYZE {TABLA}")
+        conn.commit()
+        return time.perf_counter() - inicio
+
+
+def arrancar_faiss(conn, embeddings):
+    """Lo que hace _cargar_desde_postgresql en cada nodo: leer los embeddings y construir el índice."""
+    inicio = time.perf_counter()
+    with conn.cursor() as cursor:
+        cursor.execute(f"SELECT contenido, embedding, metadata FROM {TABLA}")
+        resultados = cursor.fetchall()
+    conn.rollback()
+    base = FAISS.from_embeddings([(contenido, pickle.loads(embedding)) for contenido, embedding, _ in resultados],
+                                 embeddings, metadatas=[metadata for _, _, metadata in resultados])
+    return base, time.perf_counter() - inicio
+
+
+def medir(recuperador, consultas):
+    tiempos, resultados = [], []
+    for consulta in consultas:
+        inicio = time.perf_counter()
+        documentos = recuperador.invoke(consulta)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+        resultados.append([documento.page_content for documento in documentos])
+    return np.percentile(tiempos, 50), np.percentile(tiempos, 95), resultados
+
+
+def recall(resultados, exactos):
+    return np.mean([len(set(r) & set(e)) / max(len(e), 1) for r, e in zip(resultados, exactos)])
+
+
+def main():
+    corpus = fragmentos_corpus()
+    aleatorio = np.random.default_rng(0)
+    pool = obtener_pool()
+    print(f"corpus: {len(corpus)} fragmentos, embeddings de {DIMENSIONES} dimensiones, k={K}, "
+          f"HNSW m={config.PGVECTOR_HNSW_M} ef_construction={config.PGVECTOR_HNSW_EF_CONSTRUCCION}")
+
+    with pool.conexion() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {TABLA}")
+            cursor.execute(f"""
+                CREATE EXTENSION IF NOT EXISTS vector;
+                CREATE TABLE {TABLA} (
+                    id SERIAL PRIMARY KEY,
+                    contenido TEXT NOT NULL,
+                    embedding BYTEA,
+                    metadata JSONB,
+                    vector_embedding vector({DIMENSIONES}),
+                    fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            # Para que el grafo HNSW se construya en memoria
+            cursor.execute("SET maintenance_work_mem = '512MB'")
+        conn.commit()
+
+        try:
+            for escala in ESCALAS:
+                textos = [f"{fragmento}\n(copia {copia})" for copia in range(escala) for fragmento in corpus]
+                vectores = vectores_agrupados(len(textos), aleatorio)
+                segundos_indice = cargar_tabla(conn, textos, vectores)
+
+                elegidos = aleatorio.integers(0, len(textos), CONSULTAS)
+                cercanos = vectores[elegidos] + 0.3 / np.sqrt(DIMENSIONES) * aleatorio.normal(size=(CONSULTAS, DIMENSIONES))
+                consultas = [f"consulta {i}" for i in range(CONSULTAS)]
+                embeddings = EmbeddingsPrecalculados({consulta: vector.tolist()
+                                                      for consulta, vector in zip(consultas, cercanos)})
+
+                base, segundos_arranque = arrancar_faiss(conn, embeddings)
+                print(f"\nx{escala}: {len(textos)} fragmentos | arranque FAISS {segundos_arranque:.2f}s por nodo | "
+                      f"índice HNSW {segundos_indice:.2f}s (una vez)")
+                print(f"{'backend':<22}{'modo':<12}{'p50 ms':>9}{'p95 ms':>9}{'recall@k':>10}")
+
+                for modo in ("similarity", "mmr"):
+                    comunes = dict(modo=modo, k=K, fetch_k=config.BUSQUEDA_FETCH_K, lambda_mult=config.BUSQUEDA_LAMBDA)
+                    p50, p95, exactos = medir(RecuperadorFAISS(vectorstore=base, **comunes), consultas)
+                    print(f"{'FAISS (exacto)':<22}{modo:<12}{p50:>9.2f}{p95:>9.2f}{1:>10.3f}")
+                    for ef_search in EF_SEARCH:
+                        recuperador = RecuperadorPgvector(pool=pool, embeddings=embeddings, tabla=TABLA,
+                                                          ef_search=ef_search, **comunes)
+                        p50, p95, resultados = medir(recuperador, consultas)
+                        print(f"{f'pgvector ef={ef_search}':<22}{modo:<12}{p50:>9.2f}{p95:>9.2f}"
+                              f"{recall(resultados, exactos):>10.3f}")
+                del base
+        finally:
+            with conn.cursor() as cursor:
+                cursor.execute(f"DROP TABLE IF EXISTS {TABLA}")
+            conn.commit()
+
+
+if __name__ == "__main__":
+    main()
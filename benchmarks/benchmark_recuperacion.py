@@ -0,0 +1,121 @@
+"""
+Benchmark de los modos de recuperación: latencia y diversidad de resultados.
+
+Usa vectores sintéticos agrupados (grupos de fragmentos casi idénticos, como
+los que produce el solapamiento del divisor de texto), así que no necesita
+OpenAI ni la base de datos:
+
+    python -m benchmarks.benchmark_recuperacion
+"""
+import time
+
+import numpy as np
+
+from core.recuperacion import seleccionar_mmr
+
+DIMENSION = 1536
+GRUPOS = 300
+FRAGMENTOS_POR_GRUPO = 8
+K = 10
+FETCH_K = 20
+LAMBDA = 0.8
+UMBRAL = 0.45
+REPETICIONES = 200
+
+
+def generar_corpus(rng):
+    centros = rng.standard_normal((GRUPOS, DIMENSION)).astype(np.float32)
+    ruido = 0.15 * rng.standard_normal((GRUPOS, FRAGMENTOS_POR_GRUPO, DIMENSION)).astype(np.float32)
+    corpus = (centros[:, None, :] + ruido).reshape(-1, DIMENSION)
+    corpus /= np.linalg.norm(corpus, axis=1, keepdims=True)
+    grupo = np.repeat(np.arange(GRUPOS), FRAGMENTOS_POR_GRUPO)
+    return corpus, grupo
+
+
+def generar_consulta(rng, corpus):
+    # Consulta cercana a la mezcla de cuatro fragmentos al azar
+    base = corpus[rng.choice(len(corpus), 4, replace=False)].sum(axis=0)
+    base += 0.02 * rng.standard_normal(DIMENSION).astype(np.float32)
+    return base / np.linalg.norm(base)
+
+
+def top_k(corpus, consulta, k):
+    similitudes = corpus @ consulta
+    indices = np.argpartition(-similitudes, k)[:k]
+    return indices[np.argsort(-similitudes[indices])], similitudes
+
+
+def modo_similarity(corpus, consulta):
+    indices, _ = top_k(corpus, consulta, K)
+    return list(indices)
+
+
+def modo_umbral(corpus, consulta):
+    indices, similitudes = top_k(corpus, consulta, K)
+    return [i for i in indices if similitudes[i] >= UMBRAL]
+
+
+def modo_mmr(corpus, consulta):
+    indices, _ = top_k(corpus, consulta, FETCH_K)
+    elegidos = seleccionar_mmr(consulta, corpus[indices], k=K, lambda_mult=LAMBDA)
+    return [indices[i] for i in elegidos]
+
+
+def modo_mmr_langchain(corpus, consulta):
+    from langchain_community.vectorstores.utils import maximal_marginal_relevance
+    indices, _ = top_k(corpus, consulta, FETCH_K)
+    elegidos = maximal_marginal_relevance(consulta, list(corpus[indices]), k=K, lambda_mult=LAMBDA)
+    return [indices[i] for i in elegidos]
+
+
+def diversidad(corpus, indices):
+    """1 - similitud coseno media entre pares de resultados."""
+    if len(indices) < 2:
+        return 0.0
+    vectores = corpus[indices]
+    similitudes = vectores @ vectores.T
+    n = len(indices)
+    return 1.0 - (similitudes.sum() - n) / (n * (n - 1))
+
+
+def main():
+    rng = np.random.default_rng(42)
+    corpus, grupo = generar_corpus(rng)
+    consultas = [generar_consulta(rng, corpus) for _ in range(REPETICIONES)]
+
+    modos = {
+        "similarity": modo_similarity,
+        "similarity_score_threshold": modo_umbral,
+        "mmr (NumPy vectorizado)": modo_mmr,
+        "mmr (langchain)": modo_mmr_langchain,
+    }
+
+    print(f"Corpus: {len(corpus)} vectores de {DIMENSION} dimensiones, k={K}, fetch_k={FETCH_K}")
+    print(f"{'modo':<30}{'p50 ms':>10}{'p95 ms':>10}{'resultados':>12}{'grupos':>10}{'diversidad':>12}{'relevancia':>12}")
+
+    for nombre, modo in modos.items():
+        try:
+            modo(corpus, consultas[0])
+        except ImportError:
+            print(f"{nombre:<30}  (no disponible)")
+            continue
+
+        tiempos, cantidades, grupos, diversidades, relevancias = [], [], [], [], []
+        for consulta in consultas:
+            inicio = time.perf_counter()
+            indices = modo(corpus, consulta)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+
+            indices = np.array(indices, dtype=np.int64)
+            cantidades.append(len(indices))
+            grupos.append(len(set(grupo[indices])))
+            diversidades.append(diversidad(corpus, indices))
+            relevancias.append(float((corpus[indices] @ consulta).mean()) if len(indices) else 0.0)
+
+        print(f"{nombre:<30}{np.percentile(tiempos, 50):>10.3f}{np.percentile(tiempos, 95):>10.3f}"
+              f"{np.mean(cantidades):>12.1f}{np.mean(grupos):>10.1f}"
+              f"{np.mean(diversidades):>12.3f}{np.mean(relevancias):>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
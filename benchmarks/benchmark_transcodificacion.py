@@ -0,0 +1,72 @@
+"""
+Benchmark del transcodificador: tamaño del contenido enviado al reconocedor
+y tiempo de conversión con el audio de ejemplo prueba.m4a (AAC, 48 kHz estéreo).
+
+Comprueba también que la salida es realmente 16 kHz mono y mide el
+rendimiento con varias conversiones simultáneas según el número de procesos
+ffmpeg del grupo. Requiere ffmpeg (o FFMPEG_RUTA apuntando al ejecutable):
+
+    python -m benchmarks.benchmark_transcodificacion
+"""
+import io
+import os
+import statistics
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+from core.transcodificador import FORMATOS_SALIDA, Transcodificador
+
+RUTA_AUDIO = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'prueba.m4a')
+REPETICIONES = 10
+CONVERSIONES_SIMULTANEAS = 8
+PROCESOS = [1, 2, 4]
+
+
+def propiedades(contenido, formato):
+    """Canales y tasa de muestreo leídos de la cabecera de la salida."""
+    if formato == 'WAV':
+        with wave.open(io.BytesIO(contenido), 'rb') as wav:
+            return wav.getnchannels(), wav.getframerate()
+    if formato == 'FLAC':
+        # Bloque STREAMINFO: tasa de 20 bits y canales-1 de 3 bits a partir del byte 18
+        info = int.from_bytes(contenido[18:21], 'big')
+        return ((info >> 1) & 0x7) + 1, info >> 4
+    # OGG Opus: cabecera OpusHead en la primera página
+    cabecera = contenido.index(b'OpusHead')
+    return contenido[cabecera + 9], int.from_bytes(contenido[cabecera + 12:cabecera + 16], 'little')
+
+
+def main():
+    with open(RUTA_AUDIO, 'rb') as f:
+        original = f.read()
+
+    transcodificador = Transcodificador(config.FFMPEG_RUTA)
+    if not transcodificador.disponible:
+        raise SystemExit("ffmpeg no está disponible (configure FFMPEG_RUTA)")
+
+    print(f"original: {len(original)} bytes")
+    print(f"{'formato':>8}{'bytes':>10}{'reducción':>11}{'canales':>9}{'tasa':>8}{'p50 ms':>9}")
+    for formato in FORMATOS_SALIDA:
+        tiempos = []
+        for _ in range(REPETICIONES):
+            inicio = time.perf_counter()
+            salida, formato_reconocedor, _ = transcodificador.transcodificar(original, formato)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        canales, tasa = propiedades(salida, formato if formato != 'OPUS' else 'OGG')
+        assert canales == 1 and tasa == 16000, (formato, canales, tasa)
+        print(f"{formato:>8}{len(salida):>10}{len(original) / len(salida):>10.1f}x"
+              f"{canales:>9}{tasa:>8}{statistics.median(tiempos):>9.1f}")
+
+    print(f"\n{CONVERSIONES_SIMULTANEAS} conversiones FLAC simultáneas")
+    for procesos in PROCESOS:
+        grupo = Transcodificador(config.FFMPEG_RUTA, max_procesos=procesos)
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=CONVERSIONES_SIMULTANEAS) as ejecutor:
+            list(ejecutor.map(lambda _: grupo.transcodificar(original), range(CONVERSIONES_SIMULTANEAS)))
+        print(f"{procesos:>3} proceso(s): {time.perf_counter() - inicio:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
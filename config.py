@@ -0,0 +1,120 @@
+import os
+
+
+def _entero(nombre, defecto):
+    """Lee una variable de entorno entera, usando el valor por defecto si no es válida."""
+    try:
+        return int(os.environ.get(nombre, defecto))
+    except (TypeError, ValueError):
+        return defecto
+
+
+def _flotante(nombre, defecto):
+    """Lee una variable de entorno decimal, usando el valor por defecto si no es válida."""
+    try:
+        return float(os.environ.get(nombre, defecto))
+    except (TypeError, ValueError):
+        return defecto
+
+
+# Historial de conversación
+# Turnos que se envían literalmente al modelo (los más recientes)
+HISTORIAL_TURNOS_RECIENTES = _entero('HISTORIAL_TURNOS_RECIENTES', 6)
+# Presupuesto de tokens para los turnos literales
+HISTORIAL_PRESUPUESTO_TOKENS = _entero('HISTORIAL_PRESUPUESTO_TOKENS', 1500)
+# Presupuesto de tokens para el resumen acumulado de los turnos antiguos
+HISTORIAL_PRESUPUESTO_RESUMEN = _entero('HISTORIAL_PRESUPUESTO_RESUMEN', 400)
+# Conversaciones cuyo resumen se mantiene en caché
+HISTORIAL_MAX_CONVERSACIONES = _entero('HISTORIAL_MAX_CONVERSACIONES', 1000)
+
+# Contexto recuperado que se inserta en el prompt
+CONTEXTO_PRESUPUESTO_TOKENS = _entero('CONTEXTO_PRESUPUESTO_TOKENS', 4000)
+
+# Recuperación de fragmentos: similarity, mmr o similarity_score_threshold
+MODO_BUSQUEDA = os.environ.get('MODO_BUSQUEDA', 'mmr')
+BUSQUEDA_K = _entero('BUSQUEDA_K', 10)
+# Candidatos que se evalúan en modo MMR
+BUSQUEDA_FETCH_K = _entero('BUSQUEDA_FETCH_K', 20)
+# Balance relevancia/diversidad de MMR (1 = solo relevancia)
+BUSQUEDA_LAMBDA = _flotante('BUSQUEDA_LAMBDA', 0.8)
+# Relevancia mínima en modo similarity_score_threshold
+BUSQUEDA_UMBRAL = _flotante('BUSQUEDA_UMBRAL', 0.75)
+
+# Tiempos máximos (segundos) por llamada a OpenAI, por nivel de modelo
+LLM_TIMEOUT_BASICO = _flotante('LLM_TIMEOUT_BASICO', 30)
+LLM_TIMEOUT_AVANZADO = _flotante('LLM_TIMEOUT_AVANZADO', 60)
+EMBEDDINGS_TIMEOUT = _flotante('EMBEDDINGS_TIMEOUT', 10)
+LLM_REINTENTOS = _entero('LLM_REINTENTOS', 1)
+
+# Corta circuitos del modelo de chat
+CIRCUITO_UMBRAL_FALLOS = _entero('CIRCUITO_UMBRAL_FALLOS', 3)
+# Segundos a partir de los cuales una respuesta del modelo se considera lenta
+CIRCUITO_LATENCIA_BASICO = _flotante('CIRCUITO_LATENCIA_BASICO', 20)
+CIRCUITO_LATENCIA_AVANZADO = _flotante('CIRCUITO_LATENCIA_AVANZADO', 40)
+CIRCUITO_LLAMADAS_LENTAS = _entero('CIRCUITO_LLAMADAS_LENTAS', 3)
+CIRCUITO_TIEMPO_APERTURA = _flotante('CIRCUITO_TIEMPO_APERTURA', 30)
+
+# Transcripción de audio
+# Idioma por defecto del reconocimiento (español latinoamericano)
+IDIOMA_TRANSCRIPCION = os.environ.get('IDIOMA_TRANSCRIPCION', 'es-419')
+# Conversión previa del audio a 16 kHz mono con ffmpeg: FLAC, OPUS o WAV
+FFMPEG_RUTA = os.environ.get('FFMPEG_RUTA', 'ffmpeg')
+TRANSCODIFICADOR_FORMATO = os.environ.get('TRANSCODIFICADOR_FORMATO', 'FLAC')
+TRANSCODIFICADOR_PROCESOS = _entero('TRANSCODIFICADOR_PROCESOS', 4)
+TRANSCODIFICADOR_TIMEOUT = _flotante('TRANSCODIFICADOR_TIMEOUT', 30)
+# Reconocimientos de voz simultáneos y segundos máximos de espera por un turno
+TRANSCRIPCION_MAX_SIMULTANEAS = _entero('TRANSCRIPCION_MAX_SIMULTANEAS', 8)
+TRANSCRIPCION_TIMEOUT_COLA = _flotante('TRANSCRIPCION_TIMEOUT_COLA', 10)
+# Caché de transcripciones: entradas en memoria y carpeta opcional para el nivel en disco
+CACHE_TRANSCRIPCION_ENTRADAS = _entero('CACHE_TRANSCRIPCION_ENTRADAS', 512)
+CACHE_TRANSCRIPCION_DIRECTORIO = os.environ.get('CACHE_TRANSCRIPCION_DIRECTORIO', '')
+# Hilos para solapar la transcripción con la preparación de la consulta en /api/consulta/audio
+CONSULTA_AUDIO_HILOS = _entero('CONSULTA_AUDIO_HILOS', 16)
+# Backend de reconocimiento de voz: google o local (simulado, para pruebas de carga sin red)
+BACKEND_VOZ = os.environ.get('BACKEND_VOZ', 'google')
+VOZ_LOCAL_LATENCIA = _flotante('VOZ_LOCAL_LATENCIA', 0.5)
+VOZ_LOCAL_VARIACION = _flotante('VOZ_LOCAL_VARIACION', 0.1)
+VOZ_LOCAL_TASA_FALLOS = _flotante('VOZ_LOCAL_TASA_FALLOS', 0.0)
+# Duración máxima (segundos) del audio que se acepta para transcribir
+AUDIO_DURACION_MAXIMA = _flotante('AUDIO_DURACION_MAXIMA', 900)
+
+# Inicialización en segundo plano del asistente y el transcriptor: segundos
+# de espera tras el primer fallo y máximos entre reintentos
+ARRANQUE_REINTENTO_INICIAL = _flotante('ARRANQUE_REINTENTO_INICIAL', 1)
+ARRANQUE_REINTENTO_MAXIMO = _flotante('ARRANQUE_REINTENTO_MAXIMO', 60)
+
+# Base de datos PostgreSQL
+DB_NOMBRE = os.environ.get('DB_NOMBRE', 'BDRodalex')
+DB_USUARIO = os.environ.get('DB_USUARIO', 'postgres')
+DB_CLAVE = os.environ.get('DB_CLAVE', 'clave123')
+DB_HOST = os.environ.get('DB_HOST', 'localhost')
+DB_PUERTO = os.environ.get('DB_PUERTO', '5432')
+# Pool de conexiones compartido por el proceso: máximo de conexiones abiertas
+# y segundos máximos de espera por una conexión libre
+DB_POOL_MAX = _entero('DB_POOL_MAX', 10)
+DB_POOL_ESPERA = _flotante('DB_POOL_ESPERA', 5)
+
+# /api/base_conocimiento: tamaño máximo de página y filas leídas por lote al enviar la tabla completa
+BASE_CONOCIMIENTO_LIMITE_MAXIMO = _entero('BASE_CONOCIMIENTO_LIMITE_MAXIMO', 1000)
+BASE_CONOCIMIENTO_LOTE = _entero('BASE_CONOCIMIENTO_LOTE', 500)
+# Paquetes versionados de la base de conocimiento para la app móvil: carpeta y
+# cuántos se conservan (los cambios anteriores al más antiguo se descartan)
+PAQUETES_DIRECTORIO = os.environ.get('PAQUETES_DIRECTORIO',
+                                     os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'paquetes'))
+PAQUETES_CONSERVAR = _entero('PAQUETES_CONSERVAR', 3)
+# Carpeta para el índice FAISS y los textos en archivos mapeados en memoria
+# (compartidos por todos los workers); vacía para construir el índice en la
+# memoria de cada proceso
+FAISS_MMAP_DIRECTORIO = os.environ.get('FAISS_MMAP_DIRECTORIO', '')
+# Dónde se buscan los fragmentos: faiss (índice en la memoria de cada nodo) o
+# pgvector (índice HNSW en PostgreSQL, el mismo para todos los nodos)
+BACKEND_VECTORES = os.environ.get('BACKEND_VECTORES', 'faiss')
+# Dimensiones de los embeddings (text-embedding-ada-002)
+EMBEDDINGS_DIMENSIONES = _entero('EMBEDDINGS_DIMENSIONES', 1536)
+# Índice HNSW de pgvector: conexiones por nodo y candidatos al construirlo;
+# PGVECTOR_EF_SEARCH son los candidatos por búsqueda (más = mejor recall y más lento)
+PGVECTOR_HNSW_M = _entero('PGVECTOR_HNSW_M', 16)
+PGVECTOR_HNSW_EF_CONSTRUCCION = _entero('PGVECTOR_HNSW_EF_CONSTRUCCION', 64)
+PGVECTOR_EF_SEARCH = _entero('PGVECTOR_EF_SEARCH', 40)
+# Filas por sentencia COPY al guardar los fragmentos del documento
+INGESTA_LOTE = _entero('INGESTA_LOTE', 1000)
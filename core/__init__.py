@@ -2,7 +2,8 @@
 from .modelo_ia import  AsistenteJuridico;
 from .speech_to_text import GoogleSpeechToText;
 from .base_conocimiento_mobil import BaseConocimientoMobil;
+from .historial_conversacion import GestorHistorial;
 
 
 # Definir qué se debe importar al hacer "from core import *"
-__all__ = ['AsistenteJuridico','GoogleSpeechToText','BaseConocimientoMobil']
\ No newline at end of file
+__all__ = ['AsistenteJuridico','GoogleSpeechToText','BaseConocimientoMobil','GestorHistorial']
\ No newline at end of file
@@ -0,0 +1,86 @@
+import threading
+
+from .metricas import metricas
+
+
+class AlmacenFragmentos:
+    """
+    Copia en memoria de fragmentos_texto: id -> contenido.
+
+    Se llena con la misma carga inicial que reconstruye el índice FAISS
+    (los textos ya están en memoria en ese momento) y se reemplaza entero
+    cuando se vuelve a procesar el documento, así que las consultas por id
+    no necesitan ir a PostgreSQL. Solo guarda el id y el texto (sin
+    embeddings ni metadata).
+
+    Las lecturas no toman ningún lock: cada carga construye un diccionario
+    nuevo y lo publica con una sola asignación, así que un lector ve la
+    versión anterior o la nueva, nunca una mezcla.
+    """
+
+    def __init__(self):
+        self._fragmentos = {}
+        self.version = None
+        self.cargado = False
+        self._lock = threading.Lock()
+
+        self._tamano = metricas.medidor('almacen_fragmentos_tamano', 'Fragmentos en el almacén en memoria')
+        self._aciertos = metricas.contador('almacen_fragmentos_aciertos_total',
+                                           'Fragmentos servidos desde el almacén en memoria')
+        self._fallos = metricas.contador('almacen_fragmentos_fallos_total',
+                                         'Fragmentos no encontrados en el almacén en memoria')
+
+    def cargar(self, filas, version=None):
+        """
+        Reemplaza el contenido del almacén.
+
+        Args:
+            filas: Tuplas (id, contenido) de todos los fragmentos
+            version: Versión de fragmentos_texto a la que corresponden
+        """
+        fragmentos = {id_frag: contenido for id_frag, contenido in filas}
+        with self._lock:
+            self._fragmentos = fragmentos
+            self.version = version
+            self.cargado = True
+        self._tamano.establecer(len(fragmentos))
+
+    def obtener(self, id_frag):
+        """Devuelve la tupla (id, contenido) del fragmento, o None si no está."""
+        contenido = self._fragmentos.get(id_frag)
+        if contenido is None:
+            self._fallos.inc()
+            return None
+        self._aciertos.inc()
+        return id_frag, contenido
+
+    def obtener_varios(self, ids):
+        """
+        Busca varios fragmentos a la vez.
+
+        Returns:
+            tuple: (tuplas (id, contenido) encontradas, en el orden pedido;
+                    ids que no están en el almacén)
+        """
+        fragmentos = self._fragmentos
+        encontrados, faltantes = [], []
+        for id_frag in ids:
+            contenido = fragmentos.get(id_frag)
+            if contenido is None:
+                faltantes.append(id_frag)
+            else:
+                encontrados.append((id_frag, contenido))
+        self._aciertos.inc(len(encontrados))
+        self._fallos.inc(len(faltantes))
+        return encontrados, faltantes
+
+    def todos(self):
+        """Todos los fragmentos como tuplas (id, contenido), ordenados por id."""
+        return sorted(self._fragmentos.items())
+
+    def __len__(self):
+        return len(self._fragmentos)
+
+
+# Almacén del proceso, compartido por el AsistenteJuridico y BaseConocimientoMobil
+almacen_fragmentos = AlmacenFragmentos()
@@ -0,0 +1,202 @@
+import hashlib
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+
+from google.api_core.exceptions import ServiceUnavailable
+from google.cloud import speech_v1 as speech
+
+_cliente_compartido = None
+_lock_cliente = threading.Lock()
+
+# Transcripciones de ejemplo del backend local (consultas típicas de la app)
+TRANSCRIPCIONES_LOCALES = [
+    "me pasé un semáforo en rojo cuánto es la multa",
+    "un policía me pidió mi licencia y no la tenía qué me pueden hacer",
+    "cuántos días me pueden retener el vehículo por no tener soat",
+    "me detuvieron por exceso de velocidad en la carretera a cochabamba",
+    "es legal que el tránsito me quite la placa del auto",
+]
+
+
+def obtener_cliente_speech():
+    """
+    Devuelve el SpeechClient del proceso, creándolo la primera vez.
+
+    El cliente mantiene un canal gRPC que multiplexa llamadas concurrentes,
+    así que se comparte en lugar de abrir una conexión por transcripción.
+    """
+    global _cliente_compartido
+    if _cliente_compartido is None:
+        with _lock_cliente:
+            if _cliente_compartido is None:
+                _cliente_compartido = speech.SpeechClient()
+    return _cliente_compartido
+
+
+class BackendVoz(ABC):
+    """
+    Interfaz de los backends de reconocimiento de voz.
+
+    Sigue la forma del SpeechClient de Google (mismos métodos, argumentos y
+    respuestas), de modo que GoogleSpeechToText funciona igual con cualquier
+    backend y el transcodificador, la caché y el límite de concurrencia se
+    ejercitan también sin credenciales.
+    """
+
+    nombre = None
+
+    @abstractmethod
+    def recognize(self, config, audio):
+        """Reconocimiento síncrono. Devuelve un RecognizeResponse."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def long_running_recognize(self, config, audio):
+        """Reconocimiento de larga duración. Devuelve una operación con result(timeout)."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def streaming_recognize(self, config, requests):
+        """Reconocimiento en streaming. Itera StreamingRecognizeResponse."""
+        raise NotImplementedError
+
+
+class BackendGoogle(BackendVoz):
+    """
+    Backend real: delega en un SpeechClient de Google Cloud.
+
+    Si no se indica un cliente se usa el compartido del proceso, que se crea
+    en la primera llamada (después de configurar las credenciales).
+    """
+
+    nombre = "google"
+
+    def __init__(self, cliente=None):
+        self._cliente = cliente
+
+    def conectar(self):
+        """Crea (o reutiliza) el SpeechClient; permite detectar errores al iniciar."""
+        if self._cliente is None:
+            self._cliente = obtener_cliente_speech()
+        return self._cliente
+
+    @property
+    def cliente(self):
+        return self._cliente or self.conectar()
+
+    def recognize(self, config, audio):
+        return self.cliente.recognize(config=config, audio=audio)
+
+    def long_running_recognize(self, config, audio):
+        return self.cliente.long_running_recognize(config=config, audio=audio)
+
+    def streaming_recognize(self, config, requests):
+        return self.cliente.streaming_recognize(config=config, requests=requests)
+
+
+class _OperacionLocal:
+    """Operación de larga duración ya resuelta, con la interfaz de google.api_core."""
+
+    def __init__(self, funcion):
+        self._funcion = funcion
+
+    def result(self, timeout=None):
+        return self._funcion()
+
+
+class BackendLocal(BackendVoz):
+    """
+    Backend local determinista para pruebas de carga sin red ni credenciales.
+
+    Devuelve una transcripción fija elegida por el hash del audio (el mismo
+    audio produce siempre el mismo texto), tras una latencia configurable, y
+    puede inyectar fallos ServiceUnavailable con una probabilidad dada.
+    """
+
+    nombre = "local"
+
+    def __init__(self, latencia=0.5, variacion=0.1, tasa_fallos=0.0, transcripciones=None, semilla=None):
+        """
+        Args:
+            latencia: Segundos de espera por reconocimiento
+            variacion: Variación aleatoria máxima (+/-) de la latencia, en segundos
+            tasa_fallos: Probabilidad (0-1) de que un reconocimiento falle
+            transcripciones: Textos que se devuelven (por defecto TRANSCRIPCIONES_LOCALES)
+            semilla: Semilla del generador aleatorio, para repetir una prueba exactamente
+        """
+        self.latencia = latencia
+        self.variacion = variacion
+        self.tasa_fallos = tasa_fallos
+        self.transcripciones = transcripciones or TRANSCRIPCIONES_LOCALES
+        self._aleatorio = random.Random(semilla)
+        self._lock = threading.Lock()
+
+    def recognize(self, config, audio):
+        return self._reconocer(audio.content)
+
+    def long_running_recognize(self, config, audio):
+        contenido = audio.content
+        return _OperacionLocal(lambda: self._reconocer(contenido))
+
+    def streaming_recognize(self, config, requests):
+        texto = None
+        recibidos = 0
+        for solicitud in requests:
+            recibidos += 1
+            # El texto se elige con el primer fragmento para que los parciales
+            # sean prefijos del resultado final
+            texto = texto or self._transcripcion(solicitud.audio_content)
+            # Un resultado parcial cada 10 fragmentos (~1 s), como el reconocedor real
+            if config.interim_results and recibidos % 10 == 0:
+                parcial = " ".join(texto.split()[:recibidos // 10])
+                yield speech.StreamingRecognizeResponse(results=[
+                    speech.StreamingRecognitionResult(
+                        alternatives=[speech.SpeechRecognitionAlternative(transcript=parcial)],
+                        is_final=False, stability=0.5)
+                ])
+
+        self._esperar()
+        yield speech.StreamingRecognizeResponse(results=[
+            speech.StreamingRecognitionResult(
+                alternatives=[speech.SpeechRecognitionAlternative(transcript=texto or "", confidence=0.95)],
+                is_final=True)
+        ])
+
+    def _reconocer(self, contenido):
+        self._esperar()
+        return speech.RecognizeResponse(results=[
+            speech.SpeechRecognitionResult(alternatives=[
+                speech.SpeechRecognitionAlternative(transcript=self._transcripcion(contenido), confidence=0.95)
+            ])
+        ])
+
+    def _esperar(self):
+        """Simula la latencia del reconocedor y, según la tasa configurada, un fallo."""
+        with self._lock:
+            espera = max(0.0, self.latencia + self._aleatorio.uniform(-self.variacion, self.variacion))
+            falla = self._aleatorio.random() < self.tasa_fallos
+        time.sleep(espera)
+        if falla:
+            raise ServiceUnavailable("Fallo simulado del backend de voz local")
+
+    def _transcripcion(self, contenido):
+        indice = int.from_bytes(hashlib.sha256(contenido).digest()[:4], 'big')
+        return self.transcripciones[indice % len(self.transcripciones)]
+
+
+def crear_backend_voz(nombre, latencia=0.5, variacion=0.1, tasa_fallos=0.0):
+    """
+    Crea el backend de voz indicado en la configuración.
+
+    Args:
+        nombre: 'google' o 'local'
+        latencia, variacion, tasa_fallos: Comportamiento del backend local (ver BackendLocal)
+    """
+    nombre = (nombre or 'google').lower()
+    if nombre == 'local':
+        return BackendLocal(latencia=latencia, variacion=variacion, tasa_fallos=tasa_fallos)
+    if nombre == 'google':
+        return BackendGoogle()
+    raise ValueError(f"Backend de voz desconocido: {nombre}. Use: google, local")
@@ -1,41 +1,163 @@
-import psycopg2
+import re
+from contextlib import contextmanager
 from pathlib import Path
+from psycopg2 import errors
+from .almacen_fragmentos import almacen_fragmentos
+from .estructura_normativa import condicion_filtros
+from .pool_conexiones import configuracion_bd, obtener_pool
+
+# Búsqueda de texto completo en español, sin distinguir tildes:
+# - f_unaccent: envoltorio IMMUTABLE de unaccent (requisito de columnas generadas e índices)
+# - busqueda: tsvector generado con un índice GIN para la búsqueda por palabras
+# - índice de trigramas sobre el texto normalizado para búsquedas por subcadena
+# - {tabla}_palabras: vocabulario del corpus con índice de trigramas, para
+#   corregir palabras mal escritas sin comparar contra cada fragmento; un
+#   trigger añade las palabras de las filas nuevas
+SQL_BUSQUEDA_TEXTO = """
+    CREATE EXTENSION IF NOT EXISTS unaccent;
+    CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+    CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+        AS $$ SELECT public.unaccent('public.unaccent', $1) $$;
+
+    ALTER TABLE {tabla} ADD COLUMN IF NOT EXISTS busqueda tsvector
+        GENERATED ALWAYS AS (to_tsvector('spanish', f_unaccent(contenido))) STORED;
+    CREATE INDEX IF NOT EXISTS {tabla}_busqueda_idx ON {tabla} USING GIN (busqueda);
+    CREATE INDEX IF NOT EXISTS {tabla}_trigramas_idx ON {tabla} USING GIN (f_unaccent(lower(contenido)) gin_trgm_ops);
+
+    CREATE TABLE IF NOT EXISTS {tabla}_palabras (palabra TEXT PRIMARY KEY);
+    CREATE INDEX IF NOT EXISTS {tabla}_palabras_trigramas_idx ON {tabla}_palabras USING GIN (palabra gin_trgm_ops);
+
+    CREATE OR REPLACE FUNCTION registrar_palabras_busqueda() RETURNS trigger AS $$
+    BEGIN
+        EXECUTE format(
+            'INSERT INTO %I (palabra)
+                 SELECT DISTINCT palabra
+                 FROM nuevas, regexp_split_to_table(f_unaccent(lower(nuevas.contenido)), ''[^a-z0-9]+'') AS palabra
+                 WHERE length(palabra) > 3
+             ON CONFLICT DO NOTHING', TG_TABLE_NAME || '_palabras');
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+
+    DROP TRIGGER IF EXISTS {tabla}_palabras_trigger ON {tabla};
+    CREATE TRIGGER {tabla}_palabras_trigger
+        AFTER INSERT ON {tabla} REFERENCING NEW TABLE AS nuevas
+        FOR EACH STATEMENT EXECUTE FUNCTION registrar_palabras_busqueda();
+
+    INSERT INTO {tabla}_palabras (palabra)
+        SELECT DISTINCT palabra
+        FROM {tabla}, regexp_split_to_table(f_unaccent(lower(contenido)), '[^a-z0-9]+') AS palabra
+        WHERE length(palabra) > 3
+    ON CONFLICT DO NOTHING;
+"""
+
+# Coincidencias por palabras (con raíces en español) o por subcadena, ambas
+# resueltas con los índices GIN y ordenadas por relevancia (ts_rank_cd);
+# {filtro} es la condición sobre metadata de condicion_filtros ("TRUE" sin filtros)
+CONSULTA_BUSQUEDA = """
+    SELECT id, contenido
+    FROM {tabla}
+    WHERE ({filtro})
+      AND (busqueda @@ websearch_to_tsquery('spanish', f_unaccent(%(texto)s))
+           OR f_unaccent(lower(contenido)) LIKE '%%' || f_unaccent(%(patron)s) || '%%')
+    ORDER BY ts_rank_cd(busqueda, websearch_to_tsquery('spanish', f_unaccent(%(texto)s))) DESC, id
+    LIMIT %(limite)s OFFSET %(desplazamiento)s
+"""
+
+# Palabra del vocabulario más parecida (por trigramas) a cada término buscado
+CONSULTA_CORRECCION = """
+    SELECT termino,
+           (SELECT palabra FROM {tabla}_palabras
+            WHERE palabra %% f_unaccent(lower(termino))
+            ORDER BY palabra <-> f_unaccent(lower(termino))
+            LIMIT 1)
+    FROM unnest(%(terminos)s::text[]) AS termino
+"""
+
+# Búsqueda anterior por subcadena: recorre toda la tabla y no ordena por relevancia
+CONSULTA_ILIKE = """
+    SELECT id, contenido FROM {tabla} WHERE ({filtro}) AND contenido ILIKE %(patron_ilike)s
+    ORDER BY id LIMIT %(limite)s OFFSET %(desplazamiento)s
+"""
+
+
+# Fragmentos que cumplen los filtros de metadatos, sin texto de búsqueda
+CONSULTA_FILTRADA = """
+    SELECT id, contenido FROM {tabla} WHERE ({filtro}) AND id > %(desde)s
+    ORDER BY id LIMIT %(limite)s
+"""
+
+
+def parametros_busqueda(texto_busqueda, limite, desplazamiento, filtros=None):
+    """Parámetros de CONSULTA_BUSQUEDA y CONSULTA_ILIKE, con los comodines de LIKE escapados."""
+    patron = texto_busqueda.lower().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return {
+        'texto': texto_busqueda,
+        'patron': patron,
+        'patron_ilike': f'%{patron}%',
+        'limite': limite,
+        'desplazamiento': desplazamiento,
+        **condicion_filtros(filtros)[1]
+    }
+
+
+def buscar_con_correccion(cursor, tabla, texto_busqueda, limite, desplazamiento, filtros=None):
+    """
+    Ejecuta CONSULTA_BUSQUEDA y, si no hay ningún resultado, la repite
+    cambiando cada término por la palabra más parecida del vocabulario
+    (p. ej. "estacionamento" -> "estacionamiento")
+    Con filtros (normalizados, ver normalizar_filtros) solo se buscan los
+    fragmentos cuyos metadatos los cumplen
+    Retorna una lista de tuplas (id, contenido)
+    """
+    consulta = CONSULTA_BUSQUEDA.format(tabla=tabla, filtro=condicion_filtros(filtros)[0])
+    cursor.execute(consulta, parametros_busqueda(texto_busqueda, limite, desplazamiento, filtros))
+    resultados = cursor.fetchall()
+    if resultados or desplazamiento:
+        return resultados
+
+    terminos = re.findall(r'\w{4,}', texto_busqueda)
+    if not terminos:
+        return resultados
+    cursor.execute(CONSULTA_CORRECCION.format(tabla=tabla), {'terminos': terminos})
+    correcciones = {termino: palabra for termino, palabra in cursor.fetchall() if palabra}
+    if not correcciones:
+        return resultados
+
+    corregido = re.sub(r'\w{4,}', lambda m: correcciones.get(m.group(0), m.group(0)), texto_busqueda)
+    cursor.execute(consulta, parametros_busqueda(corregido, limite, desplazamiento, filtros))
+    return cursor.fetchall()
+
 
 class BaseConocimientoMobil:
-    def __init__(self, db_config=None):
+    def __init__(self, db_config=None, almacen=None):
         # Si no se proporciona configuración, usar la del AsistenteJuridico
         if db_config is None:
-            self.db_config = {
-                'dbname': 'BDRodalex',
-                'user': 'postgres',
-                'password': 'clave123',
-                'host': 'localhost',
-                'port': '5432'
-            }
+            self.db_config = configuracion_bd()
         else:
             self.db_config = db_config
+        # Pool compartido con el AsistenteJuridico (no abre conexiones todavía)
+        self.pool = obtener_pool(self.db_config)
+        # Fragmentos en memoria que carga el AsistenteJuridico; la base de
+        # datos solo se consulta si no están cargados o falta algún id
+        self.almacen = almacen or almacen_fragmentos
             
     def obtener_todos_fragmentos(self):
         """
         Obtiene todos los registros de la tabla fragmentos_texto
         Retorna una lista de tuplas (id, contenido)
         """
+        if self.almacen.cargado:
+            return self.almacen.todos()
         try:
-            # Conectar a la base de datos
-            conn = psycopg2.connect(**self.db_config)
-            
-            # Crear un cursor
-            cursor = conn.cursor()
-            
-            # Ejecutar la consulta
-            cursor.execute("SELECT id, contenido FROM fragmentos_texto")
-            
-            # Obtener todos los resultados
-            resultados = cursor.fetchall()
-            
-            # Cerrar cursor y conexión
-            cursor.close()
-            conn.close()
+            # Tomar una conexión del pool (se devuelve al salir del bloque)
+            with self.pool.conexion() as conn:
+                with conn.cursor() as cursor:
+                    # Ejecutar la consulta y obtener todos los resultados
+                    cursor.execute("SELECT id, contenido FROM fragmentos_texto")
+                    resultados = cursor.fetchall()
             
             return resultados
             
@@ -48,15 +170,14 @@ class BaseConocimientoMobil:
         Obtiene un fragmento específico por su ID
         Retorna una tupla (id, contenido) o None si no existe
         """
+        resultado = self.almacen.obtener(id)
+        if resultado is not None:
+            return resultado
         try:
-            conn = psycopg2.connect(**self.db_config)
-            cursor = conn.cursor()
-            
-            cursor.execute("SELECT id, contenido FROM fragmentos_texto WHERE id = %s", (id,))
-            resultado = cursor.fetchone()
-            
-            cursor.close()
-            conn.close()
+            with self.pool.conexion() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT id, contenido FROM fragmentos_texto WHERE id = %s", (id,))
+                    resultado = cursor.fetchone()
             
             return resultado
             
@@ -64,26 +185,173 @@ class BaseConocimientoMobil:
             print(f"Error al conectar a la base de datos: {e}")
             return None
     
-    def buscar_fragmentos(self, texto_busqueda):
+    def obtener_fragmentos_por_ids(self, ids):
+        """
+        Obtiene varios fragmentos por sus IDs, en el orden pedido
+        Retorna una lista de tuplas (id, contenido); los IDs que no existen se omiten
+        """
+        encontrados, faltantes = self.almacen.obtener_varios(ids)
+        if not faltantes:
+            return encontrados
+        try:
+            with self.pool.conexion() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT id, contenido FROM fragmentos_texto WHERE id = ANY(%s)", (faltantes,))
+                    de_base = dict(cursor.fetchall())
+        except Exception as e:
+            print(f"Error al conectar a la base de datos: {e}")
+            de_base = {}
+        
+        fragmentos = dict(encontrados)
+        fragmentos.update(de_base)
+        return [(id_frag, fragmentos[id_frag]) for id_frag in ids if id_frag in fragmentos]
+    
+    def buscar_fragmentos(self, texto_busqueda, limite=50, desplazamiento=0, filtros=None):
         """
-        Busca fragmentos que contengan el texto de búsqueda
+        Busca fragmentos por palabras (con raíces en español y sin distinguir
+        tildes), por subcadena o por palabras parecidas, de más a menos relevante
+        Con filtros (normalizados, ver normalizar_filtros) la búsqueda se
+        restringe a los fragmentos de esa norma, Título, Capítulo o artículos
         Retorna una lista de tuplas (id, contenido)
         """
+        parametros = parametros_busqueda(texto_busqueda, limite, desplazamiento, filtros)
         try:
-            conn = psycopg2.connect(**self.db_config)
-            cursor = conn.cursor()
-            
-            # Búsqueda usando ILIKE para que sea insensible a mayúsculas/minúsculas
-            cursor.execute("SELECT id, contenido FROM fragmentos_texto WHERE contenido ILIKE %s", 
-                          (f'%{texto_busqueda}%',))
-            
-            resultados = cursor.fetchall()
-            
-            cursor.close()
-            conn.close()
+            with self.pool.conexion() as conn:
+                with conn.cursor() as cursor:
+                    try:
+                        resultados = buscar_con_correccion(cursor, 'fragmentos_texto', texto_busqueda,
+                                                           limite, desplazamiento, filtros)
+                    except (errors.UndefinedColumn, errors.UndefinedFunction, errors.UndefinedTable):
+                        # Base sin los índices de búsqueda (p. ej. sin permisos para crear
+                        # las extensiones): se mantiene la búsqueda por subcadena
+                        conn.rollback()
+                        cursor.execute(CONSULTA_ILIKE.format(tabla='fragmentos_texto',
+                                                             filtro=condicion_filtros(filtros)[0]), parametros)
+                        resultados = cursor.fetchall()
             
             return resultados
             
         except Exception as e:
             print(f"Error al conectar a la base de datos: {e}")
-            return []
\ No newline at end of file
+            return []
+    
+    def filtrar_fragmentos(self, filtros, desde=0, limite=100):
+        """
+        Fragmentos cuyos metadatos cumplen los filtros (normalizados, ver
+        normalizar_filtros), resueltos con el índice GIN de metadata
+        Retorna una página de tuplas (id, contenido) con id mayor que `desde`, ordenada por id
+        """
+        condicion, parametros = condicion_filtros(filtros)
+        try:
+            with self.pool.conexion() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(CONSULTA_FILTRADA.format(tabla='fragmentos_texto', filtro=condicion),
+                                   {**parametros, 'desde': desde, 'limite': limite})
+                    return cursor.fetchall()
+        except Exception as e:
+            print(f"Error al conectar a la base de datos: {e}")
+            return []
+
+    def obtener_version(self):
+        """
+        Devuelve la versión actual de fragmentos_texto, que un trigger
+        incrementa con cada escritura, o None si no está disponible
+        """
+        try:
+            with self.pool.conexion() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT version FROM version_tablas WHERE tabla = 'fragmentos_texto'")
+                    resultado = cursor.fetchone()
+            return resultado[0] if resultado else None
+        except errors.UndefinedTable:
+            # Base creada antes de existir la tabla de versiones
+            return None
+
+    def obtener_pagina(self, desde=0, limite=100):
+        """
+        Obtiene hasta `limite` fragmentos con id mayor que `desde`, en orden de id
+        (paginación por clave: cada página es una búsqueda en el índice de la
+        clave primaria, sin OFFSET que recorra las filas anteriores)
+        Retorna una lista de tuplas (id, contenido)
+        """
+        with self.pool.conexion() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT id, contenido FROM fragmentos_texto WHERE id > %s ORDER BY id LIMIT %s",
+                               (desde, limite))
+                return cursor.fetchall()
+
+    def iterar_fragmentos(self, desde=0, tamano_lote=500):
+        """
+        Recorre los fragmentos con id mayor que `desde` por lotes de
+        `tamano_lote`, tomando una conexión del pool solo mientras se lee
+        cada lote (no durante el envío al cliente)
+        Genera tuplas (id, contenido)
+        """
+        while True:
+            lote = self.obtener_pagina(desde, tamano_lote)
+            yield from lote
+            if len(lote) < tamano_lote:
+                return
+            desde = lote[-1][0]
+
+    @contextmanager
+    def instantanea(self, tamano_lote=1000):
+        """
+        Lee la versión y todos los fragmentos en una misma instantánea
+        (REPEATABLE READ), de modo que las filas corresponden exactamente a
+        esa versión aunque haya escrituras mientras se recorren
+        Genera (version, iterador de tuplas (id, contenido))
+        """
+        with self.pool.conexion() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+                cursor.execute("SELECT version FROM version_tablas WHERE tabla = 'fragmentos_texto'")
+                version = cursor.fetchone()[0]
+            # Cursor del lado del servidor: las filas llegan por lotes
+            with conn.cursor(name='instantanea_fragmentos') as filas:
+                filas.itersize = tamano_lote
+                filas.execute("SELECT id, contenido FROM fragmentos_texto ORDER BY id")
+                yield version, filas
+
+    def obtener_cambios(self, desde):
+        """
+        Obtiene los fragmentos agregados, modificados o eliminados después
+        de la versión `desde`, leyendo solo el registro de cambios (el costo
+        depende del tamaño del cambio, no del de la base)
+        Retorna (version actual, lista de tuplas (id, contenido), lista de ids
+        eliminados); las listas son None si no hay cambios registrados desde
+        esa versión y el cliente debe descargar el paquete completo
+        """
+        with self.pool.conexion() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+                cursor.execute("SELECT version, version_minima FROM version_tablas WHERE tabla = 'fragmentos_texto'")
+                version, version_minima = cursor.fetchone()
+                if desde < version_minima or desde > version:
+                    return version, None, None
+
+                cursor.execute("""
+                    SELECT c.id_fragmento, f.contenido
+                    FROM (SELECT DISTINCT id_fragmento FROM cambios_fragmentos WHERE version > %s) c
+                    LEFT JOIN fragmentos_texto f ON f.id = c.id_fragmento
+                    ORDER BY c.id_fragmento
+                """, (desde,))
+                filas = cursor.fetchall()
+
+        actualizados = [(id_frag, contenido) for id_frag, contenido in filas if contenido is not None]
+        eliminados = [id_frag for id_frag, contenido in filas if contenido is None]
+        return version, actualizados, eliminados
+
+    def podar_cambios(self, hasta_version):
+        """
+        Borra los cambios registrados hasta `hasta_version` inclusive; los
+        clientes con una versión anterior tendrán que descargar un paquete
+        """
+        with self.pool.conexion() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("DELETE FROM cambios_fragmentos WHERE version <= %s", (hasta_version,))
+                cursor.execute("""
+                    UPDATE version_tablas SET version_minima = GREATEST(version_minima, %s)
+                    WHERE tabla = 'fragmentos_texto'
+                """, (hasta_version,))
+            conn.commit()
@@ -0,0 +1,112 @@
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+from .metricas import metricas
+
+logger = logging.getLogger(__name__)
+
+
+class CacheTranscripcion:
+    """
+    Caché de transcripciones direccionada por contenido.
+
+    La clave es el SHA-256 de los bytes del audio junto con el idioma, el
+    formato y el modo, así que un reintento de subida del mismo audio
+    devuelve el texto sin volver a llamar (ni pagar) al reconocedor.
+
+    Tiene dos niveles: un LRU acotado en memoria y, opcionalmente, un
+    directorio local que sobrevive a reinicios y se comparte entre procesos
+    de la misma máquina.
+    """
+
+    def __init__(self, max_entradas=512, directorio=None):
+        """
+        Args:
+            max_entradas: Transcripciones que se mantienen en memoria
+            directorio: Carpeta para el nivel en disco (None para desactivarlo)
+        """
+        self.max_entradas = max_entradas
+        self.directorio = directorio or None
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+
+        if self.directorio:
+            os.makedirs(self.directorio, exist_ok=True)
+
+        self._aciertos_memoria = metricas.contador('cache_transcripcion_aciertos_memoria_total',
+                                                   'Transcripciones servidas desde la caché en memoria')
+        self._aciertos_disco = metricas.contador('cache_transcripcion_aciertos_disco_total',
+                                                 'Transcripciones servidas desde la caché en disco')
+        self._fallos = metricas.contador('cache_transcripcion_fallos_total', 'Transcripciones no encontradas en caché')
+
+    @staticmethod
+    def clave(contenido, idioma, formato=None, modo=None):
+        """Clave de caché para un audio y los parámetros que cambian su transcripción."""
+        resumen = hashlib.sha256(contenido)
+        resumen.update(f"|{idioma}|{(formato or '').upper()}|{modo or ''}".encode('utf-8'))
+        return resumen.hexdigest()
+
+    def obtener(self, clave):
+        """Devuelve la transcripción guardada para la clave, o None."""
+        with self._lock:
+            texto = self._entradas.get(clave)
+            if texto is not None:
+                self._entradas.move_to_end(clave)
+        if texto is not None:
+            self._aciertos_memoria.inc()
+            return texto
+
+        texto = self._leer_disco(clave)
+        if texto is not None:
+            self._aciertos_disco.inc()
+            self._guardar_memoria(clave, texto)
+            return texto
+
+        self._fallos.inc()
+        return None
+
+    def guardar(self, clave, texto):
+        """Guarda una transcripción en memoria y, si está activado, en disco."""
+        self._guardar_memoria(clave, texto)
+        self._escribir_disco(clave, texto)
+
+    def _guardar_memoria(self, clave, texto):
+        with self._lock:
+            self._entradas[clave] = texto
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+
+    def _ruta(self, clave):
+        # Subcarpetas por prefijo para no acumular miles de archivos en una sola
+        return os.path.join(self.directorio, clave[:2], f"{clave}.txt")
+
+    def _leer_disco(self, clave):
+        if not self.directorio:
+            return None
+        try:
+            with open(self._ruta(clave), encoding='utf-8') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.warning(f"No se pudo leer la caché de transcripciones: {e}")
+            return None
+
+    def _escribir_disco(self, clave, texto):
+        if not self.directorio:
+            return
+        ruta = self._ruta(clave)
+        try:
+            os.makedirs(os.path.dirname(ruta), exist_ok=True)
+            # Escritura atómica: otro proceso nunca lee un archivo a medias
+            descriptor, temporal = tempfile.mkstemp(dir=os.path.dirname(ruta), suffix='.tmp')
+            with os.fdopen(descriptor, 'w', encoding='utf-8') as f:
+                f.write(texto)
+            os.replace(temporal, ruta)
+        except OSError as e:
+            logger.warning(f"No se pudo escribir la caché de transcripciones: {e}")
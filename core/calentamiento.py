@@ -0,0 +1,171 @@
+import logging
+import os
+import threading
+import time
+
+from .metricas import metricas
+
+logger = logging.getLogger(__name__)
+
+
+class Servicio:
+    """Estado de arranque de un servicio registrado en Calentamiento."""
+
+    INICIANDO = "iniciando"
+    REINTENTANDO = "reintentando"
+    LISTO = "listo"
+
+    def __init__(self, nombre, fabrica, al_iniciar=None):
+        self.nombre = nombre
+        self.fabrica = fabrica
+        self.al_iniciar = al_iniciar
+        self.instancia = None
+        self.estado = self.INICIANDO
+        self.intentos = 0
+        self.ultimo_error = None
+        self.segundos_arranque = None
+        self.listo = threading.Event()
+        self.hilo = None
+
+        self._listo = metricas.medidor('servicio_listo', 'Servicios inicializados y listos (1) o no (0)',
+                                       etiquetas={'servicio': nombre})
+        self._fallos = metricas.contador('servicio_arranque_fallos_total', 'Intentos de arranque fallidos',
+                                         etiquetas={'servicio': nombre})
+        self._duracion = metricas.histograma('servicio_arranque_segundos', 'Tiempo hasta que el servicio quedó listo',
+                                             etiquetas={'servicio': nombre})
+
+    def marcar_fallo(self, error):
+        self.estado = self.REINTENTANDO
+        self.ultimo_error = str(error)
+        self._fallos.inc()
+
+    def marcar_listo(self, instancia, segundos):
+        self.instancia = instancia
+        self.estado = self.LISTO
+        self.ultimo_error = None
+        self.segundos_arranque = segundos
+        self._duracion.observar(segundos)
+        self._listo.establecer(1)
+        self.listo.set()
+
+
+class Calentamiento:
+    """
+    Inicializa en segundo plano los servicios costosos de la aplicación.
+
+    Cada servicio se construye en su propio hilo, así que el proceso acepta
+    solicitudes desde el primer momento y cada endpoint empieza a responder
+    en cuanto su propio servicio está listo (la transcripción no espera a
+    que se cargue la base de conocimiento). Si la construcción falla se
+    reintenta con espera exponencial, de `reintento_inicial` hasta
+    `reintento_maximo` segundos, en lugar de dejar el servicio caído hasta
+    reiniciar el proceso.
+    """
+
+    def __init__(self, reintento_inicial=1, reintento_maximo=60):
+        """
+        Args:
+            reintento_inicial: Segundos de espera tras el primer fallo
+            reintento_maximo: Segundos máximos de espera entre intentos
+        """
+        self.reintento_inicial = reintento_inicial
+        self.reintento_maximo = reintento_maximo
+        self._servicios = {}
+        self._iniciado = False
+        self._lock = threading.Lock()
+        # Los hilos no sobreviven a un fork (p. ej. gunicorn --preload): el hijo
+        # vuelve a arrancar los servicios que aún no estaban listos
+        os.register_at_fork(after_in_child=self._reanudar_tras_fork)
+
+    def registrar(self, nombre, fabrica, al_iniciar=None):
+        """
+        Registra un servicio.
+
+        Args:
+            nombre: Nombre del servicio (para obtener() y el endpoint de salud)
+            fabrica: Función sin argumentos que construye el servicio; si lanza
+                una excepción se vuelve a intentar
+            al_iniciar: Función opcional que recibe la instancia una vez lista;
+                se ejecuta después de marcar el servicio como listo, así que no
+                retrasa sus endpoints (sus errores solo se registran)
+        """
+        with self._lock:
+            self._servicios[nombre] = Servicio(nombre, fabrica, al_iniciar)
+
+    def iniciar(self):
+        """Lanza un hilo de arranque por cada servicio registrado."""
+        with self._lock:
+            self._iniciado = True
+            for servicio in self._servicios.values():
+                self._lanzar(servicio)
+
+    def _lanzar(self, servicio):
+        servicio.hilo = threading.Thread(target=self._arrancar, args=(servicio,),
+                                         name=f'arranque-{servicio.nombre}', daemon=True)
+        servicio.hilo.start()
+
+    def _arrancar(self, servicio):
+        espera = self.reintento_inicial
+        inicio = time.monotonic()
+        while True:
+            servicio.intentos += 1
+            try:
+                instancia = servicio.fabrica()
+                break
+            except Exception as e:
+                servicio.marcar_fallo(e)
+                logger.error(f"Error al inicializar {servicio.nombre} (intento {servicio.intentos}), "
+                             f"nuevo intento en {espera:g}s: {e}")
+                time.sleep(espera)
+                espera = min(espera * 2, self.reintento_maximo)
+
+        servicio.marcar_listo(instancia, time.monotonic() - inicio)
+        logger.info(f"{servicio.nombre} inicializado en {servicio.segundos_arranque:.1f}s "
+                    f"({servicio.intentos} intento(s))")
+
+        if servicio.al_iniciar:
+            try:
+                servicio.al_iniciar(instancia)
+            except Exception as e:
+                logger.warning(f"Error tras inicializar {servicio.nombre}: {e}")
+
+    def _reanudar_tras_fork(self):
+        self._lock = threading.Lock()
+        if not self._iniciado:
+            return
+        for servicio in self._servicios.values():
+            if servicio.estado != Servicio.LISTO:
+                servicio.intentos = 0
+                servicio.listo = threading.Event()
+                self._lanzar(servicio)
+
+    def obtener(self, nombre):
+        """Devuelve la instancia del servicio, o None si todavía no está listo."""
+        return self._servicios[nombre].instancia
+
+    def esperar(self, nombre, timeout=None):
+        """
+        Bloquea hasta que el servicio esté listo.
+
+        Returns:
+            bool: True si quedó listo dentro de `timeout` segundos
+        """
+        return self._servicios[nombre].listo.wait(timeout)
+
+    def listos(self, nombres=None):
+        """True si todos los servicios indicados (por defecto, todos) están listos."""
+        nombres = self._servicios if nombres is None else nombres
+        return all(self._servicios[nombre].estado == Servicio.LISTO for nombre in nombres)
+
+    def estado(self):
+        """Estado de arranque de cada servicio, para los endpoints de salud."""
+        return {
+            nombre: {
+                "estado": servicio.estado,
+                "intentos": servicio.intentos,
+                "ultimo_error": servicio.ultimo_error,
+                "segundos_arranque": (round(servicio.segundos_arranque, 3)
+                                      if servicio.segundos_arranque is not None else None)
+            }
+            for nombre, servicio in self._servicios.items()
+        }
@@ -0,0 +1,138 @@
+import threading
+import time
+
+
+class CircuitoAbiertoError(Exception):
+    """Se lanza cuando se intenta llamar a un servicio con el circuito abierto."""
+
+
+class CortaCircuitos:
+    """
+    Corta circuitos para llamadas a servicios externos (por ejemplo, el modelo de chat).
+
+    - cerrado: las llamadas pasan normalmente.
+    - abierto: tras `umbral_fallos` fallos consecutivos, o `llamadas_lentas`
+      llamadas consecutivas por encima de `umbral_latencia`, se rechazan las
+      llamadas durante `tiempo_apertura` segundos.
+    - semiabierto: pasado ese tiempo se deja pasar una única llamada de prueba;
+      si tiene éxito el circuito se cierra, si falla vuelve a abrirse.
+    """
+
+    CERRADO = "cerrado"
+    ABIERTO = "abierto"
+    SEMIABIERTO = "semiabierto"
+
+    def __init__(self, nombre, umbral_fallos=3, umbral_latencia=None, llamadas_lentas=3, tiempo_apertura=30):
+        """
+        Args:
+            nombre: Nombre del servicio protegido (para diagnóstico)
+            umbral_fallos: Fallos consecutivos que abren el circuito
+            umbral_latencia: Segundos a partir de los cuales una llamada se considera lenta (None = sin límite)
+            llamadas_lentas: Llamadas lentas consecutivas que abren el circuito
+            tiempo_apertura: Segundos que el circuito permanece abierto antes de probar de nuevo
+        """
+        self.nombre = nombre
+        self.umbral_fallos = umbral_fallos
+        self.umbral_latencia = umbral_latencia
+        self.llamadas_lentas = llamadas_lentas
+        self.tiempo_apertura = tiempo_apertura
+
+        self._estado = self.CERRADO
+        self._fallos_consecutivos = 0
+        self._lentas_consecutivas = 0
+        self._abierto_desde = None
+        self._prueba_en_curso = False
+        self._aperturas = 0
+        self._ultimo_error = None
+        self._lock = threading.Lock()
+
+    def permitir(self):
+        """Indica si se puede realizar una llamada en este momento."""
+        with self._lock:
+            if self._estado == self.CERRADO:
+                return True
+
+            if self._estado == self.ABIERTO:
+                if time.monotonic() - self._abierto_desde < self.tiempo_apertura:
+                    return False
+                self._estado = self.SEMIABIERTO
+                self._prueba_en_curso = False
+
+            # Semiabierto: solo una llamada de prueba a la vez
+            if self._prueba_en_curso:
+                return False
+            self._prueba_en_curso = True
+            return True
+
+    def abierto(self):
+        """Indica si el circuito rechaza las llamadas ahora, sin ocupar la llamada de prueba."""
+        with self._lock:
+            return self._estado == self.ABIERTO and time.monotonic() - self._abierto_desde < self.tiempo_apertura
+
+    def registrar_exito(self, latencia=None):
+        """Registra una llamada exitosa y su duración en segundos."""
+        with self._lock:
+            self._fallos_consecutivos = 0
+            lenta = (self.umbral_latencia is not None and latencia is not None
+                     and latencia > self.umbral_latencia)
+
+            if lenta:
+                self._lentas_consecutivas += 1
+                if self._estado == self.SEMIABIERTO or self._lentas_consecutivas >= self.llamadas_lentas:
+                    self._abrir(f"latencia de {latencia:.1f}s")
+                    return
+            else:
+                self._lentas_consecutivas = 0
+
+            if self._estado == self.SEMIABIERTO:
+                self._estado = self.CERRADO
+                self._prueba_en_curso = False
+
+    def registrar_fallo(self, error=None):
+        """Registra una llamada fallida (error o tiempo agotado)."""
+        with self._lock:
+            self._fallos_consecutivos += 1
+            self._ultimo_error = str(error) if error else None
+            if self._estado == self.SEMIABIERTO or self._fallos_consecutivos >= self.umbral_fallos:
+                self._abrir(self._ultimo_error)
+
+    def llamar(self, funcion, *args, **kwargs):
+        """
+        Ejecuta `funcion` protegida por el circuito.
+
+        Raises:
+            CircuitoAbiertoError: Si el circuito está abierto
+        """
+        if not self.permitir():
+            raise CircuitoAbiertoError(f"Circuito '{self.nombre}' abierto")
+        inicio = time.monotonic()
+        try:
+            resultado = funcion(*args, **kwargs)
+        except Exception as e:
+            self.registrar_fallo(e)
+            raise
+        self.registrar_exito(time.monotonic() - inicio)
+        return resultado
+
+    def _abrir(self, motivo):
+        if self._estado != self.ABIERTO:
+            self._aperturas += 1
+            print(f"Circuito '{self.nombre}' abierto: {motivo}")
+        self._estado = self.ABIERTO
+        self._abierto_desde = time.monotonic()
+        self._prueba_en_curso = False
+
+    def estado(self):
+        """Estado actual del circuito, para el endpoint de salud."""
+        with self._lock:
+            reapertura = None
+            if self._estado == self.ABIERTO:
+                reapertura = max(0.0, self.tiempo_apertura - (time.monotonic() - self._abierto_desde))
+            return {
+                "estado": self._estado,
+                "fallos_consecutivos": self._fallos_consecutivos,
+                "lentas_consecutivas": self._lentas_consecutivas,
+                "aperturas": self._aperturas,
+                "segundos_para_reintentar": reapertura,
+                "ultimo_error": self._ultimo_error
+            }
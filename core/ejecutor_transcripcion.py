@@ -0,0 +1,92 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from .metricas import metricas
+
+
+class TranscripcionSaturadaError(Exception):
+    """Se lanza cuando una transcripción espera en cola más del tiempo máximo."""
+
+
+class EjecutorTranscripcion:
+    """
+    Limita las llamadas simultáneas al reconocedor de voz.
+
+    Todas las transcripciones comparten un único cliente (y su canal gRPC);
+    como cada llamada ocupa un hilo de Flask durante todo el reconocimiento,
+    se permiten como mucho `max_simultaneas` a la vez. Las demás esperan en
+    cola hasta `timeout_cola` segundos y, si no consiguen turno, se rechazan
+    con TranscripcionSaturadaError en lugar de acumular hilos bloqueados.
+    """
+
+    def __init__(self, max_simultaneas=8, timeout_cola=10):
+        """
+        Args:
+            max_simultaneas: Reconocimientos en curso como máximo
+            timeout_cola: Segundos máximos de espera por un turno
+        """
+        self.max_simultaneas = max_simultaneas
+        self.timeout_cola = timeout_cola
+        self._turnos = threading.BoundedSemaphore(max_simultaneas)
+
+        self._en_curso = metricas.medidor('transcripciones_en_curso', 'Reconocimientos de voz en curso')
+        self._en_cola = metricas.medidor('transcripciones_en_cola', 'Reconocimientos esperando turno')
+        self._rechazadas = metricas.contador('transcripciones_rechazadas_total',
+                                             'Reconocimientos rechazados por esperar demasiado en cola')
+        self._espera = metricas.histograma('transcripcion_espera_cola_segundos',
+                                           'Espera en cola por un turno de reconocimiento')
+        self._remoto = metricas.histograma('transcripcion_reconocimiento_remoto_segundos',
+                                           'Duración de cada llamada al reconocedor')
+
+    def ejecutar(self, funcion, *args, **kwargs):
+        """
+        Ejecuta `funcion` cuando hay un turno libre.
+
+        Raises:
+            TranscripcionSaturadaError: Si no hay turno en `timeout_cola` segundos
+        """
+        with self.turno():
+            return funcion(*args, **kwargs)
+
+    @contextmanager
+    def turno(self):
+        """
+        Ocupa un turno mientras dura el bloque `with`, para reconocimientos que
+        no son una sola llamada (por ejemplo, un reconocimiento en streaming).
+
+        Raises:
+            TranscripcionSaturadaError: Si no hay turno en `timeout_cola` segundos
+        """
+        self._en_cola.inc()
+        inicio = time.monotonic()
+        try:
+            obtenido = self._turnos.acquire(timeout=self.timeout_cola)
+        finally:
+            self._en_cola.dec()
+        if not obtenido:
+            self._rechazadas.inc()
+            raise TranscripcionSaturadaError(
+                f"Hay {self.max_simultaneas} transcripciones en curso; "
+                f"no se obtuvo turno en {self.timeout_cola}s")
+
+        self._espera.observar(time.monotonic() - inicio)
+        self._en_curso.inc()
+        inicio = time.monotonic()
+        try:
+            yield
+        finally:
+            self._remoto.observar(time.monotonic() - inicio)
+            self._en_curso.dec()
+            self._turnos.release()
+
+    def estado(self):
+        """Ocupación actual y espera media en cola, para el endpoint de salud."""
+        atendidas = self._espera.conteo
+        return {
+            "en_curso": self._en_curso.valor,
+            "en_cola": self._en_cola.valor,
+            "max_simultaneas": self.max_simultaneas,
+            "rechazadas": self._rechazadas.valor,
+            "espera_media_ms": round(self._espera.suma / atendidas * 1000, 1) if atendidas else 0.0
+        }
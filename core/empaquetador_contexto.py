@@ -0,0 +1,198 @@
+import re
+from typing import Any
+
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from utils.helpers import contar_tokens
+
+
+class EmpaquetadorContexto:
+    """
+    Arma el contexto que la cadena "stuff" inserta en el prompt.
+
+    Los fragmentos recuperados se solapan mucho entre sí (chunk_overlap=500),
+    así que antes de enviarlos al modelo:
+
+    1. Fusiona fragmentos contiguos o solapados de la misma fuente.
+    2. Descarta casi duplicados (por similitud de shingles de palabras).
+    3. Llena un presupuesto de tokens por orden de relevancia; si un fragmento
+       no cabe entero se recorta en el último límite de artículo o párrafo.
+    """
+
+    # Inicio de un artículo, usado como punto de corte preferido al recortar
+    PATRON_ARTICULO = re.compile(r'\n(?=Art[íi]culo\s|ART[ÍI]CULO\s|Art\.\s|ART\.\s)')
+
+    def __init__(self, presupuesto_tokens=4000, solapamiento_minimo=50,
+                 umbral_duplicado=0.8, tamano_shingle=5, tokens_minimos_recorte=150):
+        """
+        Args:
+            presupuesto_tokens: Tokens máximos para el contexto completo
+            solapamiento_minimo: Caracteres mínimos en común para considerar dos fragmentos solapados
+            umbral_duplicado: Similitud (Jaccard o contención) a partir de la cual se descarta un fragmento
+            tamano_shingle: Palabras por shingle para la detección de casi duplicados
+            tokens_minimos_recorte: No se incluyen recortes más pequeños que esto
+        """
+        self.presupuesto_tokens = presupuesto_tokens
+        self.solapamiento_minimo = solapamiento_minimo
+        self.umbral_duplicado = umbral_duplicado
+        self.tamano_shingle = tamano_shingle
+        self.tokens_minimos_recorte = tokens_minimos_recorte
+
+    def empaquetar(self, documentos):
+        """
+        Args:
+            documentos (list[Document]): Fragmentos ordenados de mayor a menor relevancia
+
+        Returns:
+            list[Document]: Contexto final, en orden de relevancia
+        """
+        if not documentos:
+            return []
+
+        fusionados = self._fusionar(list(documentos))
+        unicos = self._descartar_duplicados(fusionados)
+        return self._llenar_presupuesto(unicos)
+
+    # Fusión de fragmentos solapados
+
+    def _fusionar(self, documentos):
+        # Cada grupo: [rango de relevancia, texto, metadata, inicio, cantidad de fragmentos]
+        grupos = []
+        for rango, doc in enumerate(documentos):
+            inicio = doc.metadata.get("start_index")
+            grupos.append([rango, doc.page_content, dict(doc.metadata), inicio, 1])
+
+        hubo_fusion = True
+        while hubo_fusion:
+            hubo_fusion = False
+            for i in range(len(grupos)):
+                for j in range(len(grupos)):
+                    if i == j or grupos[i] is None or grupos[j] is None:
+                        continue
+                    if grupos[i][2].get("source") != grupos[j][2].get("source"):
+                        continue
+                    texto = self._unir(grupos[i], grupos[j])
+                    if texto is None:
+                        continue
+                    a, b = grupos[i], grupos[j]
+                    mejor = a if a[0] <= b[0] else b
+                    grupos[i] = [mejor[0], texto, mejor[2], a[3], a[4] + b[4]]
+                    grupos[j] = None
+                    hubo_fusion = True
+
+        resultado = []
+        for grupo in sorted((g for g in grupos if g is not None), key=lambda g: g[0]):
+            rango, texto, metadata, inicio, cantidad = grupo
+            metadata = dict(metadata)
+            if inicio is not None:
+                metadata["start_index"] = inicio
+            if cantidad > 1:
+                metadata["fragmentos_fusionados"] = cantidad
+            resultado.append(Document(page_content=texto, metadata=metadata))
+        return resultado
+
+    def _unir(self, a, b):
+        """
+        Devuelve el texto de `a` seguido de `b` si `b` continúa a `a`
+        (contiguo o solapado), o None si no están relacionados en ese orden.
+        """
+        texto_a, inicio_a = a[1], a[3]
+        texto_b, inicio_b = b[1], b[3]
+
+        # Con posiciones conocidas la decisión es exacta
+        if inicio_a is not None and inicio_b is not None:
+            fin_a = inicio_a + len(texto_a)
+            if inicio_a <= inicio_b <= fin_a:
+                if inicio_b + len(texto_b) <= fin_a:
+                    return texto_a  # b está contenido en a
+                return texto_a + texto_b[fin_a - inicio_b:]
+            return None
+
+        # Sin posiciones (fragmentos antiguos): buscar sufijo de a == prefijo de b
+        if texto_b in texto_a:
+            return texto_a
+        semilla = texto_b[:self.solapamiento_minimo]
+        if len(semilla) < self.solapamiento_minimo:
+            return None
+        posicion = texto_a.find(semilla)
+        while posicion != -1:
+            cola = texto_a[posicion:]
+            if texto_b.startswith(cola):
+                return texto_a + texto_b[len(cola):]
+            posicion = texto_a.find(semilla, posicion + 1)
+        return None
+
+    # Casi duplicados
+
+    def _shingles(self, texto):
+        palabras = re.findall(r'\w+', texto.lower())
+        n = self.tamano_shingle
+        if len(palabras) < n:
+            return {tuple(palabras)} if palabras else set()
+        return {tuple(palabras[i:i + n]) for i in range(len(palabras) - n + 1)}
+
+    def _descartar_duplicados(self, documentos):
+        conservados = []
+        firmas = []
+        for doc in documentos:
+            firma = self._shingles(doc.page_content)
+            duplicado = False
+            for otra in firmas:
+                if not firma or not otra:
+                    continue
+                comunes = len(firma & otra)
+                jaccard = comunes / len(firma | otra)
+                contencion = comunes / min(len(firma), len(otra))
+                if jaccard >= self.umbral_duplicado or contencion >= self.umbral_duplicado:
+                    duplicado = True
+                    break
+            if not duplicado:
+                conservados.append(doc)
+                firmas.append(firma)
+        return conservados
+
+    # Presupuesto de tokens
+
+    def _llenar_presupuesto(self, documentos):
+        contexto = []
+        restante = self.presupuesto_tokens
+        for doc in documentos:
+            tokens = contar_tokens(doc.page_content)
+            if tokens <= restante:
+                contexto.append(doc)
+                restante -= tokens
+            elif restante >= self.tokens_minimos_recorte:
+                recorte = self._recortar(doc.page_content, restante)
+                if recorte:
+                    metadata = dict(doc.metadata, recortado=True)
+                    contexto.append(Document(page_content=recorte, metadata=metadata))
+                    restante -= contar_tokens(recorte)
+        return contexto
+
+    def _recortar(self, texto, tokens_maximos):
+        """Recorta el texto a tokens_maximos, cortando en un artículo o párrafo completo."""
+        # Aproximación inicial proporcional y ajuste hasta que quepa
+        limite = int(len(texto) * tokens_maximos / max(contar_tokens(texto), 1))
+        while limite > 0 and contar_tokens(texto[:limite]) > tokens_maximos:
+            limite = int(limite * 0.9)
+        recorte = texto[:limite]
+
+        cortes = [m.start() for m in self.PATRON_ARTICULO.finditer(recorte)]
+        if cortes and cortes[-1] > 0:
+            return recorte[:cortes[-1]].rstrip()
+        parrafo = recorte.rfind('\n\n')
+        if parrafo > 0:
+            return recorte[:parrafo].rstrip()
+        return None
+
+
+class RecuperadorEmpaquetado(BaseRetriever):
+    """Recuperador que aplica EmpaquetadorContexto sobre los resultados de otro recuperador."""
+
+    recuperador: BaseRetriever
+    empaquetador: Any
+
+    def _get_relevant_documents(self, query, *, run_manager):
+        documentos = self.recuperador.invoke(query, config={"callbacks": run_manager.get_child()})
+        return self.empaquetador.empaquetar(documentos)
@@ -0,0 +1,312 @@
+import json
+import re
+import unicodedata
+from bisect import bisect_left, bisect_right
+
+# Inicio de cada norma: "Bolivia: Código de Tránsito, 16 de febrero de 1973"
+# (a veces con guiones bajos y partido en dos líneas) o, en las normas sin
+# esa cabecera, "DECRETO SUPREMO Nº 29293" / "RESOLUCIÓN MINISTERIAL N* 101/2022"
+PATRON_DOCUMENTO = re.compile(r'Bolivia:[\s_]*(.+)')
+PATRON_NORMA = re.compile(
+    r'(DECRETO SUPREMO|RESOLUCI[OÓ]N ADMINISTRATIVA|RESOLUCI[OÓ]N MINISTERIAL)\s+N\S*\s*(\d+(?:\s*/\s*\d+)?)'
+)
+PATRON_FECHA = re.compile(r',\s*\d{1,2}\s+de\s')
+
+PATRON_TITULO = re.compile(r'(?:T[ÍI]TULO|T[íi]tulo)\s+(\S+)\s*(.*)')
+PATRON_CAPITULO = re.compile(r'(?:CAP[ÍI]TULO|Cap[íi]tulo)\s+(\S+)\s*(.*)')
+
+# Encabezado de artículo al inicio de línea: "Artículo 380°.-", "ARTÍCULO 4.-",
+# "ART. 382 INFRACCIONES"; no las referencias como "Artículo 20 del presente..."
+PATRON_ARTICULO = re.compile(
+    r'(?:ART[ÍI]CULO|Art[íi]culo|ART\.|Art\.)\s*(\d+)\s*(?:[°º.\-–]|$|(?=[A-ZÁÉÍÓÚÑ]{3}))'
+)
+
+ORDINALES = {
+    'primero': 'I', 'segundo': 'II', 'tercero': 'III', 'cuarto': 'IV', 'quinto': 'V',
+    'sexto': 'VI', 'septimo': 'VII', 'octavo': 'VIII', 'noveno': 'IX', 'decimo': 'X',
+    'unico': 'UNICO'
+}
+PATRON_ROMANO = re.compile(r'C{0,3}(XC|XL|L?X{0,3})(IX|IV|V?I{0,3})')
+ROMANOS = [(100, 'C'), (90, 'XC'), (50, 'L'), (40, 'XL'), (10, 'X'), (9, 'IX'), (5, 'V'), (4, 'IV'), (1, 'I')]
+
+CLAVES_FILTRO = ('documento', 'titulo', 'capitulo', 'articulo', 'tema')
+
+# Misma normalización que sin_tildes(), en SQL y sin extensiones
+SQL_SIN_TILDES = "translate(lower({}), 'áéíóúüñÁÉÍÓÚÜÑ', 'aeiouunaeiouun')"
+
+
+def sin_tildes(texto):
+    """Minúsculas y sin tildes, para comparar nombres de normas y capítulos."""
+    descompuesto = unicodedata.normalize('NFD', texto.lower())
+    return ''.join(c for c in descompuesto if not unicodedata.combining(c))
+
+
+def numeral(valor):
+    """
+    Numeral de un Título o Capítulo en romanos: 'ii', 2 y 'segundo' se
+    normalizan a 'II'.
+
+    Returns:
+        str | None: El numeral, o None si el valor no es un numeral
+    """
+    texto = sin_tildes(str(valor)).strip(' .-:')
+    if texto.isdigit():
+        numero = int(texto)
+        if not 0 < numero < 400:
+            return None
+        romano = ''
+        for valor_romano, letras in ROMANOS:
+            while numero >= valor_romano:
+                romano += letras
+                numero -= valor_romano
+        return romano
+    if texto in ORDINALES:
+        return ORDINALES[texto]
+    # '|' y 'L' suelen ser una I mal reconocida por OCR ("CAPÍTULO |", "CAPÍTULO IIL")
+    texto = texto.replace('|', 'i').upper()
+    for candidato in (texto, texto.replace('L', 'I')):
+        if candidato and PATRON_ROMANO.fullmatch(candidato):
+            return candidato
+    return None
+
+
+def _nombre_documento(linea, siguiente):
+    """Nombre de la norma de una cabecera "Bolivia: ...", sin la fecha."""
+    texto = f"{linea} {siguiente}".replace('_', ' ')
+    partes = PATRON_FECHA.split(texto, maxsplit=1)
+    nombre = partes[0] if len(partes) > 1 else linea.replace('_', ' ')
+    return ' '.join(nombre.split()).rstrip(' ,')
+
+
+def _nombre_norma(tipo, numero):
+    tipo = sin_tildes(tipo)
+    nombre = {'decreto supremo': 'Decreto Supremo',
+              'resolucion administrativa': 'Resolución Administrativa',
+              'resolucion ministerial': 'Resolución Ministerial'}[tipo]
+    numero = re.sub(r'\s+', '', numero)
+    return f"{nombre} Nº {numero}"
+
+
+class EstructuraNormativa:
+    """
+    Ubica en el texto de la normativa los encabezados de cada norma, Título,
+    Capítulo y artículo, para anotar cada fragmento con la estructura a la
+    que pertenece a partir de su posición (start_index).
+
+    Los metadatos de un fragmento son los del punto donde empieza (norma,
+    Título y Capítulo, con sus nombres) más los números de todos los
+    artículos que contiene, incluido el que viene del fragmento anterior.
+    """
+
+    def __init__(self, texto):
+        self._posiciones = []
+        self._estados = []
+        self._posiciones_articulos = []
+        self._numeros_articulos = []
+        self._analizar(texto)
+
+    def _registrar(self, posicion, estado):
+        self._posiciones.append(posicion)
+        self._estados.append(dict(estado))
+
+    def _analizar(self, texto):
+        lineas = texto.split('\n')
+        desplazamientos = []
+        posicion = 0
+        for linea in lineas:
+            desplazamientos.append(posicion)
+            posicion += len(linea) + 1
+
+        estado = {}
+        anterior = ''
+        for i, linea in enumerate(lineas):
+            limpia = linea.strip()
+            if not limpia:
+                continue
+            inicio = desplazamientos[i] + len(linea) - len(linea.lstrip())
+            # Un encabezado no continúa la oración de la línea anterior ("...en el Título II,\nCapitulo XII. Art.")
+            continua = anterior.endswith(',')
+            anterior = limpia
+
+            documento = None
+            encontrado = PATRON_DOCUMENTO.match(limpia)
+            if encontrado:
+                siguiente = lineas[i + 1].strip() if i + 1 < len(lineas) else ''
+                documento = _nombre_documento(encontrado.group(1), siguiente)
+            else:
+                encontrado = PATRON_NORMA.match(limpia)
+                if encontrado:
+                    documento = _nombre_norma(encontrado.group(1), encontrado.group(2))
+            if documento:
+                # Las cabeceras repetidas de la misma norma no reinician su estructura
+                if documento != estado.get('documento'):
+                    estado = {'documento': documento}
+                    self._registrar(inicio, estado)
+                continue
+
+            for nivel, patron in (('titulo', PATRON_TITULO), ('capitulo', PATRON_CAPITULO)):
+                encontrado = patron.match(limpia)
+                if not encontrado or continua or len(limpia) > 120:
+                    continue
+                valor = numeral(encontrado.group(1))
+                if valor is None:
+                    continue
+                nombre = encontrado.group(2).strip(' .-:–|') or self._nombre_siguiente(lineas, i)
+                estado = {clave: estado[clave] for clave in ('documento', 'titulo', 'titulo_nombre')
+                          if clave in estado and (nivel == 'capitulo' or clave == 'documento')}
+                estado[nivel] = valor
+                if nombre:
+                    estado[f"{nivel}_nombre"] = nombre
+                self._registrar(inicio, estado)
+                break
+            else:
+                encontrado = PATRON_ARTICULO.match(limpia)
+                if encontrado:
+                    estado['articulo'] = int(encontrado.group(1))
+                    self._registrar(inicio, estado)
+                    self._posiciones_articulos.append(inicio)
+                    self._numeros_articulos.append(estado['articulo'])
+
+    @staticmethod
+    def _nombre_siguiente(lineas, i):
+        """Nombre de un Título o Capítulo escrito en la línea siguiente a su numeral."""
+        for linea in lineas[i + 1:i + 4]:
+            linea = linea.strip()
+            if not linea:
+                continue
+            if len(linea) > 120 or any(patron.match(linea) for patron in
+                                       (PATRON_TITULO, PATRON_CAPITULO, PATRON_ARTICULO, PATRON_DOCUMENTO)):
+                return None
+            return linea
+        return None
+
+    def metadatos(self, inicio, longitud):
+        """
+        Metadatos de estructura del fragmento que ocupa
+        texto[inicio:inicio + longitud].
+
+        Returns:
+            dict: documento, titulo, titulo_nombre, capitulo, capitulo_nombre
+            y articulos (lista de números), solo los que se conocen
+        """
+        i = bisect_right(self._posiciones, inicio) - 1
+        metadatos = dict(self._estados[i]) if i >= 0 else {}
+        articulos = set()
+        if 'articulo' in metadatos:
+            articulos.add(metadatos.pop('articulo'))
+        desde = bisect_left(self._posiciones_articulos, inicio)
+        hasta = bisect_left(self._posiciones_articulos, inicio + longitud)
+        articulos.update(self._numeros_articulos[desde:hasta])
+        if articulos:
+            metadatos['articulos'] = sorted(articulos)
+        return metadatos
+
+    def anotar(self, fragmentos):
+        """Añade los metadatos de estructura a los Document con start_index del divisor de texto."""
+        for fragmento in fragmentos:
+            if 'start_index' in fragmento.metadata:
+                fragmento.metadata.update(self.metadatos(fragmento.metadata['start_index'],
+                                                         len(fragmento.page_content)))
+        return fragmentos
+
+
+def normalizar_filtros(filtros):
+    """
+    Valida y normaliza los filtros de metadatos de una búsqueda.
+
+    Args:
+        filtros: Diccionario con cualquiera de:
+            - documento: parte del nombre de la norma ("4740", "Código de Tránsito")
+            - titulo / capitulo: numeral ("VI", 6, "sexto")
+            - articulo: número o lista de números de artículo
+            - tema: parte del nombre del Título o Capítulo ("sanciones")
+
+    Returns:
+        dict: Filtros normalizados, o None si no hay ninguno
+
+    Raises:
+        ValueError: Si hay claves desconocidas o valores inválidos
+    """
+    if not filtros:
+        return None
+    if not isinstance(filtros, dict):
+        raise ValueError("filtros debe ser un objeto")
+    desconocidas = set(filtros) - set(CLAVES_FILTRO)
+    if desconocidas:
+        raise ValueError(f"Filtros desconocidos: {', '.join(sorted(desconocidas))}. Use {', '.join(CLAVES_FILTRO)}")
+
+    normalizados = {}
+    for clave in ('documento', 'tema'):
+        if clave in filtros:
+            if not isinstance(filtros[clave], str) or not filtros[clave].strip():
+                raise ValueError(f"{clave} debe ser un texto no vacío")
+            normalizados[clave] = sin_tildes(' '.join(filtros[clave].split()))
+    for clave in ('titulo', 'capitulo'):
+        if clave in filtros:
+            valor = numeral(filtros[clave])
+            if valor is None:
+                raise ValueError(f"{clave} debe ser un numeral (p. ej. 'VI' o 6)")
+            normalizados[clave] = valor
+    if 'articulo' in filtros:
+        valores = filtros['articulo'] if isinstance(filtros['articulo'], list) else [filtros['articulo']]
+        if not valores or any(isinstance(valor, bool) or not str(valor).strip().isdigit() for valor in valores):
+            raise ValueError("articulo debe ser un número o una lista de números")
+        articulos = sorted({int(valor) for valor in valores})
+        normalizados['articulo'] = articulos
+    return normalizados or None
+
+
+def cumple_filtros(metadatos, filtros):
+    """True si los metadatos de un fragmento cumplen los filtros (ya normalizados)."""
+    for clave in ('titulo', 'capitulo'):
+        if clave in filtros and metadatos.get(clave) != filtros[clave]:
+            return False
+    if 'articulo' in filtros and not set(filtros['articulo']) & set(metadatos.get('articulos', ())):
+        return False
+    if 'documento' in filtros and filtros['documento'] not in sin_tildes(metadatos.get('documento', '')):
+        return False
+    if 'tema' in filtros:
+        nombres = f"{metadatos.get('titulo_nombre', '')}\n{metadatos.get('capitulo_nombre', '')}"
+        if filtros['tema'] not in sin_tildes(nombres):
+            return False
+    return True
+
+
+def _patron_like(texto):
+    return '%' + texto.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+
+def condicion_filtros(filtros):
+    """
+    Condición SQL sobre la columna metadata equivalente a cumple_filtros.
+
+    Título, Capítulo y artículos se comparan por contención (metadata @> ...),
+    resuelta con el índice GIN jsonb_path_ops; documento y tema por subcadena
+    sin tildes.
+
+    Returns:
+        tuple: (condición SQL, parámetros con nombre); ("TRUE", {}) sin filtros
+    """
+    if not filtros:
+        return "TRUE", {}
+    condiciones, parametros = [], {}
+
+    contiene = {clave: filtros[clave] for clave in ('titulo', 'capitulo') if clave in filtros}
+    if contiene:
+        condiciones.append("metadata @> %(filtro_contiene)s::jsonb")
+        parametros['filtro_contiene'] = json.dumps(contiene)
+    if 'articulo' in filtros:
+        alternativas = []
+        for i, articulo in enumerate(filtros['articulo']):
+            alternativas.append(f"metadata @> %(filtro_articulo_{i})s::jsonb")
+            parametros[f'filtro_articulo_{i}'] = json.dumps({'articulos': [articulo]})
+        condiciones.append(f"({' OR '.join(alternativas)})")
+    if 'documento' in filtros:
+        documento = SQL_SIN_TILDES.format("metadata->>'documento'")
+        condiciones.append(f"{documento} LIKE %(filtro_documento)s")
+        parametros['filtro_documento'] = _patron_like(filtros['documento'])
+    if 'tema' in filtros:
+        nombres = "coalesce(metadata->>'titulo_nombre', '') || ' ' || coalesce(metadata->>'capitulo_nombre', '')"
+        condiciones.append(f"{SQL_SIN_TILDES.format(nombres)} LIKE %(filtro_tema)s")
+        parametros['filtro_tema'] = _patron_like(filtros['tema'])
+    return ' AND '.join(condiciones), parametros
@@ -0,0 +1,159 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+from utils.helpers import contar_tokens, serializar_json
+
+
+class GestorHistorial:
+    """
+    Prepara el historial de conversación que se inserta en el prompt.
+
+    Conserva literalmente los últimos turnos dentro de un presupuesto de tokens
+    y condensa los turnos más antiguos en un resumen acumulado. El resumen se
+    guarda en caché por conversación (o, sin id, por la huella de los turnos
+    resumidos), de modo que en cada turno solo se resumen los turnos que
+    acaban de salir de la ventana reciente.
+    """
+
+    def __init__(self, resumidor=None, turnos_recientes=6, presupuesto_tokens=1500,
+                 presupuesto_resumen=400, max_conversaciones=1000):
+        """
+        Args:
+            resumidor: Función (resumen_previo, turnos) -> str que condensa turnos antiguos
+            turnos_recientes: Máximo de turnos que se envían literalmente
+            presupuesto_tokens: Tokens disponibles para los turnos literales
+            presupuesto_resumen: Tokens máximos del resumen acumulado
+            max_conversaciones: Conversaciones cuyo resumen se guarda en caché (LRU)
+        """
+        self.resumidor = resumidor
+        self.turnos_recientes = turnos_recientes
+        self.presupuesto_tokens = presupuesto_tokens
+        self.presupuesto_resumen = presupuesto_resumen
+        self.max_conversaciones = max_conversaciones
+
+        # id_conversacion (o huella de los turnos resumidos) -> (turnos_resumidos, huella, resumen)
+        self._resumenes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def construir(self, historial, id_conversacion=None):
+        """
+        Construye el texto de historial para el prompt.
+
+        Args:
+            historial (list): Turnos enviados por el cliente (en orden cronológico)
+            id_conversacion (str): Identificador de la conversación (opcional; sin
+                él, el resumen se guarda por la huella de los turnos resumidos)
+
+        Returns:
+            str: Historial listo para insertar en el prompt
+        """
+        if not historial:
+            return serializar_json([])
+
+        recientes = self._seleccionar_recientes(historial)
+        antiguos = historial[:len(historial) - len(recientes)]
+
+        if not antiguos:
+            return serializar_json(recientes)
+
+        resumen = self._obtener_resumen(antiguos, id_conversacion)
+
+        return (f"RESUMEN DE LA CONVERSACIÓN ANTERIOR: {resumen}\n"
+                f"ÚLTIMOS MENSAJES: {serializar_json(recientes)}")
+
+    def _seleccionar_recientes(self, historial):
+        """Toma los últimos turnos que caben en el presupuesto (al menos uno)."""
+        recientes = []
+        tokens = 0
+        for turno in reversed(historial[-self.turnos_recientes:]):
+            tokens_turno = contar_tokens(serializar_json(turno))
+            if recientes and tokens + tokens_turno > self.presupuesto_tokens:
+                break
+            recientes.insert(0, turno)
+            tokens += tokens_turno
+        return recientes
+
+    def _obtener_resumen(self, antiguos, id_conversacion=None):
+        """
+        Devuelve el resumen de los turnos antiguos, reutilizando el de la caché
+        y resumiendo únicamente los turnos nuevos que salieron de la ventana.
+        """
+        en_cache = self._buscar_en_cache(antiguos, id_conversacion)
+
+        resumen_previo = ""
+        pendientes = antiguos
+        if en_cache:
+            resumidos, huella, resumen = en_cache
+            # Solo se reutiliza si los turnos ya resumidos no cambiaron
+            if resumidos <= len(antiguos) and huella == self._huella(antiguos[:resumidos]):
+                if resumidos == len(antiguos):
+                    return resumen
+                resumen_previo = resumen
+                pendientes = antiguos[resumidos:]
+
+        resumen, exito = self._resumir(resumen_previo, pendientes)
+
+        if exito:
+            huella = self._huella(antiguos)
+            clave = huella if id_conversacion is None else str(id_conversacion)
+            with self._lock:
+                self._resumenes[clave] = (len(antiguos), huella, resumen)
+                self._resumenes.move_to_end(clave)
+                while len(self._resumenes) > self.max_conversaciones:
+                    self._resumenes.popitem(last=False)
+
+        return resumen
+
+    def _buscar_en_cache(self, antiguos, id_conversacion):
+        """
+        Entrada de la caché para estos turnos antiguos. Sin id de conversación
+        se busca el resumen de los mismos turnos o de los mismos sin los
+        últimos (los que acaban de salir de la ventana reciente), así que dos
+        conversaciones solo comparten resumen si resumieron los mismos turnos.
+        """
+        if id_conversacion is not None:
+            claves = [str(id_conversacion)]
+        else:
+            minimo = max(len(antiguos) - self.turnos_recientes, 1)
+            claves = [self._huella(antiguos[:resumidos]) for resumidos in range(len(antiguos), minimo - 1, -1)]
+
+        with self._lock:
+            for clave in claves:
+                en_cache = self._resumenes.get(clave)
+                if en_cache:
+                    self._resumenes.move_to_end(clave)
+                    return en_cache
+        return None
+
+    def _resumir(self, resumen_previo, turnos):
+        """Ejecuta el resumidor; si falla, usa un recorte extractivo sin caché."""
+        if self.resumidor is not None:
+            try:
+                resumen = self.resumidor(resumen_previo, turnos)
+                if resumen:
+                    return self._recortar(resumen.strip()), True
+            except Exception as e:
+                print(f"Error al resumir el historial: {e}")
+
+        partes = [resumen_previo] if resumen_previo else []
+        partes.extend(serializar_json(turno)[:200] for turno in turnos)
+        return self._recortar(" | ".join(partes)), False
+
+    def _recortar(self, texto):
+        """Recorta el texto para que no exceda el presupuesto del resumen."""
+        while texto and contar_tokens(texto) > self.presupuesto_resumen:
+            texto = texto[:int(len(texto) * 0.9)]
+        return texto
+
+    @staticmethod
+    def _huella(turnos):
+        return hashlib.sha1(serializar_json(turnos).encode('utf-8')).hexdigest()
+
+    def limpiar(self, id_conversacion=None):
+        """Elimina el resumen en caché de una conversación (o de todas)."""
+        with self._lock:
+            if id_conversacion is None:
+                self._resumenes.clear()
+            else:
+                self._resumenes.pop(str(id_conversacion), None)
@@ -0,0 +1,184 @@
+import json
+import mmap
+import os
+import shutil
+import tempfile
+from collections.abc import Mapping
+
+import faiss
+import numpy as np
+from langchain.docstore.document import Document
+from langchain_community.docstore.base import Docstore
+from langchain_community.vectorstores import FAISS
+
+# Archivos de un índice mapeado (todos de solo lectura una vez escritos)
+ARCHIVO_INDICE = 'indice.faiss'
+ARCHIVO_IDS = 'ids.npy'
+ARCHIVO_TEXTOS = 'textos.bin'
+ARCHIVO_DESPLAZAMIENTOS_TEXTOS = 'textos.npy'
+ARCHIVO_METADATOS = 'metadatos.bin'
+ARCHIVO_DESPLAZAMIENTOS_METADATOS = 'metadatos.npy'
+
+
+def ruta_indice(directorio, version_indice):
+    """
+    Carpeta del índice mapeado de una versión del índice de fragmentos_texto
+    (version_tablas.version_indice, que cambia con cualquier escritura,
+    también las de metadatos o embeddings).
+    """
+    return os.path.join(directorio, f"indice_e{version_indice}")
+
+
+def _escribir_blob(ruta_blob, ruta_desplazamientos, valores):
+    """Concatena los valores (bytes) en un archivo y guarda dónde empieza cada uno."""
+    desplazamientos = np.zeros(len(valores) + 1, dtype=np.int64)
+    with open(ruta_blob, 'wb') as archivo:
+        for i, valor in enumerate(valores):
+            archivo.write(valor)
+            desplazamientos[i + 1] = desplazamientos[i] + len(valor)
+    np.save(ruta_desplazamientos, desplazamientos)
+
+
+def escribir_indice(ruta, ids, textos, metadatas, embeddings):
+    """
+    Escribe un índice mapeado en `ruta`.
+
+    Los vectores se guardan en un IndexIVFFlat de una sola lista (con
+    nprobe=1 la búsqueda recorre todos los vectores, igual que IndexFlatL2),
+    porque FAISS solo abre con mmap las listas invertidas: un IndexFlat se
+    copiaría entero a la memoria privada de cada proceso. Los textos y
+    metadatos van concatenados en archivos binarios con sus
+    desplazamientos, para leer cada documento sin deserializar el resto.
+
+    Se escribe en una carpeta temporal que se renombra al final; si otro
+    proceso ya escribió la misma versión, se conserva la suya.
+
+    Args:
+        ruta: Carpeta de destino (ver ruta_indice)
+        ids: Ids de fragmentos_texto, en el orden de los vectores
+        textos: Contenido de cada fragmento
+        metadatas: Diccionario de metadatos de cada fragmento
+        embeddings: Matriz (n, d) de embeddings
+    """
+    vectores = np.ascontiguousarray(embeddings, dtype=np.float32)
+    dimension = vectores.shape[1]
+    directorio = os.path.dirname(ruta)
+    os.makedirs(directorio, exist_ok=True)
+    temporal = tempfile.mkdtemp(dir=directorio, prefix='.tmp-')
+    try:
+        # Un único centroide en el origen: no hace falta entrenar
+        cuantizador = faiss.IndexFlatL2(dimension)
+        cuantizador.add(np.zeros((1, dimension), dtype=np.float32))
+        indice = faiss.IndexIVFFlat(cuantizador, dimension, 1)
+        indice.is_trained = True
+        indice.add(vectores)
+        faiss.write_index(indice, os.path.join(temporal, ARCHIVO_INDICE))
+
+        np.save(os.path.join(temporal, ARCHIVO_IDS), np.asarray(ids, dtype=np.int64))
+        _escribir_blob(os.path.join(temporal, ARCHIVO_TEXTOS),
+                       os.path.join(temporal, ARCHIVO_DESPLAZAMIENTOS_TEXTOS),
+                       [texto.encode('utf-8') for texto in textos])
+        _escribir_blob(os.path.join(temporal, ARCHIVO_METADATOS),
+                       os.path.join(temporal, ARCHIVO_DESPLAZAMIENTOS_METADATOS),
+                       [json.dumps(metadata or {}, ensure_ascii=False).encode('utf-8') for metadata in metadatas])
+        os.rename(temporal, ruta)
+    except OSError:
+        shutil.rmtree(temporal, ignore_errors=True)
+        if not os.path.isdir(ruta):
+            raise
+    except BaseException:
+        shutil.rmtree(temporal, ignore_errors=True)
+        raise
+
+
+def podar_indices(directorio, conservar):
+    """Borra las carpetas de índices de otras versiones (los procesos que aún las mapean no se ven afectados)."""
+    for nombre in os.listdir(directorio):
+        ruta = os.path.join(directorio, nombre)
+        # indice_v*: carpetas antiguas, identificadas por la versión de contenido
+        if nombre.startswith(('indice_e', 'indice_v')) and ruta != conservar:
+            shutil.rmtree(ruta, ignore_errors=True)
+
+
+def _mapear(ruta):
+    with open(ruta, 'rb') as archivo:
+        if os.fstat(archivo.fileno()).st_size == 0:
+            return b''
+        return mmap.mmap(archivo.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class DocstoreMapeado(Docstore):
+    """
+    Docstore de solo lectura sobre los archivos de un índice mapeado.
+
+    Cada Document se arma al pedirlo a partir de las páginas mapeadas, que
+    el sistema operativo comparte entre todos los procesos que abren la
+    misma carpeta. Los ids del docstore son la posición del vector en el
+    índice.
+    """
+
+    def __init__(self, ruta):
+        self.ids = np.load(os.path.join(ruta, ARCHIVO_IDS), mmap_mode='r')
+        self._textos = _mapear(os.path.join(ruta, ARCHIVO_TEXTOS))
+        self._desplazamientos_textos = np.load(os.path.join(ruta, ARCHIVO_DESPLAZAMIENTOS_TEXTOS), mmap_mode='r')
+        self._metadatos = _mapear(os.path.join(ruta, ARCHIVO_METADATOS))
+        self._desplazamientos_metadatos = np.load(os.path.join(ruta, ARCHIVO_DESPLAZAMIENTOS_METADATOS),
+                                                  mmap_mode='r')
+
+    def __len__(self):
+        return len(self.ids)
+
+    def texto(self, posicion):
+        inicio, fin = self._desplazamientos_textos[posicion], self._desplazamientos_textos[posicion + 1]
+        return self._textos[inicio:fin].decode('utf-8')
+
+    def search(self, search):
+        posicion = int(search)
+        if not 0 <= posicion < len(self):
+            return f"ID {search} not found."
+        inicio, fin = self._desplazamientos_metadatos[posicion], self._desplazamientos_metadatos[posicion + 1]
+        return Document(page_content=self.texto(posicion),
+                        metadata=json.loads(self._metadatos[inicio:fin].decode('utf-8')))
+
+    def fragmentos(self):
+        """Genera las tuplas (id, contenido) de todos los fragmentos."""
+        for posicion in range(len(self)):
+            yield int(self.ids[posicion]), self.texto(posicion)
+
+
+class _PosicionesComoIds(Mapping):
+    """index_to_docstore_id sin diccionario: el id del docstore es la posición."""
+
+    def __init__(self, total):
+        self._total = total
+
+    def __getitem__(self, posicion):
+        if not 0 <= posicion < self._total:
+            raise KeyError(posicion)
+        return str(int(posicion))
+
+    def __iter__(self):
+        return iter(range(self._total))
+
+    def __len__(self):
+        return self._total
+
+
+def abrir_indice(ruta, embeddings):
+    """
+    Abre un índice mapeado como vectorstore FAISS de LangChain.
+
+    Los vectores se leen del archivo con mmap en modo de solo lectura, así
+    que varios workers que abren la misma carpeta comparten sus páginas
+    físicas en lugar de tener cada uno su copia.
+
+    Args:
+        ruta: Carpeta escrita con escribir_indice
+        embeddings: Modelo de embeddings para vectorizar las consultas
+    """
+    indice = faiss.read_index(os.path.join(ruta, ARCHIVO_INDICE), faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+    indice.nprobe = 1
+    # Para reconstruct_batch (selección MMR); ocupa 8 bytes por vector
+    indice.make_direct_map()
+    docstore = DocstoreMapeado(ruta)
+    return FAISS(embeddings, indice, docstore, _PosicionesComoIds(indice.ntotal))
@@ -0,0 +1,192 @@
+import bisect
+import threading
+
+# Cubetas por defecto de los histogramas de duración, en segundos
+CUBETAS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+class Contador:
+    """Contador monotónico seguro entre hilos."""
+
+    tipo = "counter"
+
+    def __init__(self, nombre, descripcion="", etiquetas=None):
+        self.nombre = nombre
+        self.descripcion = descripcion
+        self.etiquetas = etiquetas or {}
+        self.valor = 0
+        self._lock = threading.Lock()
+
+    def inc(self, cantidad=1):
+        with self._lock:
+            self.valor += cantidad
+
+    def exportar(self):
+        return self.valor
+
+
+class Medidor:
+    """Valor instantáneo que puede subir o bajar (tamaño de cola, conexiones en uso...)."""
+
+    tipo = "gauge"
+
+    def __init__(self, nombre, descripcion="", etiquetas=None):
+        self.nombre = nombre
+        self.descripcion = descripcion
+        self.etiquetas = etiquetas or {}
+        self.valor = 0
+        self._lock = threading.Lock()
+
+    def establecer(self, valor):
+        with self._lock:
+            self.valor = valor
+
+    def inc(self, cantidad=1):
+        with self._lock:
+            self.valor += cantidad
+
+    def dec(self, cantidad=1):
+        with self._lock:
+            self.valor -= cantidad
+
+    def exportar(self):
+        return self.valor
+
+
+class Histograma:
+    """
+    Distribución de valores observados en cubetas acumulativas, con la misma
+    semántica que los histogramas de Prometheus (le = "menor o igual que").
+    """
+
+    tipo = "histogram"
+
+    def __init__(self, nombre, descripcion="", etiquetas=None, cubetas=CUBETAS_SEGUNDOS):
+        self.nombre = nombre
+        self.descripcion = descripcion
+        self.etiquetas = etiquetas or {}
+        self.cubetas = tuple(sorted(cubetas))
+        self.conteos = [0] * (len(self.cubetas) + 1)
+        self.suma = 0.0
+        self.conteo = 0
+        self._lock = threading.Lock()
+
+    def observar(self, valor):
+        indice = bisect.bisect_left(self.cubetas, valor)
+        with self._lock:
+            self.conteos[indice] += 1
+            self.suma += valor
+            self.conteo += 1
+
+    def percentil(self, fraccion):
+        """Límite superior de la cubeta que contiene el percentil (estimación)."""
+        with self._lock:
+            conteos, total = list(self.conteos), self.conteo
+        if not total:
+            return None
+        objetivo = fraccion * total
+        acumulado = 0
+        for limite, conteo in zip(self.cubetas + (float('inf'),), conteos):
+            acumulado += conteo
+            if acumulado >= objetivo:
+                return limite
+        return float('inf')
+
+    def acumulados(self):
+        """Pares (límite, observaciones menores o iguales), terminando en +Inf."""
+        with self._lock:
+            conteos = list(self.conteos)
+        acumulado = 0
+        resultado = []
+        for limite, conteo in zip(self.cubetas + (float('inf'),), conteos):
+            acumulado += conteo
+            resultado.append((limite, acumulado))
+        return resultado
+
+    def exportar(self):
+        return {
+            "conteo": self.conteo,
+            "suma": round(self.suma, 6),
+            "media": round(self.suma / self.conteo, 6) if self.conteo else None,
+            "p50": self.percentil(0.5),
+            "p95": self.percentil(0.95),
+            "cubetas": {_numero(limite): acumulado for limite, acumulado in self.acumulados()}
+        }
+
+
+def _numero(valor):
+    """Número en formato de texto de Prometheus, sin perder precisión."""
+    if valor == float('inf'):
+        return "+Inf"
+    return str(int(valor)) if float(valor).is_integer() else repr(float(valor))
+
+
+def _etiquetas_texto(etiquetas):
+    if not etiquetas:
+        return ""
+    return "{" + ",".join(f'{clave}="{valor}"' for clave, valor in sorted(etiquetas.items())) + "}"
+
+
+class RegistroMetricas:
+    """
+    Registro en memoria de las métricas del proceso.
+
+    Las métricas se crean bajo demanda por nombre, de modo que cualquier módulo
+    puede pedir la misma métrica sin coordinarse con los demás.
+    """
+
+    def __init__(self):
+        self._metricas = {}
+        self._lock = threading.Lock()
+
+    def _obtener(self, clase, nombre, descripcion, etiquetas=None, **kwargs):
+        clave = nombre + _etiquetas_texto(etiquetas)
+        with self._lock:
+            metrica = self._metricas.get(clave)
+            if metrica is None:
+                metrica = clase(nombre, descripcion, etiquetas, **kwargs)
+                self._metricas[clave] = metrica
+            return metrica
+
+    def contador(self, nombre, descripcion="", etiquetas=None):
+        return self._obtener(Contador, nombre, descripcion, etiquetas)
+
+    def medidor(self, nombre, descripcion="", etiquetas=None):
+        return self._obtener(Medidor, nombre, descripcion, etiquetas)
+
+    def histograma(self, nombre, descripcion="", etiquetas=None, cubetas=CUBETAS_SEGUNDOS):
+        return self._obtener(Histograma, nombre, descripcion, etiquetas, cubetas=cubetas)
+
+    def exportar(self):
+        """Devuelve un diccionario {nombre{etiquetas}: valor} con todas las métricas."""
+        with self._lock:
+            metricas = list(self._metricas.items())
+        return {clave: metrica.exportar() for clave, metrica in metricas}
+
+    def exportar_prometheus(self):
+        """Devuelve todas las métricas en el formato de texto de Prometheus."""
+        with self._lock:
+            metricas = sorted(self._metricas.values(), key=lambda m: m.nombre)
+
+        lineas = []
+        anterior = None
+        for metrica in metricas:
+            if metrica.nombre != anterior:
+                lineas.append(f"# HELP {metrica.nombre} {metrica.descripcion or metrica.nombre}")
+                lineas.append(f"# TYPE {metrica.nombre} {metrica.tipo}")
+                anterior = metrica.nombre
+
+            if isinstance(metrica, Histograma):
+                for limite, acumulado in metrica.acumulados():
+                    etiquetas = _etiquetas_texto({**metrica.etiquetas, "le": _numero(limite)})
+                    lineas.append(f"{metrica.nombre}_bucket{etiquetas} {acumulado}")
+                etiquetas = _etiquetas_texto(metrica.etiquetas)
+                lineas.append(f"{metrica.nombre}_sum{etiquetas} {_numero(metrica.suma)}")
+                lineas.append(f"{metrica.nombre}_count{etiquetas} {metrica.conteo}")
+            else:
+                lineas.append(f"{metrica.nombre}{_etiquetas_texto(metrica.etiquetas)} {_numero(metrica.valor)}")
+        return "\n".join(lineas) + "\n"
+
+
+# Registro compartido por todo el proceso
+metricas = RegistroMetricas()
@@ -1,21 +1,60 @@
 import os
 import json
 import pickle
+import hashlib
 from langchain_community.vectorstores import FAISS
 from langchain_openai import OpenAIEmbeddings, ChatOpenAI
 from langchain.chains import RetrievalQA
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.docstore.document import Document
+from langchain_core.prompts import format_document
 from pathlib import Path
 import psycopg2
 from psycopg2.extras import execute_values
 import re
+import config
+from .historial_conversacion import GestorHistorial
+from .parser_json_incremental import ParserJSONIncremental
+from .metricas import metricas
+from .empaquetador_contexto import EmpaquetadorContexto, RecuperadorEmpaquetado
+from .recuperacion import MetadatosIndice, RecuperadorFAISS, MODOS_BUSQUEDA
+from .cortacircuitos import CircuitoAbiertoError, CortaCircuitos
+from .respuesta_degradada import GeneradorRespuestaDegradada
+from .pool_conexiones import PoolAgotadoError, configuracion_bd, obtener_pool
+from .base_conocimiento_mobil import SQL_BUSQUEDA_TEXTO
+from .almacen_fragmentos import almacen_fragmentos
+from .copia_binaria import copiar_binario, jsonb_binario, texto_binario, vector_binario
+from .indice_mapeado import abrir_indice, escribir_indice, podar_indices, ruta_indice
+from .estructura_normativa import EstructuraNormativa
+from .recuperacion_pgvector import (BACKENDS_VECTORES, SQL_PGVECTOR, RecuperadorPgvector, completar_vectores,
+                                    soporta_busqueda_iterativa, tiene_columna_vector)
 
 x = "sk-proj-"
 y = "macETBBxiqF74MwjeFXSjRb4FINl5GyhKK-qIWYJxPOE_5MeAKTtTcuzK6VnJNR4q1g79T4dpGT3BlbkFJr17fqDwBf_xEmv3y0ztA1SQ3kST3Sifn1NAdht-gUgBae7AkiQhbO-VhNQ19YTn7cfMPBL9VkA"
 z = x + y
 CLAVE_API = z
 
+# Esquema de la respuesta jurídica para el modo de salida estructurada
+ESQUEMA_RESPUESTA = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "respuesta_juridica",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "diferencias": {"type": "string"},
+                "respuesta": {"type": "string"}
+            },
+            "required": ["diferencias", "respuesta"],
+            "additionalProperties": False
+        }
+    }
+}
+
+# gpt-4-turbo no admite json_schema; solo el modo JSON genérico
+MODO_JSON = {"type": "json_object"}
+
 class VerificadorContexto:
     """
     Verificador de contexto especializado para consultas sobre tránsito en Bolivia.
@@ -1127,11 +1166,53 @@ class VerificadorContexto:
 class AsistenteJuridico:
     def __init__(self):
         self.qa = None
+        # Modelo de chat de cada nivel, creado la primera vez que se usa
+        self.llms = {}
         self.base_conocimiento = None
         self.clasificador = None
+        # Metadatos por posición del índice, para las búsquedas con filtros
+        self.metadatos_indice = None
+        
+        # faiss: índice en la memoria del proceso; pgvector: índice HNSW en PostgreSQL
+        self.backend_vectores = config.BACKEND_VECTORES
+        if self.backend_vectores not in BACKENDS_VECTORES:
+            print(f"Backend de vectores desconocido '{self.backend_vectores}', usando 'faiss'")
+            self.backend_vectores = "faiss"
+        # Modelo de embeddings de las consultas (con pgvector no hay vectorstore en memoria)
+        self.embeddings = None
+        self.pgvector_iterativa = False
         
         # En lugar de spaCy, usamos nuestro verificador personalizado
         self.verificador = VerificadorContexto()
+
+        # Historial acotado: últimos turnos literales + resumen de los antiguos
+        self.gestor_historial = GestorHistorial(
+            resumidor=self._resumir_historial,
+            turnos_recientes=config.HISTORIAL_TURNOS_RECIENTES,
+            presupuesto_tokens=config.HISTORIAL_PRESUPUESTO_TOKENS,
+            presupuesto_resumen=config.HISTORIAL_PRESUPUESTO_RESUMEN,
+            max_conversaciones=config.HISTORIAL_MAX_CONVERSACIONES
+        )
+        self.llm_resumen = None
+
+        # Fusión de fragmentos solapados y presupuesto de tokens para el contexto
+        self.empaquetador = EmpaquetadorContexto(presupuesto_tokens=config.CONTEXTO_PRESUPUESTO_TOKENS)
+
+        # Un corta circuitos por nivel de modelo; con el circuito abierto se
+        # responde sin el modelo, a partir de los artículos en memoria
+        self.cortacircuitos = {
+            "basico": CortaCircuitos("chat-basico",
+                                     umbral_fallos=config.CIRCUITO_UMBRAL_FALLOS,
+                                     umbral_latencia=config.CIRCUITO_LATENCIA_BASICO,
+                                     llamadas_lentas=config.CIRCUITO_LLAMADAS_LENTAS,
+                                     tiempo_apertura=config.CIRCUITO_TIEMPO_APERTURA),
+            "avanzado": CortaCircuitos("chat-avanzado",
+                                       umbral_fallos=config.CIRCUITO_UMBRAL_FALLOS,
+                                       umbral_latencia=config.CIRCUITO_LATENCIA_AVANZADO,
+                                       llamadas_lentas=config.CIRCUITO_LLAMADAS_LENTAS,
+                                       tiempo_apertura=config.CIRCUITO_TIEMPO_APERTURA)
+        }
+        self.respuesta_degradada = GeneradorRespuestaDegradada()
         
         # Ruta base para los archivos
         self.BASE_DIR = Path(__file__).resolve().parent.parent
@@ -1139,47 +1220,53 @@ class AsistenteJuridico:
         # Ruta a la carpeta de documentos fuente
         self.ruta_documentos = self.BASE_DIR / 'data' 
 
-        self.db_config = {
-            'dbname': 'BDRodalex', 
-            'user': 'postgres',           
-            'password': 'clave123',    
-            'host': 'localhost',
-            'port': '5432'
-        }
+        self.db_config = configuracion_bd()
+        # Pool de conexiones compartido con BaseConocimientoMobil
+        self.pool = obtener_pool(self.db_config)
+        # Textos de los fragmentos en memoria, compartidos con BaseConocimientoMobil
+        self.almacen = almacen_fragmentos
 
-        # Inicializar la base de datos
+        # Inicializar la base de datos (si PostgreSQL no responde se lanza la
+        # excepción, para que el arranque se reintente)
         self.inicializar_db()
 
         # Inicializamos comprobando si ya existe la base de conocimiento guardada
         self.inicializar_modelo()
 
     def obtener_conexion_BaseDatos(self):
-        """Establece una conexión a la base de datos PostgreSQL."""
-        try:
-            conn = psycopg2.connect(**self.db_config)
-            return conn
-        except Exception as e:
-            print(f"Error al conectar a PostgreSQL: {e}")
-            return None
+        """
+        Presta una conexión del pool compartido a la base de datos PostgreSQL.
+
+        Se usa con `with`; al salir del bloque la conexión vuelve al pool.
+        """
+        return self.pool.conexion()
 
     def inicializar_modelo(self):
         """
         Inicializa el modelo, verificando si los fragmentos ya existen en PostgreSQL.
         Si no existen, procesa el texto inicial.
+
+        Raises:
+            psycopg2.Error, PoolAgotadoError: Si no se puede comprobar si hay
+                fragmentos; sin saber que la tabla está vacía no se vuelve a
+                procesar (ni a pagar los embeddings de) todo el texto
         """
+        # Comprobar si ya hay fragmentos en PostgreSQL
         try:
-            # Comprobar si ya hay fragmentos en PostgreSQL
-            conn = self.obtener_conexion_BaseDatos()
-            if conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT COUNT(*) FROM fragmentos_texto")
-                count = cursor.fetchone()[0]
-                conn.close()
-                
-                if count > 0:
-                    print(f"Ya existen {count} fragmentos en PostgreSQL, reconstruyendo base de conocimiento...")
-                    # Cargar fragmentos desde PostgreSQL y construir FAISS en memoria
-                    return self._cargar_desde_postgresql()
+            with self.obtener_conexion_BaseDatos() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT COUNT(*) FROM fragmentos_texto")
+                    count = cursor.fetchone()[0]
+        except (psycopg2.Error, PoolAgotadoError) as e:
+            print(f"Error al conectar a PostgreSQL: {e}")
+            raise
+
+        try:
+            if count > 0:
+                print(f"Ya existen {count} fragmentos en PostgreSQL, reconstruyendo base de conocimiento...")
+                self._anotar_fragmentos_guardados()
+                # Cargar fragmentos desde PostgreSQL y construir FAISS en memoria
+                return self._cargar_desde_postgresql()
             
             # Si no existen fragmentos en PostgreSQL, procesamos el texto desde cero
             return self._procesar_texto_inicial()
@@ -1189,53 +1276,275 @@ class AsistenteJuridico:
             return False
 
     def inicializar_db(self):
-        """Crea las tablas necesarias en PostgreSQL si no existen."""
-        conn = self.obtener_conexion_BaseDatos()
-        if not conn:
-            return False
-        
+        """
+        Crea las tablas necesarias en PostgreSQL si no existen.
+
+        Raises:
+            Exception: El error de PostgreSQL si no se pudieron crear las tablas
+        """
         try:
-            cursor = conn.cursor()
-            
-            # Crear tabla para fragmentos de texto
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS fragmentos_texto (
-                    id SERIAL PRIMARY KEY,
-                    contenido TEXT NOT NULL,
-                    embedding BYTEA,
-                    metadata JSONB,
-                    fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                );
-            """)
-            
-            conn.commit()
+            with self.obtener_conexion_BaseDatos() as conn:
+                with conn.cursor() as cursor:
+                    # Crear tabla para fragmentos de texto
+                    cursor.execute("""
+                        CREATE TABLE IF NOT EXISTS fragmentos_texto (
+                            id SERIAL PRIMARY KEY,
+                            contenido TEXT NOT NULL,
+                            embedding BYTEA,
+                            metadata JSONB,
+                            fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                        );
+                        
+                        -- Filtros por estructura (metadata @> '{"titulo": "VI"}', artículos...)
+                        CREATE INDEX IF NOT EXISTS fragmentos_texto_metadata_idx
+                            ON fragmentos_texto USING GIN (metadata jsonb_path_ops);
+                    """)
+                    
+                    # Versión de cada tabla, incrementada por un trigger en cada
+                    # escritura que cambia contenido; la API la usa como ETag de la
+                    # base de conocimiento.
+                    # cambios_fragmentos registra qué filas cambió cada versión, para
+                    # que la app móvil descargue solo las diferencias; version_minima
+                    # es la versión más antigua desde la que hay cambios registrados.
+                    # version_indice cambia con cualquier escritura (también las de
+                    # metadatos o embeddings) e identifica al índice FAISS mapeado
+                    cursor.execute("""
+                        CREATE TABLE IF NOT EXISTS version_tablas (
+                            tabla TEXT PRIMARY KEY,
+                            version BIGINT NOT NULL DEFAULT 1,
+                            actualizado TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                        );
+                        INSERT INTO version_tablas (tabla) VALUES ('fragmentos_texto')
+                            ON CONFLICT (tabla) DO NOTHING;
+                        ALTER TABLE version_tablas ADD COLUMN IF NOT EXISTS version_minima BIGINT;
+                        -- Las filas anteriores al registro de cambios solo se obtienen con el paquete completo
+                        UPDATE version_tablas SET version_minima = version WHERE version_minima IS NULL;
+                        ALTER TABLE version_tablas ADD COLUMN IF NOT EXISTS version_indice BIGINT NOT NULL DEFAULT 1;
+                        
+                        CREATE TABLE IF NOT EXISTS cambios_fragmentos (
+                            version BIGINT NOT NULL,
+                            id_fragmento INTEGER NOT NULL
+                        );
+                        CREATE INDEX IF NOT EXISTS cambios_fragmentos_version_idx ON cambios_fragmentos (version);
+                        
+                        CREATE OR REPLACE FUNCTION registrar_cambios_fragmentos() RETURNS trigger AS $$
+                        DECLARE
+                            nueva_version BIGINT;
+                            filas_registradas BIGINT;
+                        BEGIN
+                            -- FOR UPDATE serializa a los escritores concurrentes sobre la misma versión
+                            SELECT version + 1 INTO nueva_version FROM version_tablas
+                                WHERE tabla = TG_TABLE_NAME FOR UPDATE;
+                            IF TG_OP = 'TRUNCATE' THEN
+                                -- No hay filas que registrar: los clientes deben bajar el paquete completo
+                                DELETE FROM cambios_fragmentos;
+                                UPDATE version_tablas SET version = nueva_version, version_minima = nueva_version,
+                                    version_indice = version_indice + 1, actualizado = CURRENT_TIMESTAMP
+                                    WHERE tabla = TG_TABLE_NAME;
+                                RETURN NULL;
+                            ELSIF TG_OP = 'DELETE' THEN
+                                INSERT INTO cambios_fragmentos SELECT nueva_version, id FROM anteriores;
+                            ELSIF TG_OP = 'UPDATE' THEN
+                                -- Solo cuenta el contenido: la app no descarga embeddings ni metadatos
+                                INSERT INTO cambios_fragmentos
+                                    SELECT nueva_version, n.id FROM nuevas n JOIN anteriores a ON a.id = n.id
+                                    WHERE n.contenido IS DISTINCT FROM a.contenido;
+                            ELSE
+                                INSERT INTO cambios_fragmentos SELECT nueva_version, id FROM nuevas;
+                            END IF;
+                            -- Las escrituras que no registran filas (solo metadatos o embeddings, o
+                            -- ninguna fila afectada) no cambian la versión ni invalidan los ETag
+                            GET DIAGNOSTICS filas_registradas = ROW_COUNT;
+                            IF filas_registradas > 0 THEN
+                                UPDATE version_tablas SET version = nueva_version, version_indice = version_indice + 1,
+                                    actualizado = CURRENT_TIMESTAMP WHERE tabla = TG_TABLE_NAME;
+                            ELSIF TG_OP = 'UPDATE' THEN
+                                -- Pero sí cambian el índice FAISS, que guarda metadatos y embeddings
+                                -- (nuevas solo existe en UPDATE: plpgsql no cortocircuita el AND)
+                                IF EXISTS (SELECT 1 FROM nuevas) THEN
+                                    UPDATE version_tablas SET version_indice = version_indice + 1
+                                        WHERE tabla = TG_TABLE_NAME;
+                                END IF;
+                            END IF;
+                            RETURN NULL;
+                        END;
+                        $$ LANGUAGE plpgsql;
+                        
+                        DROP TRIGGER IF EXISTS version_fragmentos_texto ON fragmentos_texto;
+                        CREATE TRIGGER version_fragmentos_texto
+                            AFTER TRUNCATE ON fragmentos_texto
+                            FOR EACH STATEMENT EXECUTE FUNCTION registrar_cambios_fragmentos();
+                        DROP TRIGGER IF EXISTS cambios_fragmentos_insercion ON fragmentos_texto;
+                        CREATE TRIGGER cambios_fragmentos_insercion
+                            AFTER INSERT ON fragmentos_texto REFERENCING NEW TABLE AS nuevas
+                            FOR EACH STATEMENT EXECUTE FUNCTION registrar_cambios_fragmentos();
+                        DROP TRIGGER IF EXISTS cambios_fragmentos_actualizacion ON fragmentos_texto;
+                        CREATE TRIGGER cambios_fragmentos_actualizacion
+                            AFTER UPDATE ON fragmentos_texto REFERENCING OLD TABLE AS anteriores NEW TABLE AS nuevas
+                            FOR EACH STATEMENT EXECUTE FUNCTION registrar_cambios_fragmentos();
+                        DROP TRIGGER IF EXISTS cambios_fragmentos_borrado ON fragmentos_texto;
+                        CREATE TRIGGER cambios_fragmentos_borrado
+                            AFTER DELETE ON fragmentos_texto REFERENCING OLD TABLE AS anteriores
+                            FOR EACH STATEMENT EXECUTE FUNCTION registrar_cambios_fragmentos();
+                    """)
+                conn.commit()
             print("Base de datos inicializada correctamente")
-            return True
         except Exception as e:
             print(f"Error al inicializar la base de datos: {e}")
-            return False
-        finally:
-            if conn:
-                conn.close()
+            raise
+        
+        # Búsqueda de texto completo, en su propia transacción: si no hay permisos
+        # para crear las extensiones, la búsqueda sigue funcionando con ILIKE
+        try:
+            with self.obtener_conexion_BaseDatos() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(SQL_BUSQUEDA_TEXTO.format(tabla='fragmentos_texto'))
+                conn.commit()
+        except Exception as e:
+            print(f"No se pudo crear el índice de búsqueda de texto completo: {e}")
+        
+        if self.backend_vectores == "pgvector":
+            try:
+                with self.obtener_conexion_BaseDatos() as conn:
+                    with conn.cursor() as cursor:
+                        cursor.execute(SQL_PGVECTOR.format(tabla='fragmentos_texto',
+                                                           dimensiones=config.EMBEDDINGS_DIMENSIONES,
+                                                           m=config.PGVECTOR_HNSW_M,
+                                                           ef_construccion=config.PGVECTOR_HNSW_EF_CONSTRUCCION))
+                        self.pgvector_iterativa = soporta_busqueda_iterativa(cursor)
+                    conn.commit()
+            except Exception as e:
+                print(f"No se pudo crear el índice HNSW de pgvector: {e}")
+        return True
     
+    def _sincronizar_fragmentos(self, cursor, datos):
+        """
+        Deja en fragmentos_texto exactamente los fragmentos de `datos`.
+
+        En lugar de vaciar la tabla, conserva (con su id) las filas cuyo
+        contenido no cambió, borra las que ya no están e inserta las nuevas;
+        así el registro de cambios solo contiene diferencias reales y la app
+        móvil no tiene que volver a descargar toda la base.
+
+        `datos` se recorre una sola vez y los fragmentos nuevos se envían con
+        COPY binario en lotes de config.INGESTA_LOTE filas, así que puede ser
+        un generador: nunca se arma la carga completa en memoria.
+
+        Args:
+            cursor: Cursor dentro de la transacción de carga
+            datos: Tuplas (contenido, embedding serializado en bytes, metadata en JSON)
+
+        Returns:
+            tuple: (fragmentos insertados, fragmentos borrados)
+        """
+        # Con la columna de pgvector (ver SQL_PGVECTOR) los vectores se guardan en la misma carga
+        con_vector = tiene_columna_vector(cursor)
+        columnas = ('contenido', 'embedding', 'metadata') + (('vector_embedding',) if con_vector else ())
+        
+        # Ids existentes por resumen del contenido (puede haber contenidos repetidos)
+        cursor.execute("SELECT id, md5(contenido), metadata::text FROM fragmentos_texto ORDER BY id")
+        existentes = {}
+        for id_frag, resumen, metadata in cursor.fetchall():
+            existentes.setdefault(resumen, []).append((id_frag, metadata))
+
+        metadatos = []
+
+        def nuevos():
+            for contenido, embedding, metadata in datos:
+                conservados = existentes.get(hashlib.md5(contenido.encode('utf-8')).hexdigest())
+                if not conservados:
+                    fila = (texto_binario(contenido), embedding, jsonb_binario(metadata))
+                    yield fila + (vector_binario(pickle.loads(embedding)),) if con_vector else fila
+                    continue
+                id_frag, metadata_anterior = conservados.pop(0)
+                if json.loads(metadata_anterior or 'null') != json.loads(metadata):
+                    # p. ej. start_index desplazado por una edición anterior en el documento
+                    metadatos.append((id_frag, metadata))
+
+        insertados = copiar_binario(cursor, 'fragmentos_texto', columnas, nuevos(), tamano_lote=config.INGESTA_LOTE)
+
+        # Lo que quedó sin emparejar ya no está en el documento
+        sobrantes = [id_frag for filas in existentes.values() for id_frag, _ in filas]
+        if sobrantes:
+            cursor.execute("DELETE FROM fragmentos_texto WHERE id = ANY(%s)", (sobrantes,))
+        if metadatos:
+            execute_values(
+                cursor,
+                "UPDATE fragmentos_texto AS f SET metadata = v.metadata::jsonb FROM (VALUES %s) AS v (id, metadata) "
+                "WHERE f.id = v.id",
+                metadatos
+            )
+        return insertados, len(sobrantes)
+
+    def _anotar_fragmentos_guardados(self):
+        """
+        Añade los metadatos de estructura (ver EstructuraNormativa) a los
+        fragmentos guardados antes de que se extrajeran al dividir el texto,
+        ubicándolos en completo.txt por su start_index o por su contenido.
+        """
+        archivo_completo = self.ruta_documentos / 'completo.txt'
+        if not os.path.exists(archivo_completo):
+            return
+        try:
+            with self.obtener_conexion_BaseDatos() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT id, contenido, metadata FROM fragmentos_texto "
+                                   "WHERE metadata IS NULL OR NOT metadata ? 'documento'")
+                    pendientes = cursor.fetchall()
+                    if not pendientes:
+                        return
+                    
+                    with open(archivo_completo, 'r', encoding='utf-8') as archivo:
+                        texto = archivo.read()
+                    estructura = EstructuraNormativa(texto)
+                    
+                    actualizados = []
+                    for id_frag, contenido, metadata in pendientes:
+                        metadata = dict(metadata or {})
+                        inicio = metadata.get('start_index')
+                        if inicio is None:
+                            inicio = texto.find(contenido)
+                            if inicio < 0:
+                                continue
+                        metadata.update(estructura.metadatos(inicio, len(contenido)))
+                        actualizados.append((id_frag, json.dumps(metadata)))
+                    
+                    if actualizados:
+                        execute_values(
+                            cursor,
+                            "UPDATE fragmentos_texto AS f SET metadata = v.metadata::jsonb "
+                            "FROM (VALUES %s) AS v (id, metadata) WHERE f.id = v.id",
+                            actualizados
+                        )
+                conn.commit()
+            print(f"Metadatos de estructura añadidos a {len(actualizados)} de {len(pendientes)} fragmentos")
+        except Exception as e:
+            print(f"No se pudieron añadir los metadatos de estructura: {e}")
+
     def _cargar_desde_postgresql(self):
         """
         Carga los fragmentos desde PostgreSQL y reconstruye el índice FAISS en memoria
         usando el método from_embeddings que es más seguro.
         """
+        if self.backend_vectores == "pgvector":
+            return self._cargar_pgvector()
+        if config.FAISS_MMAP_DIRECTORIO:
+            return self._cargar_indice_mapeado()
         try:
-            conn = self.obtener_conexion_BaseDatos()
-            if not conn:
-                return False
-                    
-            cursor = conn.cursor()
-            cursor.execute("SELECT id, contenido, embedding, metadata FROM fragmentos_texto")
-            resultados = cursor.fetchall()
-            conn.close()
+            with self.obtener_conexion_BaseDatos() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT version FROM version_tablas WHERE tabla = 'fragmentos_texto'")
+                    fila_version = cursor.fetchone()
+                    cursor.execute("SELECT id, contenido, embedding, metadata FROM fragmentos_texto")
+                    resultados = cursor.fetchall()
             
             if not resultados:
                 print("No se encontraron fragmentos en PostgreSQL")
                 return False
+            
+            # Las consultas por id de la app móvil se sirven desde memoria
+            self.almacen.cargar(((id_frag, contenido) for id_frag, contenido, _, _ in resultados),
+                                version=fila_version[0] if fila_version else None)
                     
             # Preparar documentos y embeddings
             documentos = []
@@ -1273,7 +1582,8 @@ class AsistenteJuridico:
             # Crear objeto de embeddings
             vectores = OpenAIEmbeddings(
                 api_key=CLAVE_API,
-                model="text-embedding-ada-002"
+                model="text-embedding-ada-002",
+                request_timeout=config.EMBEDDINGS_TIMEOUT
             )
             
             if embeddings_list and texts:
@@ -1287,6 +1597,7 @@ class AsistenteJuridico:
                 )
                 
                 print("Base de conocimiento reconstruida exitosamente desde PostgreSQL")
+                self.respuesta_degradada.indexar(texts)
                 
                 # Verificar que la base de conocimiento tiene el método as_retriever
                 if hasattr(self.base_conocimiento, 'as_retriever'):
@@ -1306,6 +1617,108 @@ class AsistenteJuridico:
             traceback.print_exc()  # Imprime el stack trace completo para mejor diagnóstico
             return False
 
+    def _cargar_indice_mapeado(self):
+        """
+        Abre el índice FAISS y los textos desde archivos mapeados en memoria
+        (config.FAISS_MMAP_DIRECTORIO), uno por version_indice de
+        fragmentos_texto: a diferencia de version, cambia también cuando solo
+        se actualizan metadatos o embeddings.
+
+        El primer proceso que arranca con una versión nueva lee los
+        fragmentos de PostgreSQL y escribe los archivos; los demás workers
+        solo los abren, sin leer los embeddings ni reconstruir el índice, y
+        comparten las mismas páginas físicas.
+        """
+        try:
+            with self.obtener_conexion_BaseDatos() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT version, version_indice FROM version_tablas "
+                                   "WHERE tabla = 'fragmentos_texto'")
+                    version, version_indice = cursor.fetchone()
+            ruta = ruta_indice(config.FAISS_MMAP_DIRECTORIO, version_indice)
+            
+            if not os.path.isdir(ruta):
+                with self.obtener_conexion_BaseDatos() as conn:
+                    with conn.cursor() as cursor:
+                        cursor.execute("SELECT id, contenido, embedding, metadata FROM fragmentos_texto "
+                                       "WHERE embedding IS NOT NULL ORDER BY id")
+                        resultados = cursor.fetchall()
+                if not resultados:
+                    print("No se encontraron fragmentos en PostgreSQL")
+                    return False
+                
+                escribir_indice(
+                    ruta,
+                    ids=[fila[0] for fila in resultados],
+                    textos=[fila[1] for fila in resultados],
+                    metadatas=[fila[3] if isinstance(fila[3], dict) else json.loads(fila[3] or '{}')
+                               for fila in resultados],
+                    embeddings=[pickle.loads(fila[2]) for fila in resultados]
+                )
+                del resultados
+                podar_indices(config.FAISS_MMAP_DIRECTORIO, conservar=ruta)
+                print(f"Índice mapeado de la versión {version_indice} escrito en {ruta}")
+            
+            vectores = OpenAIEmbeddings(
+                api_key=CLAVE_API,
+                model="text-embedding-ada-002",
+                request_timeout=config.EMBEDDINGS_TIMEOUT
+            )
+            self.base_conocimiento = abrir_indice(ruta, vectores)
+            docstore = self.base_conocimiento.docstore
+            print(f"Índice mapeado abierto desde {ruta}: {len(docstore)} fragmentos")
+            
+            self.almacen.cargar(docstore.fragmentos(), version=version)
+            self.respuesta_degradada.indexar(texto for _, texto in docstore.fragmentos())
+            self._configurar_qa("basico")
+            return True
+        
+        except Exception as e:
+            print(f"ERROR al cargar el índice mapeado: {e}")
+            import traceback
+            traceback.print_exc()
+            return False
+
+    def _cargar_pgvector(self):
+        """
+        Prepara la búsqueda sobre el índice HNSW de pgvector: no se leen los
+        embeddings ni se construye un índice en memoria, solo se completan
+        los vectores que falten y se cargan los textos para el almacén en
+        memoria y la respuesta degradada.
+        """
+        try:
+            with self.obtener_conexion_BaseDatos() as conn:
+                completados = completar_vectores(conn, tamano_lote=config.INGESTA_LOTE)
+                conn.commit()
+            if completados:
+                print(f"Vectores de pgvector completados para {completados} fragmentos")
+            
+            with self.obtener_conexion_BaseDatos() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT version FROM version_tablas WHERE tabla = 'fragmentos_texto'")
+                    fila_version = cursor.fetchone()
+                    cursor.execute("SELECT id, contenido FROM fragmentos_texto")
+                    filas = cursor.fetchall()
+            if not filas:
+                print("No se encontraron fragmentos en PostgreSQL")
+                return False
+            
+            self.almacen.cargar(filas, version=fila_version[0] if fila_version else None)
+            self.respuesta_degradada.indexar(contenido for _, contenido in filas)
+            self.embeddings = OpenAIEmbeddings(
+                api_key=CLAVE_API,
+                model="text-embedding-ada-002",
+                request_timeout=config.EMBEDDINGS_TIMEOUT
+            )
+            print(f"Búsqueda con pgvector sobre {len(filas)} fragmentos")
+            return self._configurar_qa("basico")
+        
+        except Exception as e:
+            print(f"ERROR al preparar la búsqueda con pgvector: {e}")
+            import traceback
+            traceback.print_exc()
+            return False
+
     def _configurar_qa(self,tipo_modelo):
         """
         Configura el modelo de preguntas y respuestas basado en la base de conocimiento.
@@ -1325,21 +1738,23 @@ class AsistenteJuridico:
             #     temperature=0.3
             # )
 
-            if not hasattr(self, 'llm_actual') or self.llm_actual != tipo_modelo:
-                if tipo_modelo == "basico":
-                    self.llm = ChatOpenAI(api_key=CLAVE_API, model_name="gpt-4-turbo", temperature=0.2)
-                elif tipo_modelo == "avanzado":
-                    self.llm = ChatOpenAI(api_key=CLAVE_API, model_name="gpt-4o", temperature=0.3)
-                self.llm_actual = tipo_modelo
+            self.llm = self._llm_de_nivel(tipo_modelo)
+            self.llm_actual = tipo_modelo
             
             
+            # Con pgvector la búsqueda se hace en PostgreSQL: solo hace falta el modelo de embeddings
+            if self.backend_vectores == "pgvector":
+                if self.embeddings is None:
+                    print("Error: El modelo de embeddings no está inicializado")
+                    return False
+            
             # Verificar que self.base_conocimiento existe y es del tipo correcto
-            if not hasattr(self, 'base_conocimiento') or self.base_conocimiento is None:
+            elif not hasattr(self, 'base_conocimiento') or self.base_conocimiento is None:
                 print("Error: La base de conocimiento no está inicializada")
                 return False
                 
             # Verificar que as_retriever es un método disponible
-            if not hasattr(self.base_conocimiento, 'as_retriever'):
+            elif not hasattr(self.base_conocimiento, 'as_retriever'):
                 print(f"Error: La base de conocimiento no tiene método as_retriever. Tipo: {type(self.base_conocimiento)}")
                 return False
             
@@ -1362,25 +1777,7 @@ class AsistenteJuridico:
             #     )
             # )
 
-            self.qa = RetrievalQA.from_chain_type(
-                llm=self.llm,
-                
-                chain_type="stuff",
-                
-                retriever=self.base_conocimiento.as_retriever(
-                    # MMR equilibra relevancia y diversidad
-                    
-                    search_kwargs={
-                        "k": 10,
-                        
-                        "fetch_k": 20,
-                        
-                        "lambda_mult": 0.8
-                    }
-                ),
-                
-                return_source_documents=True
-            )
+            self.qa = self._crear_qa()
                         
             print("Modelo QA configurado exitosamente")
             return True
@@ -1388,6 +1785,107 @@ class AsistenteJuridico:
             print(f"ERROR al configurar el modelo QA: {e}")
             return False
     
+    def _llm_de_nivel(self, tipo_modelo):
+        """Modelo de chat del nivel ('basico' o 'avanzado'; cualquier otro valor usa el básico)."""
+        llm = self.llms.get(tipo_modelo)
+        if llm is None:
+            if tipo_modelo == "avanzado":
+                llm = ChatOpenAI(api_key=CLAVE_API, model_name="gpt-4o", temperature=0.3,
+                                 timeout=config.LLM_TIMEOUT_AVANZADO, max_retries=config.LLM_REINTENTOS,
+                                 model_kwargs={"response_format": ESQUEMA_RESPUESTA})
+            else:
+                llm = ChatOpenAI(api_key=CLAVE_API, model_name="gpt-4-turbo", temperature=0.2,
+                                 timeout=config.LLM_TIMEOUT_BASICO, max_retries=config.LLM_REINTENTOS,
+                                 model_kwargs={"response_format": MODO_JSON})
+            llm = self.llms.setdefault(tipo_modelo, llm)
+        return llm
+
+    def _cadena_de_nivel(self, tipo_modelo, filtros=None):
+        """
+        Cadena de QA para una solicitud, con el modelo de su nivel y sus
+        filtros. No modifica self.qa ni self.llm, que comparten las
+        solicitudes de los dos niveles.
+
+        Returns:
+            RetrievalQA | None: None si la base de conocimiento no está lista
+        """
+        if self.qa is None:
+            return None
+        try:
+            return self._crear_qa(filtros, llm=self._llm_de_nivel(tipo_modelo))
+        except Exception as e:
+            print(f"ERROR al configurar el modelo QA: {e}")
+            return None
+
+    def _crear_qa(self, filtros=None, llm=None):
+        """
+        Crea la cadena de QA con recuperación.
+
+        Args:
+            filtros: Filtros de metadatos normalizados (ver normalizar_filtros)
+                para restringir la búsqueda, o None
+            llm: Modelo de chat (por defecto self.llm)
+        """
+        return RetrievalQA.from_chain_type(
+            llm=llm or self.llm,
+            
+            chain_type="stuff",
+            
+            # Los fragmentos recuperados se fusionan, deduplican y ajustan
+            # al presupuesto de tokens antes de llegar al modelo
+            retriever=RecuperadorEmpaquetado(
+                recuperador=self._crear_recuperador(filtros=filtros),
+                empaquetador=self.empaquetador
+            ),
+            
+            return_source_documents=True
+        )
+    
+    def _crear_recuperador(self, modo=None, filtros=None):
+        """
+        Crea el recuperador (FAISS o pgvector, según config.BACKEND_VECTORES)
+        con el modo de búsqueda configurado.
+        MMR equilibra relevancia y diversidad; similarity_score_threshold
+        descarta fragmentos poco relevantes. Con filtros solo se buscan
+        los fragmentos cuyos metadatos los cumplen.
+        """
+        modo = modo or config.MODO_BUSQUEDA
+        if modo not in MODOS_BUSQUEDA:
+            print(f"Modo de búsqueda desconocido '{modo}', usando 'mmr'")
+            modo = "mmr"
+
+        if self.backend_vectores == "pgvector":
+            return RecuperadorPgvector(
+                pool=self.pool,
+                embeddings=self.embeddings,
+                modo=modo,
+                k=config.BUSQUEDA_K,
+                fetch_k=config.BUSQUEDA_FETCH_K,
+                lambda_mult=config.BUSQUEDA_LAMBDA,
+                umbral=config.BUSQUEDA_UMBRAL,
+                filtros=filtros,
+                ef_search=config.PGVECTOR_EF_SEARCH,
+                busqueda_iterativa=self.pgvector_iterativa
+            )
+
+        metadatos = None
+        if filtros:
+            # Se arma una sola vez por base de conocimiento
+            metadatos = self.metadatos_indice
+            if metadatos is None or metadatos.vectorstore is not self.base_conocimiento:
+                metadatos = self.metadatos_indice = MetadatosIndice(self.base_conocimiento)
+
+        return RecuperadorFAISS(
+            vectorstore=self.base_conocimiento,
+            modo=modo,
+            k=config.BUSQUEDA_K,
+            fetch_k=config.BUSQUEDA_FETCH_K,
+            lambda_mult=config.BUSQUEDA_LAMBDA,
+            umbral=config.BUSQUEDA_UMBRAL,
+            filtros=filtros,
+            metadatos=metadatos
+        )
+
     def _procesar_texto_inicial(self):
         """
         Procesa el archivo completo.txt para crear la base de conocimiento.
@@ -1581,71 +2079,73 @@ class AsistenteJuridico:
                 # - Sin esto, no se detectarían correctamente las listas numeradas de infracciones
                 # - Facilita el manejo de diferentes niveles de indentación (\n  [0-9]+\., \n [0-9]+\.)
                 # - Mejora significativamente la segmentación de artículos con múltiples incisos
-                is_separator_regex=True
+                is_separator_regex=True,
+
+                # add_start_index=True: guarda la posición de cada fragmento en el documento
+                # - Permite fusionar fragmentos contiguos o solapados al armar el contexto
+                add_start_index=True
             )
 
 
 
             fragmentos = divisor_texto.split_documents(textos)
+            # Norma, Título, Capítulo y artículos de cada fragmento, para las búsquedas con filtros
+            EstructuraNormativa(contenido).anotar(fragmentos)
             print(f"Se han creado {len(fragmentos)} fragmentos de texto para la base de conocimiento")
             
             # Crear los vectores de embeddings
             vectores = OpenAIEmbeddings(
                 api_key=CLAVE_API,
-                model="text-embedding-ada-002"
+                model="text-embedding-ada-002",
+                request_timeout=config.EMBEDDINGS_TIMEOUT
             )
             
             # Crear la base de conocimiento vectorial en memoria
             self.base_conocimiento = FAISS.from_documents(fragmentos, vectores)
+            self.embeddings = vectores
+            self.respuesta_degradada.indexar(fragmento.page_content for fragmento in fragmentos)
             
             # Guardar fragmentos en PostgreSQL
             try:
-                conn = self.obtener_conexion_BaseDatos()
-                if conn:
-                    cursor = conn.cursor()
-                    
-                    # Limpiar tabla existente si ya hay datos
-                    cursor.execute("TRUNCATE TABLE fragmentos_texto RESTART IDENTITY")
-                    print("🔄 Tabla fragmentos_texto limpiada, insertando nuevos fragmentos...")
-                    
-                    # Preparar datos para inserción masiva
-                    datos = []
-                    for fragmento in fragmentos:
-                        # Generar embedding para el fragmento
-                        embedding = vectores.embed_query(fragmento.page_content)
-                        embedding_bytes = pickle.dumps(embedding)
-                        
-                        datos.append((
-                            fragmento.page_content,
-                            psycopg2.Binary(embedding_bytes),
-                            json.dumps(fragmento.metadata)
-                        ))
-                    
-                    print(f"🔄 Preparando {len(datos)} fragmentos para inserción en PostgreSQL...")
-                    
-                    # Insertar todos los fragmentos de una vez
-                    execute_values(
-                        cursor,
-                        "INSERT INTO fragmentos_texto (contenido, embedding, metadata) VALUES %s",
-                        datos,
-                        template="(%s, %s, %s)"
+                # Los embeddings ya están en el índice FAISS (from_documents los
+                # calculó en el mismo orden): se leen de ahí en lugar de volver a
+                # pedirlos a OpenAI, así que generar las filas no necesita red y
+                # se pueden enviar a medida que se producen
+                indice = self.base_conocimiento.index
+                datos = (
+                    (
+                        fragmento.page_content,
+                        pickle.dumps(indice.reconstruct(i).tolist()),
+                        json.dumps(fragmento.metadata)
                     )
-                                        
-                    # Verificar que se guardaron correctamente
-                    cursor.execute("SELECT COUNT(*) FROM fragmentos_texto")
-                    count = cursor.fetchone()[0]
+                    for i, fragmento in enumerate(fragmentos)
+                )
+                
+                print(f"🔄 Enviando {len(fragmentos)} fragmentos a PostgreSQL...")
+                
+                # Si algo falla dentro del bloque, el pool deshace la transacción
+                with self.obtener_conexion_BaseDatos() as conn:
+                    with conn.cursor() as cursor:
+                        insertados, borrados = self._sincronizar_fragmentos(cursor, datos)
+                        print(f"🔄 {insertados} fragmentos nuevos y {borrados} eliminados en fragmentos_texto")
+                                            
+                        # Releer los fragmentos con sus ids para el almacén en memoria
+                        cursor.execute("SELECT id, contenido FROM fragmentos_texto")
+                        filas = cursor.fetchall()
+                        count = len(filas)
+                        cursor.execute("SELECT version FROM version_tablas WHERE tabla = 'fragmentos_texto'")
+                        fila_version = cursor.fetchone()
                     
                     conn.commit()
-                    conn.close()
-                    
-                    print(f"✅ {count} fragmentos guardados exitosamente en PostgreSQL")
-                else:
-                    print("❌ No se pudo conectar a PostgreSQL para guardar fragmentos")
+                
+                self.almacen.cargar(filas, version=fila_version[0] if fila_version else None)
+                print(f"✅ {count} fragmentos guardados exitosamente en PostgreSQL")
             except Exception as e:
+                # Sin los fragmentos guardados el servicio no queda listo: el
+                # arranque se reintenta en lugar de responder con un índice que
+                # no está en PostgreSQL
                 print(f"❌ Error al guardar fragmentos en PostgreSQL: {e}")
-                if 'conn' in locals() and conn:
-                    conn.rollback()
-                    conn.close()
+                return False
         except Exception as e:
             print(f"ERROR al procesar texto inicial: {e}")
             return False
@@ -1653,6 +2153,26 @@ class AsistenteJuridico:
         self._configurar_qa("basico")
         return True
 
+    def _resumir_historial(self, resumen_previo, turnos):
+        """
+        Condensa turnos antiguos de la conversación en un resumen breve,
+        partiendo del resumen acumulado anterior (si existe).
+        Con el mismo plazo que el nivel básico: si se agota, el gestor de
+        historial usa el recorte extractivo.
+        """
+        if self.llm_resumen is None:
+            self.llm_resumen = ChatOpenAI(api_key=CLAVE_API, model_name="gpt-4o-mini", temperature=0,
+                                          timeout=config.LLM_TIMEOUT_BASICO, max_retries=config.LLM_REINTENTOS)
+
+        prompt = f"""
+        Resume la siguiente conversación entre un conductor y su asesor legal de tránsito en Bolivia.
+        Conserva los artículos, multas, situaciones y decisiones mencionadas. Máximo 150 palabras, en español.
+
+        RESUMEN ANTERIOR: {resumen_previo or "(ninguno)"}
+        NUEVOS MENSAJES: {json.dumps(turnos, ensure_ascii=False)}
+        """
+        return self.llm_resumen.invoke(prompt).content
+
     def verificar_contexto(self, pregunta):
         """
         Verifica si la pregunta está dentro del contexto de tránsito.
@@ -1660,20 +2180,36 @@ class AsistenteJuridico:
         """
         return self.verificador.verificar_contexto(pregunta)
     
-    def generar_respuesta(self, pregunta, tipo_modelo,historial_conversacion):
+    def preparar_consulta(self, tipo_modelo, historial_conversacion, id_conversacion=None, filtros=None):
+        """
+        Hace todo lo que no depende de la pregunta, para ejecutarlo mientras
+        se transcribe el audio de una consulta por voz: el historial (con el
+        resumen de los turnos antiguos, que puede requerir una llamada al
+        modelo) y la cadena de QA del nivel, con los fragmentos que cumplen
+        los filtros ya seleccionados.
+
+        Returns:
+            tuple: (historial en texto, cadena de QA o None), para generar_respuesta
+        """
+        qa = self._cadena_de_nivel(tipo_modelo, filtros)
+        recuperador = qa.retriever.recuperador if qa is not None else None
+        if filtros and getattr(recuperador, 'metadatos', None) is not None:
+            recuperador.metadatos.posiciones(filtros)
+        return self.gestor_historial.construir(historial_conversacion, id_conversacion), qa
+
+    def generar_respuesta(self, pregunta, tipo_modelo,historial_conversacion, filtros=None, qa=None):
         """
         Genera una respuesta jurídica en dos niveles: consejo rápido de amigo legal
         seguido de información técnica detallada con artículos específicos.
+        
+        Con filtros (normalizados, ver normalizar_filtros) los fragmentos de
+        contexto se buscan solo entre los que cumplen los filtros. `qa` es la
+        cadena ya preparada con preparar_consulta (con los mismos filtros).
         """
-        # Configurar el modelo QA y verificar que se haya configurado correctamente
-        if not self._configurar_qa(tipo_modelo):
-            print("Error: No se pudo configurar el modelo QA")
-            return {
-                "fueraDeContexto": True,
-                "respuestaDirecta": "El sistema no está inicializado correctamente."
-            }
+        if qa is None:
+            qa = self._cadena_de_nivel(tipo_modelo, filtros)
 
-        if not self.qa:
+        if qa is None:
             print("Error: Sistema no inicializado")
             return {
                 "fueraDeContexto": True,
@@ -1915,57 +2451,101 @@ class AsistenteJuridico:
             # Crear un prompt template
             prompt_template = PromptTemplate.from_template(prompt)
             
-            # Invocar la cadena con el prompt
-            respuesta = self.qa.invoke({"query": prompt})
-            
-            # La respuesta puede venir en diferentes formatos dependiendo de la versión de langchain
-            # Intentar extraer el resultado
-            if isinstance(respuesta, dict) and "result" in respuesta:
-                respuesta_cruda = respuesta["result"]
-            elif hasattr(respuesta, "result"):
-                respuesta_cruda = respuesta.result
-            else:
-                respuesta_cruda = str(respuesta)
-            
-            # Extraer y procesar JSON
+            # Con el circuito abierto no se llama al modelo: respuesta degradada inmediata
+            circuito = self.cortacircuitos.get(tipo_modelo, self.cortacircuitos["basico"])
+            if circuito.abierto():
+                return self._responder_sin_modelo(pregunta)
+
+            # La recuperación (embeddings y FAISS o pgvector) queda fuera del
+            # circuito: sus fallos y su latencia no son del modelo de chat
             try:
-                import re
-                json_match = re.search(r'\{.*\}', respuesta_cruda, re.DOTALL)
-                
-                if json_match:
-                    json_str = json_match.group(0).replace('\n', ' ').replace('\r', '')
-                    return json.loads(json_str)
-                else:
-                    # Si no podemos extraer JSON, intentar crear una respuesta estructurada
-                    partes = respuesta_cruda.split('\n\n')
-                    if len(partes) >= 2:
-                        return {
-                            "respuestaAmigo": partes[0],
-                            "análisisLegal": '\n\n'.join(partes[1:]),
-                            "fueraDeContexto": False
-                        }
-                    else:
-                        return {
-                            "respuestaAmigo": respuesta_cruda,
-                            "fueraDeContexto": False
-                        }
-                        
-            except json.JSONDecodeError as e:
-                print(f"Error JSON: {e}")
-                # Intentar rescatar al menos la respuesta rápida
-                primeras_lineas = '\n'.join(respuesta_cruda.split('\n')[:5])
-                return {
-                    "fueraDeContexto": False,
-                    "respuestaAmigo": primeras_lineas,
-                    "análisisLegal": "Disculpa, tuve un problema al generar el análisis legal detallado."
-                }
+                documentos = qa.retriever.invoke(prompt)
+            except Exception as e:
+                print(f"Error al recuperar el contexto: {e}")
+                return self._responder_sin_modelo(pregunta)
+
+            # Si falla el modelo, la respuesta degradada usa los artículos ya
+            # recuperados (con los filtros de la consulta)
+            fragmentos = [documento.page_content for documento in documentos] or None
+            try:
+                parser, respuesta_cruda = circuito.llamar(self._transmitir_respuesta, qa, documentos, prompt)
+            except CircuitoAbiertoError:
+                return self._responder_sin_modelo(pregunta, fragmentos)
+            except Exception as e:
+                print(f"Error al invocar el modelo ({tipo_modelo}): {e}")
+                return self._responder_sin_modelo(pregunta, fragmentos)
+
+            return self._interpretar_respuesta(parser, respuesta_cruda)
                         
         except Exception as e:
             print(f"ERROR: {str(e)}")
             import traceback
             traceback.print_exc()  # Imprime el stack trace completo para mejor diagnóstico
+            # La misma forma que las respuestas del modelo (ver _interpretar_respuesta)
             return {
-                "fueraDeContexto": False,
-                "respuestaAmigo": "Disculpa, ocurrió un error. Intenta con otra pregunta."
+                "diferencias": "",
+                "respuesta": "Disculpa, ocurrió un error. Intenta con otra pregunta.",
+                "fueraDeContexto": False
             }
-            
+
+    def _responder_sin_modelo(self, pregunta, fragmentos=None):
+        """
+        Respuesta degradada sin el modelo de chat, a partir de los fragmentos
+        ya recuperados o, si no los hay, de una búsqueda en memoria.
+        """
+        metricas.contador("respuestas_degradadas_total", "Respuestas generadas sin el modelo de chat").inc()
+        return self.respuesta_degradada.generar(pregunta, fragmentos=fragmentos)
+
+    def estado_cortacircuitos(self):
+        """Estado de los corta circuitos del modelo de chat, por nivel."""
+        return {tipo: circuito.estado() for tipo, circuito in self.cortacircuitos.items()}
+
+    def _transmitir_respuesta(self, qa, documentos, pregunta):
+        """
+        Llama al modelo de chat con el prompt de la cadena "stuff" de `qa` y los
+        documentos ya recuperados, y alimenta el parser incremental con la
+        respuesta en streaming. Deja de leer en cuanto se cierra el objeto JSON.
+
+        Returns:
+            tuple: (ParserJSONIncremental, texto recibido del modelo)
+        """
+        cadena = qa.combine_documents_chain
+        contexto = cadena.document_separator.join(format_document(documento, cadena.document_prompt)
+                                                  for documento in documentos)
+        mensajes = cadena.llm_chain.prompt.format_prompt(**{cadena.document_variable_name: contexto,
+                                                            "question": pregunta})
+        parser = ParserJSONIncremental()
+        partes = []
+        for fragmento in cadena.llm_chain.llm.stream(mensajes):
+            partes.append(fragmento.content)
+            parser.alimentar(fragmento.content)
+            if parser.terminado:
+                break
+        return parser, ''.join(partes)
+
+    def _interpretar_respuesta(self, parser, respuesta_cruda):
+        """
+        Convierte la salida del modelo en el diccionario de respuesta.
+
+        La salida debería ser JSON válido gracias al modo de salida estructurada;
+        si aun así no lo es, se rescatan los campos leídos hasta el error y se
+        devuelve la misma forma (diferencias/respuesta) para que el cliente no
+        tenga que distinguir casos.
+        """
+        metricas.contador("respuestas_json_total", "Respuestas del modelo interpretadas").inc()
+
+        try:
+            campos = parser.resultado()
+        except ValueError as e:
+            metricas.contador("respuestas_json_fallidas_total", "Respuestas del modelo que no eran JSON válido").inc()
+            print(f"Error JSON: {e}")
+            campos = parser.parcial()
+            return {
+                "diferencias": campos.get("diferencias", ""),
+                "respuesta": campos.get("respuesta") or respuesta_cruda,
+                "fueraDeContexto": False
+            }
+
+        campos.setdefault("diferencias", "")
+        campos.setdefault("respuesta", "")
+        return campos
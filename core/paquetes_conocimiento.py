@@ -0,0 +1,116 @@
+import gzip
+import logging
+import os
+import re
+import tempfile
+import threading
+
+from utils.helpers import serializar_json
+
+logger = logging.getLogger(__name__)
+
+_NOMBRE_PAQUETE = re.compile(r'^base_conocimiento_v(\d+)\.json\.gz$')
+
+
+class PaquetesConocimiento:
+    """
+    Paquetes inmutables y versionados de la base de conocimiento.
+
+    Cada paquete es un JSON comprimido con gzip,
+    {"version": v, "fragmentos": [[id, contenido], ...]}, que corresponde
+    exactamente a la versión v de fragmentos_texto. Se escribe una sola vez
+    y no cambia nunca, así que se sirve tal cual (sin volver a comprimir) y
+    con caché de larga duración. La app lo descarga al instalarse o cuando
+    su versión es demasiado antigua, y después se mantiene al día pidiendo
+    solo los cambios desde su versión.
+    """
+
+    def __init__(self, base_conocimiento, directorio, conservar=3):
+        """
+        Args:
+            base_conocimiento: BaseConocimientoMobil de donde se leen los fragmentos
+            directorio: Carpeta donde se guardan los paquetes
+            conservar: Paquetes que se mantienen; los cambios anteriores al más
+                antiguo se borran del registro
+        """
+        self.base_conocimiento = base_conocimiento
+        self.directorio = directorio
+        self.conservar = max(1, conservar)
+        self._lock = threading.Lock()
+        os.makedirs(self.directorio, exist_ok=True)
+
+    def ruta(self, version):
+        """Ruta del paquete de una versión (exista o no)."""
+        return os.path.join(self.directorio, f"base_conocimiento_v{version}.json.gz")
+
+    def versiones(self):
+        """Versiones con paquete en disco, de la más antigua a la más nueva."""
+        versiones = []
+        for nombre in os.listdir(self.directorio):
+            coincidencia = _NOMBRE_PAQUETE.match(nombre)
+            if coincidencia:
+                versiones.append(int(coincidencia.group(1)))
+        return sorted(versiones)
+
+    def actual(self):
+        """
+        Devuelve la versión actual de la base, generando su paquete si aún no
+        existe, o None si la versión no está disponible.
+        """
+        version = self.base_conocimiento.obtener_version()
+        if version is None:
+            return None
+        if not os.path.exists(self.ruta(version)):
+            version = self.generar()
+        return version
+
+    def generar(self):
+        """
+        Escribe el paquete de la versión actual (si no existe ya) y elimina
+        los paquetes y cambios registrados más antiguos.
+
+        Returns:
+            int: Versión del paquete
+        """
+        with self._lock:
+            with self.base_conocimiento.instantanea() as (version, filas):
+                ruta = self.ruta(version)
+                if os.path.exists(ruta):
+                    return version
+                total = self._escribir(ruta, version, filas)
+            logger.info(f"Paquete de la base de conocimiento v{version}: {total} fragmentos, "
+                        f"{os.path.getsize(ruta)} bytes")
+            self._podar()
+            return version
+
+    def _escribir(self, ruta, version, filas):
+        # Escritura atómica: nunca se sirve un paquete a medias
+        descriptor, temporal = tempfile.mkstemp(dir=self.directorio, suffix='.tmp')
+        total = 0
+        try:
+            with os.fdopen(descriptor, 'wb') as archivo:
+                # mtime=0: el mismo contenido produce siempre los mismos bytes
+                with gzip.GzipFile(fileobj=archivo, mode='wb', compresslevel=9, mtime=0) as comprimido:
+                    comprimido.write(f'{{"version": {version}, "fragmentos": ['.encode('utf-8'))
+                    for fila in filas:
+                        separador = ',' if total else ''
+                        comprimido.write((separador + serializar_json(list(fila))).encode('utf-8'))
+                        total += 1
+                    comprimido.write(b']}')
+            os.replace(temporal, ruta)
+        except BaseException:
+            os.unlink(temporal)
+            raise
+        return total
+
+    def _podar(self):
+        versiones = self.versiones()
+        for version in versiones[:-self.conservar]:
+            try:
+                os.remove(self.ruta(version))
+            except OSError as e:
+                logger.warning(f"No se pudo borrar el paquete v{version}: {e}")
+        # Quien tenga una versión anterior al paquete más antiguo descarga un paquete
+        retenidas = versiones[-self.conservar:]
+        if len(retenidas) == self.conservar:
+            self.base_conocimiento.podar_cambios(retenidas[0])
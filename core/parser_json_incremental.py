@@ -0,0 +1,181 @@
+import json
+
+
+class ParserJSONIncremental:
+    """
+    Parser incremental para el objeto JSON que devuelve el modelo.
+
+    Acepta el texto en fragmentos (por ejemplo, los tokens de una respuesta en
+    streaming) y va exponiendo los campos a medida que llegan: los valores de
+    tipo cadena se entregan parcialmente mientras se escriben y el resto de
+    valores cuando están completos. Ignora cualquier texto anterior a la
+    primera llave (por ejemplo, un bloque ```json).
+    """
+
+    _ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+    def __init__(self):
+        self.campos = {}
+        self.terminado = False
+        self.error = None
+
+        self._estado = "inicio"
+        self._clave = None
+        self._cadena = []
+        self._escape = None  # None, "" (tras '\') o los dígitos de un \uXXXX
+        self._valor_crudo = []
+        self._profundidad = 0
+        self._en_cadena_cruda = False
+        self._escape_crudo = False
+
+    def alimentar(self, fragmento):
+        """
+        Procesa un nuevo fragmento de texto.
+
+        Returns:
+            dict: Campos conocidos hasta el momento (las cadenas pueden estar incompletas)
+        """
+        for caracter in fragmento:
+            if self.terminado or self.error:
+                break
+            self._procesar(caracter)
+        return self.parcial()
+
+    def parcial(self):
+        """Campos completos más la cadena que se está escribiendo en este momento."""
+        campos = dict(self.campos)
+        if self._estado == "valor_cadena" and self._clave is not None:
+            campos[self._clave] = ''.join(self._cadena)
+        return campos
+
+    def resultado(self):
+        """
+        Devuelve el objeto completo.
+
+        Raises:
+            ValueError: Si el JSON está incompleto o es inválido
+        """
+        if self.error:
+            raise ValueError(self.error)
+        if not self.terminado:
+            raise ValueError("JSON incompleto")
+        return dict(self.campos)
+
+    def _fallar(self, mensaje):
+        self.error = mensaje
+
+    def _procesar(self, c):
+        estado = self._estado
+
+        if estado == "inicio":
+            if c == '{':
+                self._estado = "clave_esperada"
+
+        elif estado == "clave_esperada":
+            if c == '"':
+                self._cadena = []
+                self._estado = "clave"
+            elif c == '}' and not self.campos:
+                self.terminado = True
+            elif not c.isspace():
+                self._fallar(f"Se esperaba una clave, se encontró {c!r}")
+
+        elif estado in ("clave", "valor_cadena"):
+            if not self._leer_caracter_cadena(c):
+                texto = ''.join(self._cadena)
+                if estado == "clave":
+                    self._clave = texto
+                    self._estado = "dos_puntos"
+                else:
+                    self.campos[self._clave] = texto
+                    self._estado = "coma_o_fin"
+
+        elif estado == "dos_puntos":
+            if c == ':':
+                self._estado = "valor_esperado"
+            elif not c.isspace():
+                self._fallar(f"Se esperaba ':', se encontró {c!r}")
+
+        elif estado == "valor_esperado":
+            if c == '"':
+                self._cadena = []
+                self._estado = "valor_cadena"
+            elif not c.isspace():
+                self._valor_crudo = []
+                self._profundidad = 0
+                self._estado = "valor_otro"
+                self._leer_valor_crudo(c)
+
+        elif estado == "valor_otro":
+            self._leer_valor_crudo(c)
+
+        elif estado == "coma_o_fin":
+            if c == ',':
+                self._estado = "clave_esperada"
+            elif c == '}':
+                self.terminado = True
+            elif not c.isspace():
+                self._fallar(f"Se esperaba ',' o '}}', se encontró {c!r}")
+
+    def _leer_caracter_cadena(self, c):
+        """Acumula un carácter de una cadena JSON. Devuelve False al cerrarse la cadena."""
+        if self._escape is not None:
+            if self._escape == "":
+                if c == 'u':
+                    self._escape = "u"
+                elif c in self._ESCAPES:
+                    self._cadena.append(self._ESCAPES[c])
+                    self._escape = None
+                else:
+                    self._fallar(f"Secuencia de escape inválida: \\{c}")
+                    self._escape = None
+            else:
+                self._escape += c
+                if len(self._escape) == 5:
+                    try:
+                        self._cadena.append(chr(int(self._escape[1:], 16)))
+                    except ValueError:
+                        self._fallar(f"Escape unicode inválido: \\{self._escape}")
+                    self._escape = None
+            return True
+
+        if c == '\\':
+            self._escape = ""
+            return True
+        if c == '"':
+            # Unir pares sustitutos (😀) en un solo carácter
+            texto = ''.join(self._cadena)
+            self._cadena = [texto.encode('utf-16', 'surrogatepass').decode('utf-16', 'replace')]
+            return False
+        self._cadena.append(c)
+        return True
+
+    def _leer_valor_crudo(self, c):
+        """Acumula un valor no cadena (número, literal, lista u objeto) hasta que termina."""
+        if self._en_cadena_cruda:
+            self._valor_crudo.append(c)
+            if self._escape_crudo:
+                self._escape_crudo = False
+            elif c == '\\':
+                self._escape_crudo = True
+            elif c == '"':
+                self._en_cadena_cruda = False
+            return
+
+        if self._profundidad == 0 and c in ',}':
+            try:
+                self.campos[self._clave] = json.loads(''.join(self._valor_crudo))
+            except json.JSONDecodeError as e:
+                self._fallar(f"Valor inválido para '{self._clave}': {e}")
+                return
+            self._estado = "coma_o_fin"
+            self._procesar(c)
+            return
+
+        if c == '"':
+            self._en_cadena_cruda = True
+        elif c in '[{':
+            self._profundidad += 1
+        elif c in ']}':
+            self._profundidad -= 1
+        self._valor_crudo.append(c)
@@ -0,0 +1,193 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import extensions
+
+import config
+from .metricas import metricas
+
+_pools = {}
+_lock_pools = threading.Lock()
+
+
+class PoolAgotadoError(Exception):
+    """Se lanza cuando no se libera ninguna conexión en el tiempo máximo de espera."""
+
+
+def configuracion_bd():
+    """Parámetros de conexión a PostgreSQL leídos de la configuración."""
+    return {
+        'dbname': config.DB_NOMBRE,
+        'user': config.DB_USUARIO,
+        'password': config.DB_CLAVE,
+        'host': config.DB_HOST,
+        'port': config.DB_PUERTO
+    }
+
+
+class PoolConexiones:
+    """
+    Pool de conexiones a PostgreSQL seguro entre hilos.
+
+    Las conexiones se abren bajo demanda hasta `max_conexiones` y al
+    devolverse quedan abiertas para el siguiente préstamo, así que cada
+    consulta se ahorra la conexión TCP, la autenticación y el arranque del
+    proceso servidor. Cuando todas están prestadas, las peticiones esperan
+    hasta `espera` segundos antes de rechazarse con PoolAgotadoError.
+
+    (El ThreadedConnectionPool de psycopg2 no sirve aquí: falla en cuanto se
+    agota y cierra al devolverlas las conexiones por encima de su mínimo.)
+    """
+
+    def __init__(self, db_config, max_conexiones=10, espera=5):
+        """
+        Args:
+            db_config: Parámetros de psycopg2.connect
+            max_conexiones: Conexiones abiertas como máximo
+            espera: Segundos máximos de espera por una conexión libre
+        """
+        self.db_config = db_config
+        self.max_conexiones = max_conexiones
+        self.espera = espera
+        self._libres = []
+        self._heredadas = []
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._turnos = threading.BoundedSemaphore(max_conexiones)
+
+        metricas.medidor('db_pool_tamano_maximo', 'Conexiones abiertas como máximo').establecer(max_conexiones)
+        self._abiertas = metricas.medidor('db_pool_conexiones_abiertas', 'Conexiones abiertas por el pool')
+        self._en_uso = metricas.medidor('db_pool_conexiones_en_uso', 'Conexiones prestadas por el pool')
+        self._esperando = metricas.medidor('db_pool_esperando', 'Peticiones esperando una conexión libre')
+        self._tiempo_espera = metricas.histograma('db_pool_espera_segundos', 'Espera por una conexión del pool')
+        self._nuevas = metricas.contador('db_pool_conexiones_nuevas_total', 'Conexiones abiertas por el pool')
+        self._reutilizadas = metricas.contador('db_pool_conexiones_reutilizadas_total',
+                                               'Préstamos servidos con una conexión ya abierta')
+        self._descartadas = metricas.contador('db_pool_conexiones_descartadas_total',
+                                              'Conexiones cerradas por error o desconexión')
+        self._agotado = metricas.contador('db_pool_agotado_total',
+                                          'Peticiones rechazadas por esperar demasiado una conexión')
+
+    @contextmanager
+    def conexion(self):
+        """
+        Presta una conexión durante el bloque `with` y la devuelve al pool.
+
+        Al salir se deshace cualquier transacción que haya quedado abierta
+        (quien escribe debe llamar a commit), y si la conexión se rompió se
+        cierra en lugar de devolverla.
+
+        Raises:
+            PoolAgotadoError: Si no hay conexión libre en `espera` segundos
+            psycopg2.OperationalError: Si no se puede abrir una conexión nueva
+        """
+        self._esperando.inc()
+        inicio = time.monotonic()
+        try:
+            obtenido = self._turnos.acquire(timeout=self.espera)
+        finally:
+            self._esperando.dec()
+        if not obtenido:
+            self._agotado.inc()
+            raise PoolAgotadoError(f"Las {self.max_conexiones} conexiones a la base de datos están en uso; "
+                                   f"no se liberó ninguna en {self.espera}s")
+
+        try:
+            conn = self._tomar()
+        except Exception:
+            self._turnos.release()
+            raise
+        self._tiempo_espera.observar(time.monotonic() - inicio)
+
+        self._en_uso.inc()
+        descartar = False
+        try:
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            descartar = True
+            raise
+        finally:
+            self._devolver(conn, descartar)
+            self._en_uso.dec()
+            self._turnos.release()
+
+    def _tomar(self):
+        """Saca una conexión libre que siga viva o abre una nueva."""
+        with self._lock:
+            if self._pid != os.getpid():
+                # Un proceso hijo (fork) no puede usar los sockets del padre; se
+                # conservan sin cerrar para no terminar las sesiones del padre
+                self._heredadas, self._libres = self._libres, []
+                self._abiertas.establecer(0)
+                self._pid = os.getpid()
+            while self._libres:
+                conn = self._libres.pop()
+                if not conn.closed and conn.info.transaction_status == extensions.TRANSACTION_STATUS_IDLE:
+                    self._reutilizadas.inc()
+                    return conn
+                self._cerrar(conn)
+
+        conn = psycopg2.connect(**self.db_config)
+        self._nuevas.inc()
+        self._abiertas.inc()
+        return conn
+
+    def _devolver(self, conn, descartar):
+        try:
+            if not conn.closed and conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+        except psycopg2.Error:
+            descartar = True
+
+        if descartar or conn.closed:
+            self._cerrar(conn)
+            return
+        with self._lock:
+            self._libres.append(conn)
+
+    def _cerrar(self, conn):
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+        self._descartadas.inc()
+        self._abiertas.dec()
+
+    def estado(self):
+        """Ocupación actual del pool, para el endpoint de salud."""
+        return {
+            "abiertas": self._abiertas.valor,
+            "en_uso": self._en_uso.valor,
+            "esperando": self._esperando.valor,
+            "max_conexiones": self.max_conexiones,
+            "agotado": self._agotado.valor
+        }
+
+    def cerrar(self):
+        """Cierra las conexiones libres (las prestadas se cierran al devolverse si se rompen)."""
+        with self._lock:
+            libres, self._libres = self._libres, []
+        for conn in libres:
+            conn.close()
+            self._abiertas.dec()
+
+
+def obtener_pool(db_config=None):
+    """
+    Devuelve el pool del proceso para unos parámetros de conexión,
+    creándolo la primera vez. Todas las clases que usan la misma base de
+    datos comparten así las mismas conexiones.
+
+    Args:
+        db_config: Parámetros de psycopg2.connect (por defecto, los de config.py)
+    """
+    db_config = db_config or configuracion_bd()
+    clave = tuple(sorted((k, str(v)) for k, v in db_config.items()))
+    with _lock_pools:
+        if clave not in _pools:
+            _pools[clave] = PoolConexiones(db_config, max_conexiones=config.DB_POOL_MAX,
+                                           espera=config.DB_POOL_ESPERA)
+        return _pools[clave]
@@ -0,0 +1,200 @@
+import json
+from functools import lru_cache
+from typing import Any, Optional
+
+import faiss
+import numpy as np
+from langchain_core.retrievers import BaseRetriever
+
+from .estructura_normativa import cumple_filtros
+from .metricas import metricas
+
+MODOS_BUSQUEDA = ("similarity", "mmr", "similarity_score_threshold")
+CUBETAS_CANDIDATOS = (0, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+
+def seleccionar_mmr(vector_consulta, candidatos, k=10, lambda_mult=0.5):
+    """
+    Selección por Maximal Marginal Relevance vectorizada con NumPy.
+
+    Calcula una sola vez la relevancia de todos los candidatos y la matriz de
+    similitud entre ellos; en cada paso solo actualiza (de forma vectorizada)
+    la similitud máxima de cada candidato con los ya elegidos.
+
+    Args:
+        vector_consulta: Vector de la consulta, forma (d,)
+        candidatos: Matriz de vectores candidatos, forma (n, d)
+        k: Cantidad de resultados a seleccionar
+        lambda_mult: 1 = solo relevancia, 0 = solo diversidad
+
+    Returns:
+        list[int]: Índices de los candidatos elegidos, en orden de selección
+    """
+    candidatos = np.asarray(candidatos, dtype=np.float32)
+    n = candidatos.shape[0]
+    if n == 0 or k <= 0:
+        return []
+
+    consulta = np.asarray(vector_consulta, dtype=np.float32)
+    consulta = consulta / (np.linalg.norm(consulta) or 1.0)
+    normas = np.linalg.norm(candidatos, axis=1, keepdims=True)
+    normas[normas == 0] = 1.0
+    candidatos = candidatos / normas
+
+    relevancia = candidatos @ consulta
+    similitudes = candidatos @ candidatos.T
+
+    elegidos = [int(np.argmax(relevancia))]
+    disponibles = np.ones(n, dtype=bool)
+    disponibles[elegidos[0]] = False
+    similitud_maxima = similitudes[elegidos[0]].copy()
+
+    for _ in range(min(k, n) - 1):
+        puntajes = lambda_mult * relevancia - (1 - lambda_mult) * similitud_maxima
+        puntajes[~disponibles] = -np.inf
+        siguiente = int(np.argmax(puntajes))
+        elegidos.append(siguiente)
+        disponibles[siguiente] = False
+        np.maximum(similitud_maxima, similitudes[siguiente], out=similitud_maxima)
+
+    return elegidos
+
+
+class MetadatosIndice:
+    """
+    Metadatos de cada vector del índice FAISS, por posición, para
+    preseleccionar los candidatos que cumplen unos filtros antes de buscar.
+
+    Se arma una vez por base de conocimiento; las posiciones de cada
+    combinación de filtros se guardan en caché.
+    """
+
+    def __init__(self, vectorstore):
+        self.vectorstore = vectorstore
+        ids = vectorstore.index_to_docstore_id
+        self._metadatos = [vectorstore.docstore.search(ids[posicion]).metadata
+                           for posicion in range(vectorstore.index.ntotal)]
+        self._posiciones = lru_cache(maxsize=128)(self._calcular_posiciones)
+
+    def __len__(self):
+        return len(self._metadatos)
+
+    def _calcular_posiciones(self, clave):
+        filtros = json.loads(clave)
+        return np.array([posicion for posicion, metadatos in enumerate(self._metadatos)
+                         if cumple_filtros(metadatos, filtros)], dtype=np.int64)
+
+    def posiciones(self, filtros):
+        """
+        Posiciones en el índice de los fragmentos que cumplen los filtros.
+
+        Args:
+            filtros: Filtros ya normalizados (ver normalizar_filtros)
+
+        Returns:
+            np.ndarray: Posiciones (int64), en orden
+        """
+        return self._posiciones(json.dumps(filtros, sort_keys=True))
+
+
+def buscar_en_posiciones(indice, vector, k, posiciones):
+    """
+    Búsqueda en el índice FAISS restringida a `posiciones` con un
+    IDSelector: solo se comparan los vectores candidatos, sin copiarlos.
+
+    Returns:
+        tuple: (distancias, posiciones) de forma (1, k), como index.search
+    """
+    selector = faiss.IDSelectorBatch(posiciones)
+    ivf = faiss.try_extract_index_ivf(indice)
+    if ivf is not None:
+        # Los índices IVF (p. ej. el índice mapeado) exigen sus propios parámetros
+        parametros = faiss.SearchParametersIVF(sel=selector, nprobe=ivf.nprobe)
+    else:
+        parametros = faiss.SearchParameters(sel=selector)
+    return indice.search(vector, min(k, len(posiciones)), params=parametros)
+
+
+class RecuperadorFAISS(BaseRetriever):
+    """
+    Recuperador sobre el índice FAISS con modo de búsqueda explícito:
+
+    - similarity: los k fragmentos más cercanos
+    - mmr: fetch_k candidatos más cercanos y selección MMR vectorizada
+    - similarity_score_threshold: los k más cercanos con relevancia >= umbral
+
+    Con `filtros` (ver normalizar_filtros) la búsqueda se restringe a los
+    fragmentos cuyos metadatos los cumplen, preseleccionados con
+    `metadatos` antes de consultar el índice.
+    """
+
+    vectorstore: Any
+    modo: str = "mmr"
+    k: int = 10
+    fetch_k: int = 20
+    lambda_mult: float = 0.8
+    umbral: float = 0.75
+    filtros: Optional[dict] = None
+    metadatos: Any = None
+
+    def _get_relevant_documents(self, query, *, run_manager):
+        if self.filtros:
+            return self._buscar_filtrado(query)
+
+        if self.modo == "similarity":
+            return self.vectorstore.similarity_search(query, k=self.k)
+
+        if self.modo == "similarity_score_threshold":
+            resultados = self.vectorstore.similarity_search_with_relevance_scores(
+                query, k=self.k, score_threshold=self.umbral
+            )
+            return [doc for doc, _ in resultados]
+
+        if self.modo == "mmr":
+            return self._buscar_mmr(query)
+
+        raise ValueError(f"Modo de búsqueda no soportado: {self.modo}. Use uno de {MODOS_BUSQUEDA}")
+
+    def _vector(self, query):
+        return np.array([self.vectorstore.embeddings.embed_query(query)], dtype=np.float32)
+
+    def _documento(self, posicion):
+        return self.vectorstore.docstore.search(self.vectorstore.index_to_docstore_id[posicion])
+
+    def _buscar_filtrado(self, query):
+        if self.modo not in MODOS_BUSQUEDA:
+            raise ValueError(f"Modo de búsqueda no soportado: {self.modo}. Use uno de {MODOS_BUSQUEDA}")
+        metadatos = self.metadatos
+        if metadatos is None or metadatos.vectorstore is not self.vectorstore:
+            metadatos = MetadatosIndice(self.vectorstore)
+        posiciones = metadatos.posiciones(self.filtros)
+        metricas.histograma('busqueda_filtrada_candidatos', 'Fragmentos candidatos tras aplicar los filtros',
+                            cubetas=CUBETAS_CANDIDATOS).observar(len(posiciones))
+        if not len(posiciones):
+            return []
+
+        vector = self._vector(query)
+        k = self.fetch_k if self.modo == "mmr" else self.k
+        distancias, indices = buscar_en_posiciones(self.vectorstore.index, vector, k, posiciones)
+        encontrados = [(float(d), int(i)) for d, i in zip(distancias[0], indices[0]) if i != -1]
+
+        if self.modo == "mmr":
+            return self._seleccionar_mmr(vector, [i for _, i in encontrados])
+        if self.modo == "similarity_score_threshold":
+            relevancia = self.vectorstore._select_relevance_score_fn()
+            encontrados = [(d, i) for d, i in encontrados if relevancia(d) >= self.umbral]
+        return [self._documento(i) for _, i in encontrados]
+
+    def _buscar_mmr(self, query):
+        vector = self._vector(query)
+        _, indices = self.vectorstore.index.search(vector, self.fetch_k)
+        return self._seleccionar_mmr(vector, [int(i) for i in indices[0] if i != -1])
+
+    def _seleccionar_mmr(self, vector, indices):
+        if not indices:
+            return []
+
+        candidatos = self.vectorstore.index.reconstruct_batch(np.array(indices, dtype=np.int64))
+        elegidos = seleccionar_mmr(vector[0], candidatos, k=self.k, lambda_mult=self.lambda_mult)
+
+        return [self._documento(indices[posicion]) for posicion in elegidos]
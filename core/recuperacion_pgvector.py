@@ -0,0 +1,169 @@
+import json
+import math
+import pickle
+from typing import Any, Optional
+
+import numpy as np
+from langchain.docstore.document import Document
+from langchain_core.retrievers import BaseRetriever
+
+from .copia_binaria import copiar_binario, entero_binario, vector_binario
+from .estructura_normativa import condicion_filtros
+from .recuperacion import MODOS_BUSQUEDA, seleccionar_mmr
+
+BACKENDS_VECTORES = ("faiss", "pgvector")
+
+# Embeddings en una columna vector de pgvector con índice HNSW, con la misma
+# distancia (L2) que el IndexFlatL2 de FAISS
+SQL_PGVECTOR = """
+    CREATE EXTENSION IF NOT EXISTS vector;
+    ALTER TABLE {tabla} ADD COLUMN IF NOT EXISTS vector_embedding vector({dimensiones});
+    CREATE INDEX IF NOT EXISTS {tabla}_vector_idx ON {tabla}
+        USING hnsw (vector_embedding vector_l2_ops) WITH (m = {m}, ef_construction = {ef_construccion});
+"""
+
+# Vecinos más cercanos resueltos con el índice HNSW; {filtro} es la condición
+# de condicion_filtros y {columnas} añade el vector cuando hace falta (MMR).
+# El vector se convierte a texto fuera de la subconsulta, solo para las
+# filas que quedan tras el LIMIT
+CONSULTA_VECINOS = """
+    SELECT id, contenido, metadata, distancia{columnas}
+    FROM (
+        SELECT id, contenido, metadata, vector_embedding, vector_embedding <-> %(vector)s::vector AS distancia
+        FROM {tabla}
+        WHERE vector_embedding IS NOT NULL AND ({filtro})
+        ORDER BY vector_embedding <-> %(vector)s::vector
+        LIMIT %(limite)s
+    ) AS vecinos
+    ORDER BY distancia
+"""
+
+# Máximo de hnsw.ef_search que admite pgvector
+EF_SEARCH_MAXIMO = 1000
+
+
+def literal_vector(valores):
+    """Vector en el formato de texto de pgvector ('[0.1, 0.2, ...]')."""
+    return json.dumps([float(valor) for valor in valores])
+
+
+def tiene_columna_vector(cursor, tabla='fragmentos_texto'):
+    """True si la tabla ya tiene la columna vector_embedding (ver SQL_PGVECTOR)."""
+    cursor.execute("SELECT 1 FROM information_schema.columns WHERE table_name = %s AND column_name = 'vector_embedding'",
+                   (tabla,))
+    return cursor.fetchone() is not None
+
+
+def soporta_busqueda_iterativa(cursor):
+    """True si pgvector admite hnsw.iterative_scan (versión 0.8 o posterior)."""
+    cursor.execute("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+    fila = cursor.fetchone()
+    if not fila:
+        return False
+    try:
+        return tuple(int(parte) for parte in fila[0].split('.')[:2]) >= (0, 8)
+    except ValueError:
+        return False
+
+
+def completar_vectores(conn, tabla='fragmentos_texto', tamano_lote=1000):
+    """
+    Llena vector_embedding a partir del embedding serializado de las filas
+    que aún no lo tienen (guardadas antes de crear la columna).
+
+    Los embeddings se leen con un cursor del lado del servidor y los
+    vectores se envían con COPY binario a una tabla temporal, para
+    actualizar todas las filas en una sola sentencia. No hace commit.
+
+    Returns:
+        int: Filas actualizadas
+    """
+    pendiente = "vector_embedding IS NULL AND embedding IS NOT NULL"
+    with conn.cursor() as cursor:
+        cursor.execute(f"SELECT count(*) FROM {tabla} WHERE {pendiente}")
+        if not cursor.fetchone()[0]:
+            return 0
+        cursor.execute("CREATE TEMP TABLE vectores_pendientes (id INTEGER, vector_embedding vector) ON COMMIT DROP")
+
+        with conn.cursor(name='vectores_pendientes') as lector:
+            lector.itersize = tamano_lote
+            lector.execute(f"SELECT id, embedding FROM {tabla} WHERE {pendiente}")
+            filas = ((entero_binario(id_frag), vector_binario(pickle.loads(embedding)))
+                     for id_frag, embedding in lector)
+            copiar_binario(cursor, 'vectores_pendientes', ('id', 'vector_embedding'), filas, tamano_lote=tamano_lote)
+
+        cursor.execute(f"UPDATE {tabla} AS f SET vector_embedding = p.vector_embedding "
+                       f"FROM vectores_pendientes AS p WHERE f.id = p.id")
+        return cursor.rowcount
+
+
+def relevancia_euclidiana(distancia):
+    """
+    Relevancia de una distancia L2, igual que la del vectorstore FAISS de
+    LangChain (que recibe la distancia al cuadrado del IndexFlatL2), para
+    que BUSQUEDA_UMBRAL signifique lo mismo con los dos backends.
+    """
+    return 1.0 - distancia ** 2 / math.sqrt(2)
+
+
+class RecuperadorPgvector(BaseRetriever):
+    """
+    Recuperador sobre la columna vector_embedding de PostgreSQL (pgvector,
+    índice HNSW), con los mismos modos y filtros que RecuperadorFAISS.
+
+    Todos los nodos consultan el mismo índice: no construyen uno propio al
+    arrancar y una nueva carga de fragmentos se ve en todos a la vez.
+    """
+
+    pool: Any
+    embeddings: Any
+    tabla: str = "fragmentos_texto"
+    modo: str = "mmr"
+    k: int = 10
+    fetch_k: int = 20
+    lambda_mult: float = 0.8
+    umbral: float = 0.75
+    filtros: Optional[dict] = None
+    ef_search: int = 40
+    busqueda_iterativa: bool = False
+
+    def _get_relevant_documents(self, query, *, run_manager):
+        if self.modo not in MODOS_BUSQUEDA:
+            raise ValueError(f"Modo de búsqueda no soportado: {self.modo}. Use uno de {MODOS_BUSQUEDA}")
+        vector = self.embeddings.embed_query(query)
+
+        if self.modo == "mmr":
+            filas = self._vecinos(vector, self.fetch_k, con_vectores=True)
+            if not filas:
+                return []
+            candidatos = np.array([json.loads(fila[4]) for fila in filas], dtype=np.float32)
+            elegidos = seleccionar_mmr(np.asarray(vector, dtype=np.float32), candidatos,
+                                       k=self.k, lambda_mult=self.lambda_mult)
+            filas = [filas[posicion] for posicion in elegidos]
+        else:
+            filas = self._vecinos(vector, self.k)
+            if self.modo == "similarity_score_threshold":
+                filas = [fila for fila in filas if relevancia_euclidiana(fila[3]) >= self.umbral]
+
+        return [Document(page_content=fila[1], metadata=fila[2] or {}) for fila in filas]
+
+    def _vecinos(self, vector, limite, con_vectores=False):
+        """Filas (id, contenido, metadata, distancia[, vector]) de los `limite` fragmentos más cercanos."""
+        condicion, parametros = condicion_filtros(self.filtros)
+        consulta = CONSULTA_VECINOS.format(tabla=self.tabla, filtro=condicion,
+                                           columnas=", vector_embedding::text" if con_vectores else "")
+        with self.pool.conexion() as conn:
+            with conn.cursor() as cursor:
+                # El índice HNSW devuelve como mucho ef_search filas: debe cubrir el LIMIT
+                ef_search = min(max(self.ef_search, limite), EF_SEARCH_MAXIMO)
+                cursor.execute(f"SET LOCAL hnsw.ef_search = {int(ef_search)}")
+                if not self.filtros:
+                    # Los vectores van en TOAST y el planificador subestima el costo de
+                    # recorrer la tabla: sin filtros siempre conviene el índice HNSW
+                    cursor.execute("SET LOCAL enable_seqscan = off")
+                elif self.busqueda_iterativa:
+                    # Si los filtros descartan candidatos, seguir recorriendo el índice
+                    # en lugar de devolver menos de `limite` filas
+                    cursor.execute("SET LOCAL hnsw.iterative_scan = strict_order")
+                cursor.execute(consulta, {**parametros, 'vector': literal_vector(vector), 'limite': limite})
+                return cursor.fetchall()
@@ -0,0 +1,180 @@
+import math
+import re
+import unicodedata
+from collections import Counter
+
+# Palabras demasiado comunes para ayudar a ordenar fragmentos
+PALABRAS_VACIAS = {
+    "que", "para", "por", "con", "los", "las", "del", "una", "uno", "unos", "unas", "como",
+    "pero", "mas", "este", "esta", "esto", "ese", "esa", "eso", "cuando", "donde", "porque",
+    "sobre", "entre", "sin", "hay", "tengo", "tiene", "puedo", "puede", "debo", "hacer",
+    "me", "mi", "mis", "le", "les", "se", "su", "sus", "el", "la", "lo", "de", "en", "y", "a",
+    "es", "son", "fue", "si", "no", "ya", "muy", "que", "cual", "quien"
+}
+
+# Encabezado de artículo: "Artículo 380°.- (Título)" o "ARTÍCULO 12."
+PATRON_ARTICULO = re.compile(r'(?=(?:^|\n)\s*(?:Art[íi]culo|ART[ÍI]CULO|Art\.|ART\.)\s*\d+)')
+
+# Montos: "CUATROCIENTOS PESOS BOLIVIANOS ($b. 400.-)", "Bs. 200", "Bs24.000,00"
+PATRON_MONTO = re.compile(
+    r'(?:([A-ZÁÉÍÓÚÑ]{3,}(?:\s+[A-ZÁÉÍÓÚÑ]{2,})*\s+BOLIV[IA]*NOS)[\s,]*\(?\s*)?'
+    r'(?:\$b|Bs)\.?\s*(\d(?:[\d.,]*\d)?)'
+)
+
+# Incisos numerados dentro de un artículo: "\n 11. Por circular ..."
+PATRON_INCISO = re.compile(r'\n(?=\s*\d+\.\s)')
+
+
+def normalizar(texto):
+    """Minúsculas y sin tildes, para comparar términos."""
+    texto = unicodedata.normalize('NFD', texto.lower())
+    return ''.join(c for c in texto if unicodedata.category(c) != 'Mn')
+
+
+def terminos(texto):
+    return [t for t in re.findall(r'[a-z0-9]+', normalizar(texto))
+            if len(t) > 2 and t not in PALABRAS_VACIAS]
+
+
+class GeneradorRespuestaDegradada:
+    """
+    Arma una respuesta sin usar el modelo de lenguaje, para cuando el
+    circuito del modelo de chat está abierto o la llamada falla.
+
+    Ordena los fragmentos en memoria por coincidencia de términos (TF-IDF),
+    sin llamadas de red (los embeddings también dependen de OpenAI), y
+    devuelve los artículos más relacionados junto con los montos de multa
+    que aparecen en ellos.
+    """
+
+    def __init__(self, max_articulos=3):
+        self.max_articulos = max_articulos
+        self._fragmentos = []
+        self._frecuencias = []
+        self._idf = {}
+
+    def indexar(self, textos):
+        """Indexa los textos de los fragmentos de la base de conocimiento."""
+        fragmentos = list(textos)
+        frecuencias = [Counter(terminos(texto)) for texto in fragmentos]
+
+        documentos_con_termino = Counter()
+        for frecuencia in frecuencias:
+            documentos_con_termino.update(frecuencia.keys())
+        total = len(fragmentos) or 1
+        idf = {t: math.log(1 + total / n) for t, n in documentos_con_termino.items()}
+
+        # Reemplazo atómico: las consultas en curso siguen usando el índice anterior
+        self._fragmentos, self._frecuencias, self._idf = fragmentos, frecuencias, idf
+
+    def buscar(self, pregunta, k=5):
+        """Devuelve los k fragmentos con mayor puntaje TF-IDF para la pregunta."""
+        fragmentos, frecuencias, idf = self._fragmentos, self._frecuencias, self._idf
+        consulta = set(terminos(pregunta))
+        puntajes = []
+        for i, frecuencia in enumerate(frecuencias):
+            puntaje = sum((1 + math.log(frecuencia[t])) * idf.get(t, 0) for t in consulta if frecuencia[t])
+            if puntaje > 0:
+                puntajes.append((puntaje, i))
+        puntajes.sort(reverse=True)
+        return [fragmentos[i] for _, i in puntajes[:k]]
+
+    def generar(self, pregunta, fragmentos=None):
+        """
+        Genera la respuesta degradada con la misma forma que la respuesta normal.
+
+        Args:
+            pregunta: Pregunta del usuario
+            fragmentos: Fragmentos ya recuperados (opcional); si no se dan, se buscan en memoria
+        """
+        if fragmentos is None:
+            fragmentos = self.buscar(pregunta)
+
+        consulta = set(terminos(pregunta))
+        articulos = []
+        for fragmento in fragmentos:
+            for articulo in PATRON_ARTICULO.split(fragmento):
+                articulo = articulo.strip()
+                if not re.match(r'(?:Art[íi]culo|ART[ÍI]CULO|Art\.|ART\.)', articulo):
+                    continue
+                puntaje = self._puntaje(consulta, articulo)
+                if puntaje:
+                    articulos.append((puntaje, articulo))
+
+        articulos.sort(key=lambda par: par[0], reverse=True)
+        vistos = set()
+        seleccion = []
+        for _, articulo in articulos:
+            encabezado = articulo.split('\n', 1)[0][:60]
+            if encabezado in vistos:
+                continue
+            vistos.add(encabezado)
+            seleccion.append(self._extracto(consulta, articulo))
+            if len(seleccion) == self.max_articulos:
+                break
+
+        if not seleccion:
+            return {
+                "diferencias": "",
+                "respuesta": ("En este momento no puedo generar un análisis completo. "
+                              "Por favor, intenta de nuevo en unos minutos."),
+                "fueraDeContexto": False,
+                "respuestaDegradada": True
+            }
+
+        diferencias = []
+        partes = ["En este momento no puedo generar un análisis completo, "
+                  "pero estos son los artículos del código de tránsito más relacionados con tu consulta:"]
+        for numero, articulo in enumerate(seleccion, start=1):
+            texto = ' '.join(articulo.split())
+            encabezado = texto.split(')', 1)[0] + ')' if ')' in texto[:120] else texto[:80]
+            diferencias.append(f"{numero}. {encabezado}")
+            montos = self._montos(articulo)
+            if montos:
+                texto += "\nMontos de multa mencionados: " + "; ".join(montos)
+            partes.append(texto)
+
+        return {
+            "diferencias": " ".join(diferencias),
+            "respuesta": "\n\n".join(partes),
+            "fueraDeContexto": False,
+            "respuestaDegradada": True
+        }
+
+    def _puntaje(self, consulta, texto):
+        """Suma del IDF de los términos de la consulta presentes en el texto."""
+        presentes = consulta & set(terminos(texto))
+        return sum(self._idf.get(t, 0) for t in presentes)
+
+    def _extracto(self, consulta, articulo, max_caracteres=1200, max_incisos=4):
+        """
+        Recorta artículos largos: conserva el encabezado y los incisos que
+        coinciden con la consulta (por ejemplo, la infracción concreta y su multa).
+        """
+        if len(articulo) <= max_caracteres:
+            return articulo
+
+        partes = PATRON_INCISO.split(articulo)
+        encabezado, incisos = partes[0], partes[1:]
+        puntajes = {i: self._puntaje(consulta, inciso) for i, inciso in enumerate(incisos)}
+        mejor = max(puntajes.values(), default=0)
+        # Solo los incisos que coinciden al menos la mitad que el mejor
+        elegidos = sorted((i for i in puntajes if puntajes[i] > 0 and puntajes[i] >= mejor / 2),
+                          key=lambda i: puntajes[i], reverse=True)[:max_incisos]
+        relevantes = [incisos[i] for i in sorted(elegidos)]
+
+        if not relevantes:
+            return articulo[:max_caracteres].rsplit(' ', 1)[0] + '...'
+
+        return '\n'.join([encabezado[:max_caracteres]] + [inciso.strip() for inciso in relevantes])
+
+    @staticmethod
+    def _montos(texto):
+        """Montos de multa del texto, normalizados como 'DOSCIENTOS PESOS BOLIVIANOS (Bs. 200)'."""
+        montos = []
+        for literal, cifra in PATRON_MONTO.findall(texto):
+            cifra = cifra.rstrip('.,')
+            monto = f"{' '.join(literal.split())} (Bs. {cifra})" if literal else f"Bs. {cifra}"
+            if monto not in montos:
+                montos.append(monto)
+        return montos
@@ -0,0 +1,273 @@
+import struct
+
+# Bytes que se leen del inicio (y del final, para la duración de OGG)
+BYTES_SONDEO = 64 * 1024
+
+TASAS_MP3 = {3: [44100, 48000, 32000], 2: [22050, 24000, 16000], 0: [11025, 12000, 8000]}
+KBPS_MP3 = {
+    3: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+TASAS_AAC = [96000, 88200, 64000, 48000, 44100, 32000, 24000, 22050, 16000, 12000, 11025, 8000, 7350]
+TASAS_OPUS = {8000, 12000, 16000, 24000, 48000}
+
+# Códecs que el reconocedor acepta directamente: formato para _determinar_formato
+FORMATOS_RECONOCEDOR = {'pcm_s16le': 'WAV', 'flac': 'FLAC', 'opus': 'OGG', 'mp3': 'MP3'}
+
+
+class AudioNoAdmitidoError(ValueError):
+    """Se lanza cuando el audio es demasiado largo o su formato no se puede reconocer."""
+
+
+def sondear_audio(contenido):
+    """
+    Lee la cabecera del audio sin decodificarlo.
+
+    Admite WAV, FLAC, OGG (Opus/Vorbis), MP3, AAC en ADTS y MP4/M4A. Solo
+    examina los primeros KB (y el final en OGG, o las cabeceras de las cajas
+    en MP4), así que cuesta microsegundos incluso con archivos grandes.
+
+    Args:
+        contenido: Bytes del audio
+
+    Returns:
+        dict | None: contenedor, codec, tasa_muestreo, canales, duracion (segundos
+        o None si no se puede saber) y formato ('WAV', 'FLAC', 'OGG', 'MP3' si el
+        reconocedor lo admite tal cual, None si hay que convertirlo). None si el
+        formato no se reconoce.
+    """
+    inicio = contenido[:BYTES_SONDEO]
+    try:
+        if inicio[:4] == b'RIFF' and inicio[8:12] == b'WAVE':
+            info = _sondear_wav(contenido)
+        elif inicio[:4] == b'fLaC':
+            info = _sondear_flac(inicio)
+        elif inicio[:4] == b'OggS':
+            info = _sondear_ogg(contenido)
+        elif inicio[4:8] == b'ftyp':
+            info = _sondear_mp4(contenido)
+        else:
+            info = _sondear_mpeg(contenido)
+    except (struct.error, IndexError, ValueError, ZeroDivisionError):
+        return None
+
+    if info is not None:
+        info['formato'] = FORMATOS_RECONOCEDOR.get(info['codec'])
+    return info
+
+
+def _info(contenedor, codec, tasa, canales, duracion):
+    return {
+        "contenedor": contenedor,
+        "codec": codec,
+        "tasa_muestreo": tasa,
+        "canales": canales,
+        "duracion": round(duracion, 2) if duracion is not None else None
+    }
+
+
+def _sondear_wav(contenido):
+    posicion = 12
+    formato = None
+    while posicion + 8 <= min(len(contenido), BYTES_SONDEO):
+        tipo, tamano = contenido[posicion:posicion + 4], struct.unpack('<I', contenido[posicion + 4:posicion + 8])[0]
+        if tipo == b'fmt ':
+            formato = struct.unpack('<HHIIHH', contenido[posicion + 8:posicion + 24])
+        elif tipo == b'data' and formato:
+            codigo, canales, tasa, bytes_por_segundo, _, bits = formato
+            # Con la cabecera escrita en streaming el tamaño queda en 0xFFFFFFFF
+            datos = min(tamano, len(contenido) - posicion - 8)
+            codec = {1: f'pcm_s{bits}le', 3: 'pcm_f32le', 6: 'alaw', 7: 'mulaw'}.get(codigo, f'wav_{codigo}')
+            return _info('wav', codec, tasa, canales, datos / bytes_por_segundo)
+        posicion += 8 + tamano + (tamano & 1)
+    return None
+
+
+def _sondear_flac(inicio):
+    # Bloque STREAMINFO: tasa (20 bits), canales-1 (3), bits-1 (5), muestras totales (36)
+    bloque = int.from_bytes(inicio[18:26], 'big')
+    tasa = bloque >> 44
+    canales = ((bloque >> 41) & 0x7) + 1
+    muestras = bloque & 0xFFFFFFFFF
+    return _info('flac', 'flac', tasa, canales, muestras / tasa if muestras else None)
+
+
+def _sondear_ogg(contenido):
+    segmentos = contenido[26]
+    paquete = contenido[27 + segmentos:27 + segmentos + 64]
+    if paquete[:8] == b'OpusHead':
+        canales = paquete[9]
+        pre_salto = struct.unpack('<H', paquete[10:12])[0]
+        tasa_original = struct.unpack('<I', paquete[12:16])[0]
+        # Opus siempre decodifica a 48 kHz; la posición de la última página está en esa escala
+        tasa, codec, escala = (tasa_original if tasa_original in TASAS_OPUS else 48000), 'opus', 48000
+    elif paquete[:7] == b'\x01vorbis':
+        canales = paquete[11]
+        tasa = escala = struct.unpack('<I', paquete[12:16])[0]
+        codec, pre_salto = 'vorbis', 0
+    else:
+        return None
+
+    duracion = None
+    final = contenido[-BYTES_SONDEO:]
+    ultima = final.rfind(b'OggS')
+    if ultima != -1 and ultima + 14 <= len(final):
+        posicion = struct.unpack('<q', final[ultima + 6:ultima + 14])[0]
+        if posicion > 0:
+            duracion = (posicion - pre_salto) / escala
+    return _info('ogg', codec, tasa, canales, duracion)
+
+
+def _cajas(contenido, inicio, fin):
+    """Recorre las cajas MP4 entre inicio y fin leyendo solo sus cabeceras."""
+    while inicio + 8 <= fin:
+        tamano, tipo = struct.unpack('>I4s', contenido[inicio:inicio + 8])
+        cabecera = 8
+        if tamano == 1:
+            tamano = struct.unpack('>Q', contenido[inicio + 8:inicio + 16])[0]
+            cabecera = 16
+        elif tamano == 0:
+            tamano = fin - inicio
+        if tamano < cabecera:
+            return
+        yield tipo, inicio + cabecera, min(inicio + tamano, fin)
+        inicio += tamano
+
+
+def _buscar(contenido, inicio, fin, ruta):
+    """Primera caja que sigue la ruta de tipos (por ejemplo [b'mdia', b'minf'])."""
+    for tipo, datos, final in _cajas(contenido, inicio, fin):
+        if tipo == ruta[0]:
+            return (datos, final) if len(ruta) == 1 else _buscar(contenido, datos, final, ruta[1:])
+    return None
+
+
+def indice_mp4_al_final(contenido):
+    """
+    Indica si un MP4/M4A tiene el índice (moov) después de los datos (mdat).
+    Esos archivos no se pueden decodificar leyendo de forma secuencial.
+    """
+    if contenido[4:8] != b'ftyp':
+        return False
+    try:
+        for tipo, _, _ in _cajas(contenido, 0, len(contenido)):
+            if tipo in (b'moov', b'mdat'):
+                return tipo == b'mdat'
+    except struct.error:
+        pass
+    return False
+
+
+def _sondear_mp4(contenido):
+    moov = _buscar(contenido, 0, len(contenido), [b'moov'])
+    if moov is None:
+        return None
+
+    for tipo, datos, final in _cajas(contenido, *moov):
+        if tipo != b'trak':
+            continue
+        mdia = _buscar(contenido, datos, final, [b'mdia'])
+        hdlr = mdia and _buscar(contenido, *mdia, [b'hdlr'])
+        if not hdlr or contenido[hdlr[0] + 8:hdlr[0] + 12] != b'soun':
+            continue
+
+        mdhd = _buscar(contenido, *mdia, [b'mdhd'])
+        stsd = _buscar(contenido, *mdia, [b'minf', b'stbl', b'stsd'])
+        if mdhd is None or stsd is None:
+            # Pista de audio sin cabecera o sin descripción del códec: archivo dañado
+            return None
+
+        mdhd = mdhd[0]
+        if contenido[mdhd] == 1:
+            escala, duracion = struct.unpack('>IQ', contenido[mdhd + 20:mdhd + 32])
+        else:
+            escala, duracion = struct.unpack('>II', contenido[mdhd + 12:mdhd + 20])
+
+        # stsd: versión/flags (4), número de entradas (4), entrada: tamaño (4), códec (4), ...
+        entrada = stsd[0] + 8
+        codigo = contenido[entrada + 4:entrada + 8]
+        canales = struct.unpack('>H', contenido[entrada + 24:entrada + 26])[0]
+        tasa = struct.unpack('>I', contenido[entrada + 32:entrada + 36])[0] >> 16
+        codec = {b'mp4a': 'aac', b'Opus': 'opus', b'fLaC': 'flac', b'alac': 'alac',
+                 b'.mp3': 'mp3'}.get(codigo, codigo.decode('latin-1').strip())
+        # Opus y FLAC dentro de MP4 no se admiten tal cual: se marcan como otro contenedor
+        return _info('mp4', codec if codec in ('aac', 'alac') else f'mp4_{codec}', tasa, canales,
+                     duracion / escala if escala else None)
+    return None
+
+
+def _sondear_mpeg(contenido):
+    """MP3 (MPEG capa III) o AAC en ADTS, saltando una etiqueta ID3v2 inicial."""
+    posicion = 0
+    if contenido[:3] == b'ID3':
+        tamano = contenido[6:10]
+        posicion = 10 + ((tamano[0] << 21) | (tamano[1] << 14) | (tamano[2] << 7) | tamano[3])
+
+    limite = min(len(contenido), posicion + BYTES_SONDEO)
+    while posicion + 4 <= limite:
+        if contenido[posicion] == 0xFF:
+            segundo = contenido[posicion + 1]
+            if segundo & 0xF6 == 0xF0:
+                info = _sondear_adts(contenido, posicion)
+                if info:
+                    return info
+            elif segundo & 0xE0 == 0xE0:
+                info = _sondear_mp3(contenido, posicion)
+                if info:
+                    return info
+        posicion += 1
+    return None
+
+
+def _sondear_adts(contenido, posicion):
+    tercero, cuarto = contenido[posicion + 2], contenido[posicion + 3]
+    indice_tasa = (tercero >> 2) & 0xF
+    if indice_tasa >= len(TASAS_AAC):
+        return None
+    tasa = TASAS_AAC[indice_tasa]
+    canales = ((tercero & 1) << 2) | (cuarto >> 6)
+
+    # Longitud media de trama en los primeros KB (cada trama son 1024 muestras)
+    inicio, tramas = posicion, 0
+    limite = min(len(contenido), posicion + BYTES_SONDEO)
+    while posicion + 7 <= limite and contenido[posicion] == 0xFF and contenido[posicion + 1] & 0xF6 == 0xF0:
+        longitud = ((contenido[posicion + 3] & 3) << 11) | (contenido[posicion + 4] << 3) | (contenido[posicion + 5] >> 5)
+        if longitud < 7:
+            break
+        posicion += longitud
+        tramas += 1
+    if tramas < 2:
+        return None
+
+    duracion = (len(contenido) - inicio) / ((posicion - inicio) / tramas) * 1024 / tasa
+    return _info('adts', 'aac', tasa, canales, duracion)
+
+
+def _sondear_mp3(contenido, posicion):
+    segundo, tercero, cuarto = contenido[posicion + 1], contenido[posicion + 2], contenido[posicion + 3]
+    version = (segundo >> 3) & 3
+    capa = (segundo >> 1) & 3
+    indice_kbps, indice_tasa = tercero >> 4, (tercero >> 2) & 3
+    if version == 1 or capa != 1 or indice_kbps in (0, 15) or indice_tasa == 3:
+        return None
+
+    tasa = TASAS_MP3[version][indice_tasa]
+    kbps = KBPS_MP3[3 if version == 3 else 2][indice_kbps]
+    canales = 1 if cuarto >> 6 == 3 else 2
+    muestras_trama = 1152 if version == 3 else 576
+    longitud = muestras_trama // 8 * kbps * 1000 // tasa + ((tercero >> 1) & 1)
+
+    # Confirmar la sincronización con la cabecera de la trama siguiente
+    siguiente = posicion + longitud
+    if siguiente + 2 <= len(contenido) and (contenido[siguiente] != 0xFF or contenido[siguiente + 1] & 0xE0 != 0xE0):
+        return None
+
+    # Cabecera Xing/Info (VBR): número total de tramas tras la información lateral
+    lateral = (17 if canales == 1 else 32) if version == 3 else (9 if canales == 1 else 17)
+    xing = posicion + 4 + lateral
+    if contenido[xing:xing + 4] in (b'Xing', b'Info') and struct.unpack('>I', contenido[xing + 4:xing + 8])[0] & 1:
+        tramas = struct.unpack('>I', contenido[xing + 8:xing + 12])[0]
+        duracion = tramas * muestras_trama / tasa
+    else:
+        duracion = (len(contenido) - posicion) * 8 / (kbps * 1000)
+    return _info('mp3', 'mp3', tasa, canales, duracion)
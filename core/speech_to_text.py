@@ -1,7 +1,33 @@
 import os
+import time
 import logging
+from google.api_core.exceptions import InvalidArgument
 from google.cloud import speech_v1 as speech
 from tempfile import NamedTemporaryFile
+import config
+from .transcripcion_larga import leer_wav, codificar_wav, dividir_en_silencios, transcribir_en_paralelo
+from .metricas import metricas
+from .transcodificador import TranscodificacionError
+from .ejecutor_transcripcion import EjecutorTranscripcion
+from .backends_voz import BackendGoogle
+from .sondeo_audio import AudioNoAdmitidoError, sondear_audio
+
+# Formatos que admite el reconocimiento en streaming (sin contenedor o con
+# contenedor que se puede decodificar por partes)
+FORMATOS_STREAMING = {
+    'LINEAR16': speech.RecognitionConfig.AudioEncoding.LINEAR16,
+    'FLAC': speech.RecognitionConfig.AudioEncoding.FLAC,
+    'OGG_OPUS': speech.RecognitionConfig.AudioEncoding.OGG_OPUS,
+    'WEBM_OPUS': speech.RecognitionConfig.AudioEncoding.WEBM_OPUS,
+}
+
+# Segundos máximos que admite el reconocimiento síncrono de Google
+DURACION_SINCRONA_MAXIMA = 60
+
+# Cubetas de los histogramas de transcripción
+CUBETAS_BYTES = (16 * 1024, 64 * 1024, 256 * 1024, 1024 ** 2, 4 * 1024 ** 2, 16 * 1024 ** 2)
+CUBETAS_DURACION_AUDIO = (1, 2, 5, 10, 20, 30, 60, 120, 300, 600, 900)
+CUBETAS_FACTOR = (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1, 1.5, 2, 5)
 
 # Configuración de logging
 logging.basicConfig(level=logging.INFO,
@@ -13,50 +39,60 @@ class GoogleSpeechToText:
     Clase para manejar la conversión de audio a texto utilizando Google Speech-to-Text API
     """
     
-    def __init__(self, credentials_path=None):
+    def __init__(self, credentials_path=None, transcodificador=None, ejecutor=None, cache=None, backend=None):
         """
         Inicializa el cliente de Google Speech-to-Text
         
         Args:
             credentials_path: Ruta al archivo de credenciales JSON (opcional)
+            transcodificador: Transcodificador que normaliza el audio a 16 kHz mono (opcional)
+            ejecutor: EjecutorTranscripcion que limita los reconocimientos simultáneos (opcional)
+            cache: CacheTranscripcion para no repetir audios ya transcritos (opcional)
+            backend: BackendVoz que realiza el reconocimiento (por defecto el SpeechClient compartido)
         """
+        self.transcodificador = transcodificador
+        self.cache = cache
+        self.ejecutor = ejecutor or EjecutorTranscripcion(config.TRANSCRIPCION_MAX_SIMULTANEAS,
+                                                          config.TRANSCRIPCION_TIMEOUT_COLA)
         # Configurar credenciales si se proporcionan
         if credentials_path:
             os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = credentials_path
-        elif not os.environ.get("GOOGLE_APPLICATION_CREDENTIALS"):
+        elif not os.environ.get("GOOGLE_APPLICATION_CREDENTIALS") and backend is None:
             logger.warning("No se han configurado las credenciales de Google. " 
                          "Asegúrate de configurar GOOGLE_APPLICATION_CREDENTIALS.")
         
         try:
-            self.cliente = speech.SpeechClient()
-            logger.info("Cliente de Google Speech-to-Text inicializado correctamente")
+            self.cliente = backend or BackendGoogle()
+            if isinstance(self.cliente, BackendGoogle):
+                self.cliente.conectar()
+            logger.info(f"Backend de voz '{self.cliente.nombre}' inicializado correctamente")
         except Exception as e:
-            logger.error(f"Error al inicializar el cliente de Google Speech-to-Text: {e}")
+            logger.error(f"Error al inicializar el backend de voz: {e}")
             raise
     
-    def transcribir_audio(self, archivo_audio, idioma="es-ES", tasa_muestreo=16000, formato=None):
+    def transcribir_audio(self, archivo_audio, idioma=None, tasa_muestreo=16000, formato=None, modo_largo=False):
         """
         Transcribe un archivo de audio a texto
         
+        Si hay un transcodificador disponible, el audio se convierte antes a
+        16 kHz mono (FLAC u Opus), de modo que el reconocedor recibe siempre
+        una codificación correcta y un contenido mucho más pequeño. Si hay
+        caché, un audio idéntico ya transcrito se devuelve sin llamar a Google.
+        
         Args:
             archivo_audio: Bytes del archivo de audio o ruta al archivo
-            idioma: Código del idioma (por defecto 'es-ES')
+            idioma: Código del idioma (por defecto config.IDIOMA_TRANSCRIPCION)
             tasa_muestreo: Frecuencia de muestreo en Hz (por defecto 16000)
-            formato: Formato del audio (None para autodetectar, o usar valores como 'MP3', 'WAV', etc.)
+            formato: Formato del audio (None para autodetectar, o usar valores como 'MP3', 'WAV', 'M4A', etc.)
+            modo_largo: Usar directamente el modo de audio largo (más de ~1 minuto)
             
         Returns:
             str: Texto transcrito
         """
         try:
-            # Verificar si es un archivo m4a y ajustar tasa de muestreo
-            if isinstance(archivo_audio, str) and os.path.splitext(archivo_audio)[1].lower() == '.m4a':
-                formato = 'MP3'
-                tasa_muestreo = 44100
-                logger.info(f"Detectado archivo m4a, usando formato MP3 y tasa de muestreo {tasa_muestreo}")
-                
-
-            # Determinar el formato de audio
-            encoding = self._determinar_formato(archivo_audio, formato)
+            idioma = idioma or config.IDIOMA_TRANSCRIPCION
+            if formato is None and isinstance(archivo_audio, str):
+                formato = os.path.splitext(archivo_audio)[1].lstrip('.').upper() or None
             
             # Manejar entrada como bytes o como ruta de archivo
             if isinstance(archivo_audio, bytes):
@@ -68,31 +104,303 @@ class GoogleSpeechToText:
                     contenido = audio_file.read()
                 logger.info(f"Transcribiendo archivo: {archivo_audio}")
             
-            # Configurar reconocimiento
-            audio = speech.RecognitionAudio(content=contenido)
-            config = speech.RecognitionConfig(
-                encoding=speech.RecognitionConfig.AudioEncoding.MP3,
-                sample_rate_hertz=16000,
-                language_code="es-419",
-                enable_automatic_punctuation=True
-            )
+            clave = None
+            if self.cache is not None:
+                clave = self.cache.clave(contenido, idioma, formato, 'largo' if modo_largo else None)
+                texto_completo = self.cache.obtener(clave)
+                if texto_completo is not None:
+                    logger.info("Transcripción obtenida de la caché")
+                    return texto_completo
             
-            # Realizar transcripción
-            logger.info("Enviando a Google Speech API...")
-            respuesta = self.cliente.recognize(config=config, audio=audio)
-            
-            # Extraer resultado
-            texto_completo = ""
-            for resultado in respuesta.results:
-                texto_completo += resultado.alternatives[0].transcript + " "
-            
-            logger.info("Transcripción completada")
-            return texto_completo.strip()
+            medidas = {}
+            inicio = time.perf_counter()
+            texto_completo = self._reconocer(contenido, idioma, tasa_muestreo, formato, modo_largo, medidas)
+            self._registrar_medidas(medidas, len(contenido), time.perf_counter() - inicio)
+            if clave is not None:
+                self.cache.guardar(clave, texto_completo)
+            return texto_completo
             
         except Exception as e:
             logger.error(f"Error durante la transcripción: {e}")
             raise
     
+    def _reconocer(self, contenido, idioma, tasa_muestreo, formato, modo_largo, medidas=None):
+        """
+        Sondea la cabecera del audio, lo convierte si hace falta (y hay
+        transcodificador) y lo envía al reconocedor.
+
+        Args:
+            medidas: Diccionario que se completa con el códec, la duración, los
+                bytes enviados y los tiempos de conversión y reconocimiento
+        """
+        medidas = {} if medidas is None else medidas
+        info = sondear_audio(contenido)
+        canales = 1
+        medidas['codec'] = info['codec'] if info else 'desconocido'
+        medidas['duracion'] = info['duracion'] if info else None
+        if info is not None:
+            logger.info(f"Audio {info['contenedor']}/{info['codec']}: {info['tasa_muestreo']} Hz, "
+                        f"{info['canales']} canal(es), {info['duracion']}s")
+            if info['duracion'] and info['duracion'] > config.AUDIO_DURACION_MAXIMA:
+                raise AudioNoAdmitidoError(f"El audio dura {info['duracion']:.0f}s; "
+                                           f"el máximo es {config.AUDIO_DURACION_MAXIMA:.0f}s")
+            if info['duracion'] and info['duracion'] > DURACION_SINCRONA_MAXIMA and not modo_largo:
+                # Se evita la llamada síncrona que Google rechazaría por larga
+                logger.info("Audio de más de un minuto, usando modo largo")
+                modo_largo = True
+
+        if info is not None and self._admitido_sin_convertir(info, modo_largo):
+            formato, tasa_muestreo, canales = info['formato'], info['tasa_muestreo'], info['canales']
+        else:
+            # En modo largo se convierte a WAV para poder dividir en silencios
+            inicio = time.perf_counter()
+            convertido = self._transcodificar(contenido, 'WAV' if modo_largo else None)
+            medidas['transcodificacion'] = time.perf_counter() - inicio
+            if convertido:
+                contenido, formato, tasa_muestreo = convertido
+            elif info is None:
+                raise AudioNoAdmitidoError("Formato de audio no reconocido y no hay transcodificador disponible")
+            elif info['formato'] is None:
+                raise AudioNoAdmitidoError(f"El códec {info['codec']} no es compatible con el reconocedor "
+                                           f"y no hay transcodificador disponible")
+            else:
+                formato, tasa_muestreo, canales = info['formato'], info['tasa_muestreo'], info['canales']
+        
+        medidas['bytes_enviados'] = len(contenido)
+        inicio = time.perf_counter()
+        try:
+            return self._enviar(contenido, idioma, tasa_muestreo, formato, modo_largo, canales)
+        finally:
+            medidas['reconocimiento'] = time.perf_counter() - inicio
+
+    def _enviar(self, contenido, idioma, tasa_muestreo, formato, modo_largo, canales):
+        """Envía el audio ya preparado al reconocimiento síncrono o al de audio largo."""
+        if modo_largo:
+            return self.transcribir_audio_largo(contenido, formato=formato, tasa_muestreo=tasa_muestreo,
+                                                idioma=idioma, canales=canales)
+
+        # Configurar reconocimiento
+        audio = speech.RecognitionAudio(content=contenido)
+        configuracion = self._crear_config(self._determinar_formato(contenido, formato), tasa_muestreo, idioma,
+                                           canales)
+        
+        # Realizar transcripción
+        logger.info("Enviando a Google Speech API...")
+        try:
+            respuesta = self.ejecutor.ejecutar(self.cliente.recognize, config=configuracion, audio=audio)
+        except InvalidArgument as e:
+            # El reconocimiento síncrono rechaza audio de más de ~1 minuto
+            if "too long" not in str(e).lower():
+                raise
+            logger.info("Audio demasiado largo para reconocimiento síncrono, usando modo largo")
+            return self.transcribir_audio_largo(contenido, formato=formato, tasa_muestreo=tasa_muestreo,
+                                                idioma=idioma, canales=canales)
+        
+        texto_completo = self._extraer_texto(respuesta)
+        logger.info("Transcripción completada")
+        return texto_completo
+    
+    @staticmethod
+    def _registrar_medidas(medidas, bytes_audio, total):
+        """
+        Exporta las medidas de una transcripción como histogramas y deja una
+        línea de registro con el detalle de la solicitud.
+        """
+        codec = medidas.get('codec', 'desconocido')
+        duracion = medidas.get('duracion')
+
+        metricas.histograma('transcripcion_audio_bytes', 'Tamaño del audio recibido',
+                            cubetas=CUBETAS_BYTES).observar(bytes_audio)
+        metricas.histograma('transcripcion_bytes_enviados', 'Tamaño del audio enviado al reconocedor',
+                            cubetas=CUBETAS_BYTES).observar(medidas.get('bytes_enviados', bytes_audio))
+        metricas.histograma('transcripcion_total_segundos', 'Tiempo total de transcripción (sin caché)',
+                            {'codec': codec}).observar(total)
+        factor = None
+        if duracion:
+            factor = total / duracion
+            metricas.histograma('transcripcion_audio_duracion_segundos', 'Duración del audio transcrito',
+                                cubetas=CUBETAS_DURACION_AUDIO).observar(duracion)
+            metricas.histograma('transcripcion_factor_tiempo_real',
+                                'Tiempo de transcripción dividido por la duración del audio',
+                                {'codec': codec}, cubetas=CUBETAS_FACTOR).observar(factor)
+
+        logger.info(f"Transcripción {codec}: {duracion}s de audio, {bytes_audio} -> "
+                    f"{medidas.get('bytes_enviados', bytes_audio)} bytes, "
+                    f"conversión {medidas.get('transcodificacion', 0) * 1000:.0f} ms, "
+                    f"reconocimiento {medidas.get('reconocimiento', 0) * 1000:.0f} ms, "
+                    f"total {total * 1000:.0f} ms"
+                    + (f", factor de tiempo real {factor:.2f}" if factor is not None else ""))
+
+    @staticmethod
+    def _admitido_sin_convertir(info, modo_largo):
+        """
+        Indica si el audio ya es compacto y aceptado por el reconocedor tal
+        cual (FLAC, WAV u Opus mono de hasta 16 kHz), sin pasar por ffmpeg.
+        En modo largo solo WAV, que es lo que se divide en silencios.
+        """
+        if modo_largo:
+            return info['formato'] == 'WAV'
+        if info['canales'] != 1 or info['formato'] not in ('WAV', 'FLAC', 'OGG'):
+            return False
+        return info['formato'] == 'OGG' or info['tasa_muestreo'] <= 16000
+
+    def transcribir_audio_largo(self, contenido, formato=None, tasa_muestreo=16000, idioma=None, canales=1,
+                                max_trabajadores=4, duracion_tramo=50.0, timeout=600):
+        """
+        Transcribe audio de más de un minuto (por ejemplo, un control policial completo).
+
+        El audio WAV se divide en tramos cortados en silencios, que se
+        transcriben en paralelo con un grupo acotado de hilos y se vuelven a
+        unir en orden. Los formatos comprimidos se envían al reconocimiento
+        de larga duración de Google.
+
+        Args:
+            contenido: Bytes del audio
+            formato: Formato del audio ('WAV', 'MP3', ...)
+            tasa_muestreo: Frecuencia de muestreo en Hz (formatos comprimidos)
+            idioma: Código del idioma (por defecto config.IDIOMA_TRANSCRIPCION)
+            canales: Canales del audio (formatos comprimidos)
+            max_trabajadores: Reconocimientos simultáneos como máximo
+            duracion_tramo: Segundos máximos por tramo
+            timeout: Segundos máximos de espera del reconocimiento de larga duración
+
+        Returns:
+            str: Texto transcrito
+        """
+        if (formato or '').upper() == 'WAV':
+            muestras, tasa = leer_wav(contenido)
+            tramos = dividir_en_silencios(muestras, tasa, duracion_maxima=duracion_tramo)
+            fragmentos = [codificar_wav(muestras[inicio:fin], tasa) for inicio, fin in tramos]
+            logger.info(f"Audio largo de {len(muestras) / tasa:.1f}s dividido en {len(fragmentos)} tramos")
+
+            configuracion = self._crear_config(speech.RecognitionConfig.AudioEncoding.LINEAR16, tasa, idioma)
+
+            def reconocer(fragmento):
+                respuesta = self.ejecutor.ejecutar(self.cliente.recognize, config=configuracion,
+                                                  audio=speech.RecognitionAudio(content=fragmento))
+                return self._extraer_texto(respuesta)
+
+            textos = transcribir_en_paralelo(fragmentos, reconocer, max_trabajadores)
+            logger.info("Transcripción de audio largo completada")
+            return " ".join(texto for texto in textos if texto)
+
+        logger.info("Enviando audio largo al reconocimiento de larga duración...")
+        configuracion = self._crear_config(self._determinar_formato(contenido, formato), tasa_muestreo, idioma,
+                                           canales)
+
+        # El turno del ejecutor se mantiene hasta que termina la operación de larga duración
+        with self.ejecutor.turno():
+            operacion = self.cliente.long_running_recognize(config=configuracion,
+                                                            audio=speech.RecognitionAudio(content=contenido))
+            respuesta = operacion.result(timeout=timeout)
+
+        texto_completo = self._extraer_texto(respuesta)
+        logger.info("Transcripción de audio largo completada")
+        return texto_completo
+
+    def transcribir_streaming(self, fragmentos, formato='LINEAR16', tasa_muestreo=16000,
+                              resultados_intermedios=True, una_frase=False, idioma=None):
+        """
+        Transcribe audio a medida que se graba, con reconocimiento en streaming.
+
+        Los fragmentos se envían a Google en cuanto llegan, así que el texto
+        final está listo poco después de que el usuario deja de hablar, en vez
+        de esperar a la subida completa más el reconocimiento.
+
+        Args:
+            fragmentos: Iterable de bytes de audio (por ejemplo, tramos de ~100 ms)
+            formato: Uno de FORMATOS_STREAMING
+            tasa_muestreo: Frecuencia de muestreo en Hz
+            resultados_intermedios: Emitir también transcripciones parciales
+            una_frase: Terminar el reconocimiento al detectar el fin de la frase
+            idioma: Código del idioma (por defecto config.IDIOMA_TRANSCRIPCION)
+
+        Yields:
+            dict: Eventos {"tipo": "parcial" | "final", "texto": ...} y un
+            último evento {"tipo": "fin", "texto": <texto completo>}
+        """
+        encoding = FORMATOS_STREAMING.get((formato or '').upper())
+        if encoding is None:
+            raise ValueError(f"Formato no admitido en streaming: {formato}. "
+                             f"Use: {', '.join(FORMATOS_STREAMING)}")
+
+        configuracion = speech.StreamingRecognitionConfig(
+            config=self._crear_config(encoding, tasa_muestreo, idioma),
+            interim_results=resultados_intermedios,
+            single_utterance=una_frase
+        )
+
+        fin_audio = [None]
+
+        def solicitudes():
+            for fragmento in fragmentos:
+                if fragmento:
+                    yield speech.StreamingRecognizeRequest(audio_content=fragmento)
+            fin_audio[0] = time.perf_counter()
+
+        activas = metricas.medidor('transcripciones_streaming_activas',
+                                   'Transcripciones en streaming en curso')
+        metricas.contador('transcripciones_streaming_total', 'Transcripciones en streaming iniciadas').inc()
+        finales = []
+        # El stream ocupa un turno del ejecutor de principio a fin, como cualquier otro reconocimiento
+        with self.ejecutor.turno():
+            activas.inc()
+            try:
+                for respuesta in self.cliente.streaming_recognize(config=configuracion, requests=solicitudes()):
+                    parcial = []
+                    for resultado in respuesta.results:
+                        if not resultado.alternatives:
+                            continue
+                        alternativa = resultado.alternatives[0]
+                        if resultado.is_final:
+                            finales.append(alternativa.transcript.strip())
+                            yield {"tipo": "final", "texto": alternativa.transcript.strip(),
+                                   "confianza": round(alternativa.confidence, 3)}
+                        else:
+                            parcial.append(alternativa.transcript)
+                    if parcial:
+                        yield {"tipo": "parcial", "texto": "".join(parcial).strip()}
+            finally:
+                activas.dec()
+
+        if fin_audio[0] is not None:
+            logger.info(f"Transcripción en streaming lista {(time.perf_counter() - fin_audio[0]) * 1000:.0f} ms "
+                        f"después del fin del audio")
+        yield {"tipo": "fin", "texto": " ".join(texto for texto in finales if texto)}
+
+    def _transcodificar(self, contenido, formato=None):
+        """
+        Convierte el audio con el transcodificador, si está disponible.
+
+        Returns:
+            tuple | None: (contenido, formato, tasa de muestreo), o None si no se convirtió
+        """
+        if self.transcodificador is None or not self.transcodificador.disponible:
+            return None
+        try:
+            return self.transcodificador.transcodificar(contenido, formato)
+        except TranscodificacionError as e:
+            logger.warning(f"No se pudo convertir el audio, se envía el original: {e}")
+            return None
+
+    def _crear_config(self, encoding, tasa_muestreo, idioma=None, canales=1):
+        """Configuración de reconocimiento común a todos los modos."""
+        return speech.RecognitionConfig(
+            encoding=encoding,
+            sample_rate_hertz=tasa_muestreo,
+            audio_channel_count=canales,
+            language_code=idioma or config.IDIOMA_TRANSCRIPCION,
+            enable_automatic_punctuation=True
+        )
+
+    @staticmethod
+    def _extraer_texto(respuesta):
+        """Une las transcripciones de los resultados de una respuesta de reconocimiento."""
+        texto_completo = ""
+        for resultado in respuesta.results:
+            texto_completo += resultado.alternatives[0].transcript + " "
+        return texto_completo.strip()
+    
     def _determinar_formato(self, archivo, formato_indicado=None):
         """
         Determina el formato de codificación apropiado para el archivo de audio
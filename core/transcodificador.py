@@ -0,0 +1,119 @@
+import os
+import logging
+import shutil
+import subprocess
+import threading
+import time
+from tempfile import NamedTemporaryFile
+
+from .metricas import metricas
+from .sondeo_audio import indice_mp4_al_final
+
+logger = logging.getLogger(__name__)
+
+# Formatos de salida: argumentos de ffmpeg y nombre del formato para el reconocedor
+FORMATOS_SALIDA = {
+    'FLAC': (['-c:a', 'flac', '-sample_fmt', 's16', '-f', 'flac'], 'FLAC'),
+    'OPUS': (['-c:a', 'libopus', '-b:a', '24k', '-application', 'voip', '-f', 'ogg'], 'OGG'),
+    'WAV': (['-c:a', 'pcm_s16le', '-f', 'wav'], 'WAV'),
+}
+
+
+class TranscodificacionError(Exception):
+    """Se lanza cuando ffmpeg no puede convertir el audio."""
+
+
+class Transcodificador:
+    """
+    Normaliza el audio subido a 16 kHz mono antes de enviarlo al reconocedor.
+
+    Cada conversión es un proceso ffmpeg que lee por stdin y escribe por
+    stdout (sin archivos temporales). Un semáforo limita los procesos
+    simultáneos para que una ráfaga de subidas no sature la CPU; las
+    solicitudes que no consiguen un proceso esperan su turno.
+    """
+
+    def __init__(self, ruta_ffmpeg='ffmpeg', max_procesos=4, formato='FLAC', tasa_muestreo=16000, timeout=30):
+        """
+        Args:
+            ruta_ffmpeg: Ejecutable de ffmpeg (nombre en el PATH o ruta completa)
+            max_procesos: Procesos ffmpeg simultáneos como máximo
+            formato: Formato de salida por defecto ('FLAC', 'OPUS' o 'WAV')
+            tasa_muestreo: Frecuencia de salida en Hz
+            timeout: Segundos máximos por conversión
+        """
+        if formato.upper() not in FORMATOS_SALIDA:
+            raise ValueError(f"Formato de salida no admitido: {formato}. Use: {', '.join(FORMATOS_SALIDA)}")
+        self.ruta_ffmpeg = shutil.which(ruta_ffmpeg) or ruta_ffmpeg
+        self.formato = formato.upper()
+        self.tasa_muestreo = tasa_muestreo
+        self.timeout = timeout
+        self._procesos = threading.BoundedSemaphore(max_procesos)
+
+    @property
+    def disponible(self):
+        """Indica si el ejecutable de ffmpeg existe."""
+        return os.path.isfile(self.ruta_ffmpeg) and os.access(self.ruta_ffmpeg, os.X_OK)
+
+    def transcodificar(self, contenido, formato=None):
+        """
+        Convierte audio en cualquier formato admitido por ffmpeg a 16 kHz mono.
+
+        Args:
+            contenido: Bytes del audio original
+            formato: Formato de salida (por defecto el configurado)
+
+        Returns:
+            tuple: (bytes convertidos, formato para el reconocedor, tasa de muestreo)
+
+        Raises:
+            TranscodificacionError: Si ffmpeg falla o tarda demasiado
+        """
+        formato = (formato or self.formato).upper()
+        argumentos, formato_reconocedor = FORMATOS_SALIDA[formato]
+
+        activas = metricas.medidor('transcodificaciones_activas', 'Procesos ffmpeg en curso')
+        inicio = time.perf_counter()
+        with self._procesos:
+            activas.inc()
+            try:
+                if indice_mp4_al_final(contenido):
+                    # MP4/M4A con el índice (moov) al final: ffmpeg necesita
+                    # poder saltar dentro del archivo, lo que no es posible por stdin
+                    salida = self._ejecutar_desde_archivo(argumentos, contenido)
+                else:
+                    salida = self._ejecutar('pipe:0', argumentos, contenido)
+            finally:
+                activas.dec()
+
+        duracion = time.perf_counter() - inicio
+        metricas.histograma('transcodificacion_segundos', 'Tiempo de conversión con ffmpeg (incluida la espera)',
+                            {'formato': formato}).observar(duracion)
+        metricas.contador('transcodificacion_bytes_entrada_total', 'Bytes de audio antes de convertir').inc(len(contenido))
+        metricas.contador('transcodificacion_bytes_salida_total', 'Bytes de audio después de convertir').inc(len(salida))
+        logger.info(f"Audio convertido a {formato} {self.tasa_muestreo} Hz mono: {len(contenido)} -> {len(salida)} bytes "
+                    f"en {duracion * 1000:.0f} ms")
+        return salida, formato_reconocedor, self.tasa_muestreo
+
+    def _ejecutar(self, entrada, argumentos, contenido=None):
+        comando = [self.ruta_ffmpeg, '-hide_banner', '-loglevel', 'error']
+        if contenido is None:
+            comando.append('-nostdin')
+        comando += ['-i', entrada, '-vn', '-ac', '1', '-ar', str(self.tasa_muestreo)] + argumentos + ['pipe:1']
+        try:
+            proceso = subprocess.run(comando, input=contenido, capture_output=True, timeout=self.timeout)
+        except subprocess.TimeoutExpired:
+            raise TranscodificacionError(f"ffmpeg superó el tiempo máximo de {self.timeout}s")
+        except OSError as e:
+            raise TranscodificacionError(f"No se pudo ejecutar ffmpeg: {e}")
+
+        if proceso.returncode != 0 or not proceso.stdout:
+            error = proceso.stderr.decode('utf-8', 'replace').strip().splitlines()
+            raise TranscodificacionError(f"ffmpeg falló: {error[-1] if error else proceso.returncode}")
+        return proceso.stdout
+
+    def _ejecutar_desde_archivo(self, argumentos, contenido):
+        with NamedTemporaryFile(suffix='.m4a') as temporal:
+            temporal.write(contenido)
+            temporal.flush()
+            return self._ejecutar(temporal.name, argumentos)
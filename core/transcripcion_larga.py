@@ -0,0 +1,96 @@
+import io
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+def leer_wav(contenido):
+    """
+    Lee un WAV PCM de 16 bits desde bytes.
+
+    Returns:
+        tuple: (muestras mono int16, tasa de muestreo)
+    """
+    with wave.open(io.BytesIO(contenido), 'rb') as wav:
+        if wav.getsampwidth() != 2:
+            raise ValueError("Solo se admite WAV PCM de 16 bits para dividir audio largo")
+        canales = wav.getnchannels()
+        tasa = wav.getframerate()
+        muestras = np.frombuffer(wav.readframes(wav.getnframes()), dtype='<i2')
+
+    if canales > 1:
+        muestras = muestras.reshape(-1, canales).mean(axis=1).astype(np.int16)
+    return muestras, tasa
+
+
+def codificar_wav(muestras, tasa):
+    """Codifica muestras mono int16 como WAV (LINEAR16)."""
+    salida = io.BytesIO()
+    with wave.open(salida, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(tasa)
+        wav.writeframes(np.asarray(muestras, dtype='<i2').tobytes())
+    return salida.getvalue()
+
+
+def dividir_en_silencios(muestras, tasa, duracion_maxima=50.0, duracion_minima=15.0, ventana=0.03):
+    """
+    Divide el audio en tramos de como mucho `duracion_maxima` segundos,
+    cortando en un silencio (ventana de energía mínima) para no partir palabras.
+
+    Args:
+        muestras: Muestras mono int16
+        tasa: Tasa de muestreo en Hz
+        duracion_maxima: Segundos máximos por tramo (el reconocimiento síncrono admite ~60 s)
+        duracion_minima: El corte se busca a partir de estos segundos del inicio del tramo
+        ventana: Segundos por ventana de energía
+
+    Returns:
+        list[tuple]: Pares (inicio, fin) en muestras
+    """
+    total = len(muestras)
+    maximo = int(duracion_maxima * tasa)
+    if total <= maximo:
+        return [(0, total)]
+
+    # Energía RMS por ventana, calculada de una vez para todo el audio
+    tamano = max(1, int(ventana * tasa))
+    ventanas = total // tamano
+    bloques = muestras[:ventanas * tamano].astype(np.float32).reshape(ventanas, tamano)
+    energia = np.sqrt((bloques ** 2).mean(axis=1))
+
+    tramos = []
+    inicio = 0
+    while total - inicio > maximo:
+        desde = (inicio + int(duracion_minima * tasa)) // tamano
+        hasta = min((inicio + maximo) // tamano, ventanas)
+        if hasta <= desde:
+            corte = inicio + maximo
+        else:
+            # Última ventana silenciosa del rango permitido (cerca del mínimo de
+            # energía), para que los tramos sean lo más largos posible
+            rango = energia[desde:hasta]
+            silenciosas = np.flatnonzero(rango <= rango.min() * 2 + 1)
+            corte = (desde + int(silenciosas[-1])) * tamano + tamano // 2
+        tramos.append((inicio, corte))
+        inicio = corte
+    tramos.append((inicio, total))
+    return tramos
+
+
+def transcribir_en_paralelo(fragmentos, reconocer, max_trabajadores=4):
+    """
+    Transcribe los fragmentos con un grupo acotado de hilos y devuelve los
+    textos en el mismo orden que los fragmentos.
+
+    Args:
+        fragmentos: Lista de bytes de audio
+        reconocer: Función bytes -> str
+        max_trabajadores: Reconocimientos simultáneos como máximo
+    """
+    if len(fragmentos) == 1:
+        return [reconocer(fragmentos[0])]
+    with ThreadPoolExecutor(max_workers=max(1, min(max_trabajadores, len(fragmentos)))) as ejecutor:
+        return list(ejecutor.map(reconocer, fragmentos))
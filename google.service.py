@@ -4,9 +4,18 @@ from google.cloud import speech_v1 as speech
 # Corregir la ruta al archivo de credenciales (asegúrate de que esta ruta sea correcta)
 os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = r"C:\Users\jsahonero\Desktop\Semestre 01 2025\lectorPdfIA\nimble-artwork-438818-k0-ade40f7834b6.json"
 
+# Cliente único: se crea en la primera transcripción y se reutiliza en las siguientes
+_cliente = None
+
+def obtener_cliente():
+    global _cliente
+    if _cliente is None:
+        _cliente = speech.SpeechClient()
+    return _cliente
+
 def transcribir_m4a(ruta_archivo):
     # El resto del código permanece igual
-    cliente = speech.SpeechClient()
+    cliente = obtener_cliente()
     
     print(f"Transcribiendo archivo: {ruta_archivo}")
     
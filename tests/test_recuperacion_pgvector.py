@@ -0,0 +1,183 @@
+"""
+Pruebas de RecuperadorPgvector frente a RecuperadorFAISS con los mismos
+fragmentos y embeddings.
+
+Usan la base de datos de config.py (variables DB_*), que debe tener la
+extensión vector; se omiten si no hay conexión o no está instalada. Crean
+una tabla de prueba con embeddings de pocas dimensiones y la borran al
+terminar.
+"""
+import json
+import pickle
+
+import numpy as np
+import psycopg2
+import pytest
+from psycopg2.extras import Json
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import Embeddings
+
+import config
+from core.estructura_normativa import normalizar_filtros
+from core.pool_conexiones import PoolAgotadoError, obtener_pool
+from core.recuperacion import MetadatosIndice, RecuperadorFAISS
+from core.recuperacion_pgvector import (SQL_PGVECTOR, RecuperadorPgvector, completar_vectores, literal_vector,
+                                        relevancia_euclidiana)
+
+TABLA = "prueba_recuperacion_pgvector"
+DIMENSIONES = 8
+FRAGMENTOS = 60
+K = 5
+FETCH_K = 15
+
+DOCUMENTOS = ("Ley 4740", "Código de Tránsito")
+TITULOS = (("I", "Disposiciones generales"), ("II", "De las sanciones"), ("III", "De las licencias"))
+
+FILTROS = [
+    None,
+    {"titulo": 2},
+    {"documento": "codigo de transito", "capitulo": "I"},
+    {"articulo": [5, 20, 40]},
+    {"tema": "sanciones"},
+]
+
+
+class EmbeddingsPrecalculados(Embeddings):
+    """Devuelve el vector ya calculado de cada consulta de prueba."""
+
+    def __init__(self, vectores):
+        self.vectores = vectores
+
+    def embed_query(self, text):
+        return self.vectores[text]
+
+    def embed_documents(self, texts):
+        return [self.vectores[texto] for texto in texts]
+
+
+def metadatos_fragmento(i):
+    titulo, titulo_nombre = TITULOS[i % 3]
+    return {"documento": DOCUMENTOS[i % 2], "titulo": titulo, "titulo_nombre": titulo_nombre,
+            "capitulo": ("I", "II")[i // 3 % 2], "articulos": [i + 1, i + 2]}
+
+
+@pytest.fixture(scope='module')
+def datos():
+    aleatorio = np.random.default_rng(0)
+    vectores = aleatorio.normal(size=(FRAGMENTOS, DIMENSIONES)).astype(np.float32)
+    vectores /= np.linalg.norm(vectores, axis=1, keepdims=True)
+    textos = [f"fragmento {i}" for i in range(FRAGMENTOS)]
+
+    # Consultas cercanas a algunos fragmentos, para que haya vecinos sobre el umbral
+    cercanos = vectores[aleatorio.integers(0, FRAGMENTOS, 5)] + 0.1 * aleatorio.normal(size=(5, DIMENSIONES))
+    consultas = {f"consulta {i}": vector.astype(np.float32).tolist() for i, vector in enumerate(cercanos)}
+    return textos, vectores, EmbeddingsPrecalculados(consultas)
+
+
+@pytest.fixture(scope='module')
+def pool(datos):
+    textos, vectores, _ = datos
+    pool = obtener_pool()
+    try:
+        with pool.conexion() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("CREATE EXTENSION IF NOT EXISTS vector")
+                cursor.execute(f"DROP TABLE IF EXISTS {TABLA}")
+                cursor.execute(f"""
+                    CREATE TABLE {TABLA} (
+                        id SERIAL PRIMARY KEY,
+                        contenido TEXT NOT NULL,
+                        embedding BYTEA,
+                        metadata JSONB,
+                        fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                """)
+                cursor.execute(SQL_PGVECTOR.format(tabla=TABLA, dimensiones=DIMENSIONES, m=config.PGVECTOR_HNSW_M,
+                                                   ef_construccion=config.PGVECTOR_HNSW_EF_CONSTRUCCION))
+                for i, (texto, vector) in enumerate(zip(textos, vectores)):
+                    cursor.execute(f"INSERT INTO {TABLA} (contenido, embedding, metadata, vector_embedding) "
+                                   f"VALUES (%s, %s, %s, %s::vector)",
+                                   (texto, pickle.dumps(vector.tolist()), Json(metadatos_fragmento(i)),
+                                    literal_vector(vector)))
+            conn.commit()
+    except (psycopg2.Error, PoolAgotadoError) as e:
+        pytest.skip(f"PostgreSQL con pgvector no está disponible: {e}")
+
+    yield pool
+
+    with pool.conexion() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {TABLA}")
+        conn.commit()
+
+
+@pytest.fixture(scope='module')
+def base_faiss(datos):
+    textos, vectores, embeddings = datos
+    return FAISS.from_embeddings([(texto, vector.tolist()) for texto, vector in zip(textos, vectores)], embeddings,
+                                 metadatas=[metadatos_fragmento(i) for i in range(FRAGMENTOS)])
+
+
+def contenidos(documentos):
+    return [documento.page_content for documento in documentos]
+
+
+@pytest.mark.parametrize('filtros', FILTROS, ids=lambda filtros: str(filtros))
+@pytest.mark.parametrize('modo', ["similarity", "mmr", "similarity_score_threshold"])
+def test_mismos_resultados_que_faiss(datos, pool, base_faiss, modo, filtros):
+    _, _, embeddings = datos
+    filtros = normalizar_filtros(filtros)
+    comunes = dict(modo=modo, k=K, fetch_k=FETCH_K, lambda_mult=0.5, umbral=0.5, filtros=filtros)
+    faiss_ = RecuperadorFAISS(vectorstore=base_faiss, metadatos=MetadatosIndice(base_faiss), **comunes)
+    # ef_search alto y búsqueda iterativa: con tan pocas filas el HNSW es exacto
+    pgvector = RecuperadorPgvector(pool=pool, embeddings=embeddings, tabla=TABLA, ef_search=100,
+                                   busqueda_iterativa=True, **comunes)
+
+    encontrados = 0
+    for consulta in embeddings.vectores:
+        esperados = faiss_.invoke(consulta)
+        documentos = pgvector.invoke(consulta)
+        assert contenidos(documentos) == contenidos(esperados)
+        assert [documento.metadata for documento in documentos] == [documento.metadata for documento in esperados]
+        encontrados += len(documentos)
+    assert encontrados
+
+
+def test_umbral_descarta_lejanos(datos, pool):
+    _, _, embeddings = datos
+    comunes = dict(pool=pool, embeddings=embeddings, tabla=TABLA, k=K, ef_search=100)
+    for consulta in embeddings.vectores:
+        todos = RecuperadorPgvector(modo="similarity", **comunes).invoke(consulta)
+        cercanos = RecuperadorPgvector(modo="similarity_score_threshold", umbral=0.5, **comunes).invoke(consulta)
+        assert 0 < len(cercanos) < len(todos)
+        assert contenidos(cercanos) == contenidos(todos)[:len(cercanos)]
+
+
+def test_relevancia_euclidiana_igual_que_faiss(datos, pool, base_faiss):
+    _, _, embeddings = datos
+    recuperador = RecuperadorPgvector(pool=pool, embeddings=embeddings, tabla=TABLA, ef_search=100)
+    for consulta, vector in embeddings.vectores.items():
+        esperados = base_faiss.similarity_search_with_relevance_scores(consulta, k=K)
+        filas = recuperador._vecinos(vector, K)
+        assert [fila[1] for fila in filas] == [documento.page_content for documento, _ in esperados]
+        assert [relevancia_euclidiana(fila[3]) for fila in filas] == pytest.approx(
+            [relevancia for _, relevancia in esperados], abs=1e-5)
+
+
+def test_completar_vectores(datos, pool):
+    _, vectores, _ = datos
+    with pool.conexion() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {TABLA} (contenido, embedding) VALUES (%s, %s), (%s, %s) RETURNING id",
+                           ("sin vector 1", pickle.dumps(vectores[0].tolist()),
+                            "sin vector 2", pickle.dumps(vectores[1].tolist())))
+            ids = [fila[0] for fila in cursor.fetchall()]
+
+            assert completar_vectores(conn, TABLA, tamano_lote=1) == 2
+            cursor.execute(f"SELECT vector_embedding::text FROM {TABLA} WHERE id = ANY(%s) ORDER BY id", (ids,))
+            completados = [np.array(json.loads(fila[0]), dtype=np.float32) for fila in cursor.fetchall()]
+            np.testing.assert_allclose(completados, vectores[:2], rtol=1e-6)
+
+            # Las filas que ya tienen vector no se vuelven a escribir
+            assert completar_vectores(conn, TABLA) == 0
+        # completar_vectores no hace commit: el pool deshace las filas de prueba
@@ -0,0 +1,30 @@
+"""Pruebas del sondeo de cabeceras con archivos MP4 incompletos."""
+import struct
+
+import pytest
+
+from core.backends_voz import BackendLocal
+from core.sondeo_audio import AudioNoAdmitidoError, sondear_audio
+from core.speech_to_text import GoogleSpeechToText
+
+
+def caja(tipo, datos=b''):
+    return struct.pack('>I4s', 8 + len(datos), tipo) + datos
+
+
+def mp4_con_pista_de_audio(*cajas_mdia):
+    """ftyp → moov → trak → mdia con un hdlr 'soun' y las cajas indicadas."""
+    hdlr = caja(b'hdlr', b'\0' * 8 + b'soun' + b'\0' * 12)
+    mdia = caja(b'mdia', hdlr + b''.join(cajas_mdia))
+    return caja(b'ftyp', b'M4A \0\0\0\0') + caja(b'moov', caja(b'trak', mdia))
+
+
+@pytest.mark.parametrize('cajas_mdia', [(), (caja(b'mdhd', b'\0' * 24),)], ids=['sin_mdhd', 'sin_stsd'])
+def test_pista_sin_cabeceras_no_se_reconoce(cajas_mdia):
+    assert sondear_audio(mp4_con_pista_de_audio(*cajas_mdia)) is None
+
+
+def test_pista_sin_cabeceras_se_rechaza_sin_transcodificador():
+    transcriptor = GoogleSpeechToText(backend=BackendLocal(latencia=0, variacion=0))
+    with pytest.raises(AudioNoAdmitidoError):
+        transcriptor.transcribir_audio(mp4_con_pista_de_audio(), formato='M4A')
@@ -0,0 +1,116 @@
+"""
+Pruebas del transcodificador con el audio de ejemplo prueba.m4a.
+
+prueba.m4a es AAC en ADTS (48 kHz estéreo); las variantes MP4 se generan
+con ffmpeg a partir de él. Se omiten si ffmpeg no está disponible
+(configure FFMPEG_RUTA).
+"""
+import os
+import subprocess
+
+import pytest
+from google.cloud import speech_v1 as speech
+
+import config
+from core.backends_voz import BackendLocal
+from core.sondeo_audio import indice_mp4_al_final, sondear_audio
+from core.speech_to_text import GoogleSpeechToText
+from core.transcodificador import Transcodificador
+
+RUTA_AUDIO = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'prueba.m4a')
+
+
+@pytest.fixture(scope='module')
+def transcodificador():
+    transcodificador = Transcodificador(config.FFMPEG_RUTA)
+    if not transcodificador.disponible:
+        pytest.skip("ffmpeg no está disponible (configure FFMPEG_RUTA)")
+    return transcodificador
+
+
+@pytest.fixture(scope='module')
+def original():
+    with open(RUTA_AUDIO, 'rb') as f:
+        return f.read()
+
+
+def convertir_a_mp4(transcodificador, directorio, indice_al_inicio):
+    """Copia el AAC de prueba.m4a en un contenedor MP4, con el índice (moov) al inicio o al final."""
+    ruta = os.path.join(directorio, 'inicio.m4a' if indice_al_inicio else 'final.m4a')
+    comando = [transcodificador.ruta_ffmpeg, '-hide_banner', '-loglevel', 'error', '-y', '-i', RUTA_AUDIO,
+               '-c', 'copy', '-f', 'mp4']
+    if indice_al_inicio:
+        comando += ['-movflags', '+faststart']
+    subprocess.run(comando + [ruta], check=True, timeout=60)
+    with open(ruta, 'rb') as f:
+        return f.read()
+
+
+class BackendRegistro(BackendLocal):
+    """Backend local sin latencia que guarda la configuración y el audio que recibe."""
+
+    def __init__(self):
+        super().__init__(latencia=0, variacion=0)
+        self.recibidos = []
+
+    def recognize(self, config, audio):
+        self.recibidos.append((config, audio.content))
+        return super().recognize(config, audio)
+
+
+def test_prueba_es_aac_en_adts(original):
+    info = sondear_audio(original)
+    assert info['contenedor'] == 'adts'
+    assert (info['codec'], info['tasa_muestreo'], info['canales']) == ('aac', 48000, 2)
+
+
+@pytest.mark.parametrize('formato, formato_reconocedor', [('FLAC', 'FLAC'), ('OPUS', 'OGG'), ('WAV', 'WAV')])
+def test_salida_16khz_mono(transcodificador, original, formato, formato_reconocedor):
+    salida, formato_salida, tasa = transcodificador.transcodificar(original, formato)
+
+    info = sondear_audio(salida)
+    assert (formato_salida, tasa) == (formato_reconocedor, 16000)
+    assert info['formato'] == formato_reconocedor
+    assert (info['tasa_muestreo'], info['canales']) == (16000, 1)
+    # El FLAC escrito por stdout no lleva el total de muestras (ffmpeg no puede volver atrás)
+    if info['duracion'] is not None:
+        assert info['duracion'] == pytest.approx(sondear_audio(original)['duracion'], abs=0.1)
+
+
+@pytest.mark.parametrize('formato', ['FLAC', 'OPUS'])
+def test_salida_mas_pequena(transcodificador, original, formato):
+    salida, _, _ = transcodificador.transcodificar(original, formato)
+    assert len(salida) < len(original)
+
+
+def test_codificacion_que_recibe_el_reconocedor(transcodificador, original):
+    backend = BackendRegistro()
+    transcriptor = GoogleSpeechToText(transcodificador=transcodificador, backend=backend)
+
+    assert transcriptor.transcribir_audio(original, formato='M4A')
+
+    (configuracion, contenido), = backend.recibidos
+    assert configuracion.encoding == speech.RecognitionConfig.AudioEncoding.FLAC
+    assert configuracion.sample_rate_hertz == 16000
+    assert configuracion.audio_channel_count == 1
+    assert contenido[:4] == b'fLaC'
+    assert len(contenido) < len(original)
+
+
+@pytest.mark.parametrize('indice_al_inicio', [True, False])
+def test_mp4_segun_posicion_del_indice(transcodificador, tmp_path, monkeypatch, indice_al_inicio):
+    contenido = convertir_a_mp4(transcodificador, str(tmp_path), indice_al_inicio)
+    assert sondear_audio(contenido)['contenedor'] == 'mp4'
+    assert indice_mp4_al_final(contenido) is not indice_al_inicio
+
+    # Con el índice al final ffmpeg lee desde un archivo temporal en lugar de stdin
+    desde_archivo = []
+    ejecutar_desde_archivo = transcodificador._ejecutar_desde_archivo
+    monkeypatch.setattr(transcodificador, '_ejecutar_desde_archivo',
+                        lambda *args: desde_archivo.append(True) or ejecutar_desde_archivo(*args))
+
+    salida, formato, _ = transcodificador.transcodificar(contenido, 'FLAC')
+
+    assert bool(desde_archivo) is not indice_al_inicio
+    info = sondear_audio(salida)
+    assert (formato, info['tasa_muestreo'], info['canales']) == ('FLAC', 16000, 1)
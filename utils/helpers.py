@@ -0,0 +1,102 @@
+import io
+import json
+import zlib
+
+from flask import Request
+
+try:
+    import tiktoken
+    _codificador = tiktoken.get_encoding("cl100k_base")
+except Exception:  # tiktoken no disponible o sin caché de codificaciones
+    _codificador = None
+
+try:
+    import brotli
+except ImportError:  # sin brotli solo se ofrece gzip
+    brotli = None
+
+# Codificaciones de respuesta admitidas, en orden de preferencia
+CODIFICACIONES = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def contar_tokens(texto):
+    """
+    Cuenta (o estima) los tokens de un texto para los modelos de OpenAI.
+
+    Usa tiktoken con la codificación cl100k_base cuando está disponible;
+    si no, estima con la regla aproximada de 4 caracteres por token.
+
+    Args:
+        texto (str): Texto a medir
+
+    Returns:
+        int: Número de tokens
+    """
+    if not texto:
+        return 0
+    if _codificador is not None:
+        return len(_codificador.encode(texto, disallowed_special=()))
+    return max(1, len(texto) // 4)
+
+
+def serializar_json(valor):
+    """Serializa un valor a JSON conservando tildes y eñes."""
+    return json.dumps(valor, ensure_ascii=False)
+
+
+def elegir_codificacion(aceptadas):
+    """
+    Elige la compresión de la respuesta según la cabecera Accept-Encoding.
+
+    Args:
+        aceptadas: request.accept_encodings de Flask
+
+    Returns:
+        str: 'br', 'gzip' o None para enviar sin comprimir
+    """
+    return aceptadas.best_match(CODIFICACIONES)
+
+
+def comprimir_flujo(fragmentos, codificacion):
+    """
+    Comprime al vuelo una secuencia de bloques de bytes.
+
+    Cada bloque se pasa al compresor según llega, así que la respuesta se
+    puede enviar por partes sin tenerla entera en memoria.
+
+    Args:
+        fragmentos: Iterable de bytes
+        codificacion: 'br', 'gzip' o None (se devuelven los bloques tal cual)
+
+    Returns:
+        generator: Bloques de bytes comprimidos
+    """
+    if codificacion is None:
+        yield from fragmentos
+        return
+
+    if codificacion == 'br':
+        compresor = brotli.Compressor(quality=5)
+        comprimir, terminar = compresor.process, compresor.finish
+    else:
+        compresor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        comprimir, terminar = compresor.compress, compresor.flush
+
+    for fragmento in fragmentos:
+        salida = comprimir(fragmento)
+        if salida:
+            yield salida
+    yield terminar()
+
+
+class SolicitudEnMemoria(Request):
+    """
+    Solicitud de Flask que mantiene los archivos subidos en memoria.
+
+    Por defecto Werkzeug vuelca a un archivo temporal las subidas de más de
+    500 KB; el audio ya está limitado por MAX_CONTENT_LENGTH, así que se pasa
+    directo al reconocedor sin tocar el disco.
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return io.BytesIO()